@@ -0,0 +1,67 @@
+import numpy as np
+
+
+def parse_frame_range(spec, action_range):
+    # "all" -> the action's range, "10:40" -> frames 10..40 inclusive, "10" -> frame 10 only.
+    # An open end takes the action's: "10:" runs to its last frame, ":40" starts at its first.
+    first, last = int(round(action_range[0])), int(round(action_range[1]))
+    if spec in (None, "", "all"):
+        return first, last
+    start, colon, end = str(spec).strip().partition(":")
+    try:
+        start = int(start) if start.strip() else first
+        end = int(end) if end.strip() else (last if colon else start)
+    except ValueError:
+        raise ValueError(f"Invalid frame range {spec!r}: expected all, START:END, START: or :END")
+    if start > end:
+        raise ValueError(f"Invalid frame range {spec!r}: start frame {start} is after end frame {end}")
+    return start, end
+
+
+def sample_frames(start, end, step=1, max_frames=None):
+    frames = np.arange(start, end + 1, max(1, step))
+    if max_frames and len(frames) > max_frames:
+        # Evenly subsample, always keeping the first and last frame
+        picks = np.unique(np.round(np.linspace(0, len(frames) - 1, max_frames)).astype(int))
+        frames = frames[picks]
+    return frames
+
+
+def make_continuous(quaternions):
+    # q and -q are the same rotation; flip signs along time so interpolation takes the short way
+    # quaternions: (frames, bones, 4)
+    if len(quaternions) < 2:
+        return quaternions
+    dots = np.einsum("fbi,fbi->fb", quaternions[1:], quaternions[:-1])
+    flips = np.where(dots < 0, -1.0, 1.0)
+    signs = np.concatenate([np.ones((1,) + flips.shape[1:]), np.cumprod(flips, axis=0)])
+    return quaternions * signs[..., np.newaxis]
+
+
+def reduce_keys(times, values, tolerance):
+    # Ramer-Douglas-Peucker on one curve: drop keys that linear interpolation between the
+    # kept neighbours reproduces within tolerance. Returns a boolean mask of kept keys.
+    count = len(times)
+    if count < 3 or tolerance <= 0:
+        return np.ones(count, dtype=bool)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    if np.ptp(values) <= tolerance:
+        return keep
+
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        t = times[first + 1:last]
+        span = times[last] - times[first]
+        line = values[first] + (values[last] - values[first]) * (t - times[first]) / span
+        errors = np.abs(values[first + 1:last] - line)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
@@ -0,0 +1,47 @@
+import os
+
+from result_cache import DEFAULT_CACHE_DIR, file_digest, make_key, read_json, write_json_atomic
+
+# Imported avatars saved as .blend files, keyed by the FBX content hash and Blender version
+DEFAULT_AVATAR_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "avatars")
+
+
+def entry_paths(cache_dir, avatar_fbx, blender_version):
+    key = make_key({"fbx": file_digest(avatar_fbx), "blender": blender_version})[:32]
+    return key, os.path.join(cache_dir, f"{key}.blend"), os.path.join(cache_dir, f"{key}.json")
+
+
+def lookup(cache_dir, avatar_fbx, blender_version):
+    key, blend_path, meta_path = entry_paths(cache_dir, avatar_fbx, blender_version)
+    meta = read_json(meta_path)
+    if meta is None or not os.path.exists(blend_path):
+        return None
+    return dict(meta, blend=blend_path)
+
+
+def record(cache_dir, avatar_fbx, blender_version, armature_name, object_names):
+    key, blend_path, meta_path = entry_paths(cache_dir, avatar_fbx, blender_version)
+    source = os.path.abspath(avatar_fbx)
+    write_json_atomic(meta_path, {
+        "key": key,
+        "source": source,
+        "blender": blender_version,
+        "armature": armature_name,
+        "objects": object_names,
+    })
+
+    # The source FBX changed since its last entry: drop the outdated .blend
+    index_path = os.path.join(cache_dir, "index.json")
+    index = read_json(index_path, {})
+    previous = index.get(source)
+    if previous and previous != key:
+        remove(cache_dir, previous)
+    index[source] = key
+    write_json_atomic(index_path, index)
+
+
+def remove(cache_dir, key):
+    for ext in (".blend", ".json", ".blend1"):
+        path = os.path.join(cache_dir, key + ext)
+        if os.path.exists(path):
+            os.remove(path)
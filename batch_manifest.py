@@ -0,0 +1,84 @@
+import csv
+import itertools
+import json
+import os
+
+
+# Output formats of a transfer and the extension of the file each one writes.
+# Only "fbx" carries the avatar's meshes; the others are skeleton-only.
+OUTPUT_FORMATS = {
+    "fbx": ".fbx",
+    "armature-fbx": ".fbx",
+    "bvh": ".bvh",
+    "json": ".json",
+    "npz": ".npz",
+}
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _resolve(path, base_dir):
+    if not path:
+        return path
+    path = os.path.expanduser(path)
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(base_dir, path))
+
+
+def _read_rows(manifest_path):
+    if manifest_path.lower().endswith(".csv"):
+        with open(manifest_path, newline="") as f:
+            return {"jobs": [row for row in csv.DictReader(f)]}
+    with open(manifest_path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return {"jobs": data}
+    return data
+
+
+# JSON manifests list jobs explicitly ({"jobs": [{"pose": ..., "avatar": ...}]}) and/or
+# give "poses" and "avatars" lists that are combined as a cartesian product.
+# CSV manifests have one job per row: pose, avatar and optional output_name/export_path.
+def load_manifest(manifest_path, export_path=None, blender_exe=None):
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    data = _read_rows(manifest_path)
+
+    export_path = export_path or data.get("export_path", "")
+    blender_exe = blender_exe or data.get("blender_exe", "")
+
+    rows = list(data.get("jobs", []))
+    for avatar, pose in itertools.product(data.get("avatars", []), data.get("poses", [])):
+        rows.append({"pose": pose, "avatar": avatar})
+
+    jobs = []
+    for row in rows:
+        pose_fbx = _resolve(row.get("pose") or row.get("pose_fbx"), base_dir)
+        avatar_fbx = _resolve(row.get("avatar") or row.get("avatar_fbx"), base_dir)
+        if not pose_fbx or not avatar_fbx:
+            raise ValueError(f"Manifest row is missing a pose or avatar: {row}")
+        jobs.append({
+            "pose_fbx": pose_fbx,
+            "avatar_fbx": avatar_fbx,
+            "export_path": _resolve(row.get("export_path") or export_path, base_dir),
+            "output_name": (row.get("output_name") or f"{_stem(avatar_fbx)}__{_stem(pose_fbx)}").strip(),
+            "blender_exe": row.get("blender_exe") or blender_exe,
+            "priority": int(row.get("priority") or 0),
+        })
+
+    seen = set()
+    for job in jobs:
+        if not job["export_path"]:
+            raise ValueError(f"No export path given for job {job['output_name']}")
+        target = os.path.join(job["export_path"], job["output_name"])
+        if target in seen:
+            raise ValueError(f"Duplicate output in manifest: {target}")
+        seen.add(target)
+    return jobs
+
+
+def group_by_avatar(jobs):
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job["avatar_fbx"], []).append(job)
+    return groups
@@ -0,0 +1,302 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from job_scheduler import PYTHON_EXIT_CODE, RUNNER_SCRIPT, SCRIPT_DIR, build_command, stub_command
+from preview_views import PREVIEW_PRESETS
+from progress_events import ProgressTracker, format_timings, parse_line
+from result_cache import read_json, write_json_atomic
+
+SYNTH_SCRIPT = os.path.join(SCRIPT_DIR, "synthetic_rigs.py")
+DEFAULT_WORK_DIR = os.path.join(SCRIPT_DIR, "bench_work")
+HISTORY_NAME = "bench_history.json"  # Kept in the work dir, next to the generated assets
+DEFAULT_BASELINE = os.path.join(SCRIPT_DIR, "bench_baseline.json")
+
+# Run settings that change what is measured; a baseline recorded with different ones isn't comparable
+COMPARED_SETTINGS = ("mode", "frames", "glb_profile", "preview_preset", "avatar_cache")
+
+# Each case scales bones, vertices and texture size together; --bones/--verts/--texture override one axis
+CASES = {
+    "small": {"bones": 30, "verts": 5000, "texture": 512},
+    "medium": {"bones": 65, "verts": 30000, "texture": 2048},
+    "large": {"bones": 150, "verts": 150000, "texture": 4096},
+}
+
+# Differences below this many seconds are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.05
+
+
+# --- Processes ---
+def run_measured(cmd, on_line=None):
+    # Returns (exit code, wall seconds, peak RSS in MB or None); RSS comes from wait4 where available
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, encoding="utf-8", errors="replace")
+    for line in process.stdout:
+        if on_line:
+            on_line(line.rstrip("\n"))
+    process.stdout.close()
+
+    peak_mb = None
+    if hasattr(os, "wait4"):
+        _pid, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak_mb = usage.ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+    else:
+        process.wait()
+    return process.returncode, time.perf_counter() - start, peak_mb
+
+
+def blender_prefix(args):
+    return stub_command() if args.stand_in else [args.blender]
+
+
+def script_command(args, script, script_args):
+    # Like job_scheduler.build_command: without --python-exit-code a script crash exits 0
+    return blender_prefix(args) + ["--python-exit-code", str(PYTHON_EXIT_CODE), "--background",
+                                   "--python", script, "--"] + script_args
+
+
+# --- Synthetic assets ---
+def case_assets(args, name, params):
+    # Assets are generated once per parameter set and reused by later runs
+    mode = "stand-in" if args.stand_in else "blender"
+    tag = f"{name}_b{params['bones']}_v{params['verts']}_t{params['texture']}_f{args.frames}_{mode}"
+    out_dir = os.path.join(args.work_dir, tag)
+    avatar_fbx = os.path.join(out_dir, "avatar.fbx")
+    pose_fbx = os.path.join(out_dir, "pose.fbx")
+    if not (os.path.exists(avatar_fbx) and os.path.exists(pose_fbx)):
+        print(f"🧪 Generating {tag}")
+        cmd = script_command(args, SYNTH_SCRIPT, [out_dir, "--bones", str(params["bones"]), "--verts", str(params["verts"]),
+                                                  "--texture", str(params["texture"]), "--frames", str(args.frames)])
+        code, _wall, _peak = run_measured(cmd, on_line=print if args.verbose else None)
+        if code != 0:
+            raise RuntimeError(f"Synthetic rig generation failed for {tag} (exit {code})")
+    return out_dir, avatar_fbx, pose_fbx
+
+
+def avatar_cache_dir(args):
+    # Kept under the work dir so benchmark runs neither read nor fill the user's avatar cache
+    return os.path.join(args.work_dir, "avatar_cache")
+
+
+def warm_avatar_cache(args, avatar_fbx):
+    # Untimed: with --avatar-cache every measured run should load the .blend, including the first
+    cmd = script_command(args, RUNNER_SCRIPT, ["--prepare-avatar", avatar_fbx, "--avatar-cache", avatar_cache_dir(args)])
+    code, _wall, _peak = run_measured(cmd, on_line=print if args.verbose else None)
+    if code != 0:
+        raise RuntimeError(f"Preparing the avatar cache failed for {avatar_fbx} (exit {code})")
+
+
+# --- One pipeline run ---
+def run_case(args, out_dir, avatar_fbx, pose_fbx):
+    blender_exe = args.blender or sys.executable
+    prefix = blender_prefix(args)
+    export_dir = os.path.join(out_dir, "out")
+    os.makedirs(export_dir, exist_ok=True)
+    metrics = {}
+
+    # 1. Pose transfer, the same command line the scheduler runs
+    job_args = {"pose_fbx": pose_fbx, "avatar_fbx": avatar_fbx, "export_path": export_dir, "output_name": "bench",
+                "preview_preset": args.preview_preset}
+    if args.frames > 1:
+        job_args["frames"] = "all"
+    cmd = build_command("pose_transfer", job_args, blender_exe, prefix)
+    cmd += ["--avatar-cache", avatar_cache_dir(args)] if args.avatar_cache else ["--no-avatar-cache"]
+    tracker = ProgressTracker()
+
+    def on_line(line):
+        event = parse_line(line)
+        if event is not None:
+            tracker.update(event)
+        elif args.verbose:
+            print(line)
+
+    code, wall, peak = run_measured(cmd, on_line)
+    if code != 0:
+        raise RuntimeError(f"pose_transfer_runner.py exited with code {code}")
+    metrics.update({f"stage.{stage}": elapsed for stage, elapsed in tracker.timings.items()})
+    metrics["transfer_wall"] = wall
+    metrics["transfer_overhead"] = max(0.0, wall - sum(tracker.timings.values()))
+    if peak is not None:
+        metrics["transfer_peak_mb"] = peak
+
+    # 2. FBX -> GLB conversion, as the viewer does it
+    export_fbx = os.path.join(export_dir, "bench.fbx")
+    glb_path = os.path.join(export_dir, "bench.glb")
+    cmd = build_command("convert_glb", {"fbx": export_fbx, "glb": glb_path, "profile": args.glb_profile}, blender_exe, prefix)
+    code, wall, peak = run_measured(cmd, on_line=print if args.verbose else None)
+    if code != 0:
+        raise RuntimeError(f"glb_export.py exited with code {code}")
+    metrics["convert_glb_wall"] = wall
+    if peak is not None:
+        metrics["convert_glb_peak_mb"] = peak
+
+    # 3. Orchestration-side file and image loading
+    start = time.perf_counter()
+    with open(glb_path, "rb") as f:
+        f.read()
+    metrics["load_glb"] = time.perf_counter() - start
+
+    preview_image = os.path.join(export_dir, "bench.png")
+    if os.path.exists(preview_image):
+        start = time.perf_counter()
+        try:
+            from PIL import Image
+            Image.open(preview_image).convert("RGBA").resize((256, 256))
+        except ImportError:
+            with open(preview_image, "rb") as f:
+                f.read()
+        metrics["load_preview"] = time.perf_counter() - start
+
+    metrics["size.avatar_mb"] = os.path.getsize(avatar_fbx) / 1024 ** 2
+    metrics["size.export_mb"] = os.path.getsize(export_fbx) / 1024 ** 2
+    metrics["size.glb_mb"] = os.path.getsize(glb_path) / 1024 ** 2
+    return metrics
+
+
+def median_metrics(runs):
+    names = sorted(set().union(*runs))
+    return {name: statistics.median(run[name] for run in runs if name in run) for name in names}
+
+
+# --- History and regressions ---
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def mismatched_settings(result, baseline):
+    # Settings the baseline recorded differently; older baselines that didn't record one aren't flagged
+    return [key for key in COMPARED_SETTINGS if key in baseline and baseline[key] != result.get(key)]
+
+
+def compare(result, baseline, threshold):
+    # Returns (time and memory metrics that grew by more than the threshold, cases compared); sizes
+    # are informational. Cases generated with different bones/verts/texture than the baseline's are skipped.
+    regressions = []
+    compared = []
+    for case, metrics in result["cases"].items():
+        base_params = baseline.get("params", {}).get(case)
+        if base_params is not None and base_params != result["params"][case]:
+            print(f"⚠️ {case}: baseline used {base_params}, this run {result['params'][case]}; not comparing")
+            continue
+        if case not in baseline.get("cases", {}):
+            continue
+        compared.append(case)
+        base_metrics = baseline["cases"][case]
+        for name, value in metrics.items():
+            base = base_metrics.get(name)
+            if base is None or name.startswith("size.") or base <= 0:
+                continue
+            if name.endswith("_mb"):
+                regressed = value > base * (1 + threshold)
+            else:
+                regressed = value > base * (1 + threshold) and value - base > MIN_REGRESSION_SECONDS
+            if regressed:
+                regressions.append({"case": case, "metric": name, "baseline": base, "value": value,
+                                    "change": value / base - 1})
+    return regressions, compared
+
+
+def format_case(case, metrics):
+    stages = {name[len("stage."):]: value for name, value in metrics.items() if name.startswith("stage.")}
+    lines = [f"{case}: transfer {metrics['transfer_wall']:.2f}s (overhead {metrics['transfer_overhead']:.2f}s), "
+             f"GLB {metrics['convert_glb_wall']:.2f}s, load GLB {metrics['load_glb'] * 1000:.1f}ms"]
+    if stages:
+        lines.append(f"  {format_timings(stages)}")
+    if "transfer_peak_mb" in metrics:
+        lines.append(f"  Peak memory: transfer {metrics['transfer_peak_mb']:.0f} MB, "
+                     f"GLB {metrics.get('convert_glb_peak_mb', 0):.0f} MB")
+    return "\n".join(lines)
+
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pose transfer pipeline on synthetic rigs")
+    parser.add_argument("--blender", help="Blender executable")
+    parser.add_argument("--stand-in", action="store_true", help="Use the Blender stand-in (orchestration overhead only)")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=["small", "medium"])
+    parser.add_argument("--bones", type=int, help="Override the bone count of every case")
+    parser.add_argument("--verts", type=int, help="Override the vertex count of every case")
+    parser.add_argument("--texture", type=int, help="Override the texture size of every case")
+    parser.add_argument("--frames", type=int, default=1, help="Pose clip length; >1 benchmarks animation transfer")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median is recorded")
+    parser.add_argument("--preview-preset", choices=sorted(PREVIEW_PRESETS), default="standard",
+                        help="Preview quality preset for the transfer")
+    parser.add_argument("--glb-profile", default="preview", help="GLB export profile (full, preview, thumbnail)")
+    parser.add_argument("--avatar-cache", action="store_true", help="Benchmark with the avatar .blend cache warm")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Generated assets and outputs")
+    parser.add_argument("--history", help=f"JSON history file results are appended to (default: <work-dir>/{HISTORY_NAME})")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Flag metrics more than this fraction slower")
+    parser.add_argument("--verbose", action="store_true", help="Show Blender output")
+    args = parser.parse_args()
+
+    if not args.stand_in and not args.blender:
+        parser.error("--blender is required unless --stand-in is given")
+    args.history = args.history or os.path.join(args.work_dir, HISTORY_NAME)
+
+    result = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "mode": "stand-in" if args.stand_in else "blender",
+        "blender": args.blender,
+        "frames": args.frames,
+        "glb_profile": args.glb_profile,
+        "preview_preset": args.preview_preset,
+        "avatar_cache": args.avatar_cache,
+        "repeat": args.repeat,
+        "params": {},
+        "cases": {},
+    }
+    for name in args.cases:
+        params = dict(CASES[name])
+        for axis in ("bones", "verts", "texture"):
+            if getattr(args, axis):
+                params[axis] = getattr(args, axis)
+        result["params"][name] = params
+        out_dir, avatar_fbx, pose_fbx = case_assets(args, name, params)
+        if args.avatar_cache:
+            warm_avatar_cache(args, avatar_fbx)
+        runs = [run_case(args, out_dir, avatar_fbx, pose_fbx) for _ in range(args.repeat)]
+        result["cases"][name] = median_metrics(runs)
+        print(format_case(name, result["cases"][name]))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    history = read_json(args.history, [])
+    history.append(result)
+    write_json_atomic(args.history, history)
+    print(f"📄 Appended to {args.history}")
+
+    baseline = read_json(args.baseline)
+    regressions = []
+    mismatched = mismatched_settings(result, baseline) if baseline is not None else []
+    if mismatched:
+        details = ", ".join(f"{key} {baseline[key]!r} vs {result.get(key)!r}" for key in mismatched)
+        print(f"⚠️ Baseline was recorded with different settings ({details}); not comparing")
+    elif baseline is not None:
+        regressions, compared = compare(result, baseline, args.threshold)
+        for r in regressions:
+            print(f"❌ Regression: {r['case']} {r['metric']} {r['baseline']:.3f} -> {r['value']:.3f} (+{r['change']:.0%})")
+        if not compared:
+            print("⚠️ No case matches the baseline's; nothing compared")
+        elif not regressions:
+            print(f"✅ No regressions against baseline ({baseline.get('commit') or baseline.get('time')})")
+
+    if args.save_baseline:
+        write_json_atomic(args.baseline, result)
+        print(f"📌 Baseline saved to {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
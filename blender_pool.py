@@ -0,0 +1,343 @@
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+from progress_events import ProgressTracker, format_timings, parse_line
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(SCRIPT_DIR, "blender_worker.py")
+STUB_SCRIPT = os.path.join(SCRIPT_DIR, "stub_blender.py")
+
+# Replies share stdout with Blender's own logging, so they carry a marker
+PROTOCOL_PREFIX = "@@POSE_WORKER@@ "
+
+
+class WorkerError(Exception):
+    pass
+
+
+class WorkerTimeout(WorkerError):
+    pass
+
+
+class JobError(Exception):
+    pass
+
+
+def worker_command(blender_exe=None, stub=False):
+    if stub:
+        return [sys.executable, STUB_SCRIPT, "--background", "--python", WORKER_SCRIPT]
+    return [blender_exe, "--background", "--python", WORKER_SCRIPT]
+
+
+# --- One long-lived headless Blender process ---
+class BlenderWorker:
+    def __init__(self, command, startup_timeout=120.0):
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+        )
+        self.replies = queue.Queue()
+        self.on_output = None
+        self.on_progress = None
+        self.jobs_done = 0
+        self.last_used = time.monotonic()
+        self._next_id = 0
+        self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._reader.start()
+
+        try:
+            ready = self._wait_reply(None, startup_timeout)
+        except WorkerError:
+            self.kill()
+            raise
+        self.pid = ready.get("pid")
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            if line.startswith(PROTOCOL_PREFIX):
+                self.replies.put(json.loads(line[len(PROTOCOL_PREFIX):]))
+            elif self.on_output:
+                self.on_output(line.rstrip("\n"))
+            else:
+                # Without an output handler, progress events go to on_progress (or nowhere), never the console
+                event = parse_line(line.rstrip("\n"))
+                if event is None:
+                    sys.stdout.write(line)
+                elif self.on_progress:
+                    self.on_progress(event)
+        self.replies.put(None)
+
+    def _wait_reply(self, request_id, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                message = self.replies.get(timeout=remaining)
+            except queue.Empty:
+                raise WorkerTimeout(f"Blender worker {self.process.pid} did not answer within {timeout}s")
+            if message is None:
+                raise WorkerError(f"Blender worker {self.process.pid} exited with code {self.process.wait()}")
+            if message.get("id") == request_id:
+                return message
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def request(self, job_type, args=None, timeout=None):
+        self._next_id += 1
+        request_id = self._next_id
+        try:
+            self.process.stdin.write(json.dumps({"id": request_id, "type": job_type, "args": args or {}}) + "\n")
+            self.process.stdin.flush()
+        except OSError as e:
+            raise WorkerError(f"Blender worker {self.process.pid} is not accepting jobs: {e}")
+
+        message = self._wait_reply(request_id, timeout)
+        self.last_used = time.monotonic()
+        if not message.get("ok"):
+            raise JobError(message.get("error") or f"{job_type} failed")
+        return message.get("result")
+
+    def ping(self, timeout=10.0):
+        try:
+            self.request("ping", timeout=timeout)
+            return True
+        except (WorkerError, JobError):
+            return False
+
+    def kill(self):
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+
+    def close(self, timeout=10.0):
+        if self.alive():
+            try:
+                self.process.stdin.write(json.dumps({"type": "shutdown"}) + "\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=timeout)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+
+# --- Pool of warm workers fed from one job queue ---
+class BlenderPool:
+    def __init__(self, blender_exe=None, size=2, max_jobs_per_worker=50, health_interval=30.0,
+                 startup_timeout=120.0, command=None):
+        self.blender_exe = blender_exe
+        self.size = max(1, size)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.health_interval = health_interval
+        self.startup_timeout = startup_timeout
+        self.command = command or worker_command(blender_exe)
+        self.jobs = queue.Queue()
+        self.stats = {"jobs": 0, "failed": 0, "spawned": 0, "recycled": 0, "restarted": 0, "cancelled": 0}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._running = {}  # future -> worker running it, None while its worker is still starting
+        self._cancel_requested = set()  # Running futures cancelled before their worker was ready
+        self._threads = [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(self.size)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job_type, args=None, timeout=None, on_output=None, on_progress=None):
+        # on_output gets every non-protocol line raw; otherwise on_progress gets the parsed progress events
+        future = Future()
+        with self._lock:
+            # After shutdown the workers are gone; a queued job would never be picked up
+            if self._closed:
+                future.set_exception(JobError("Blender pool is shut down"))
+                return future
+            self.jobs.put((future, job_type, args or {}, timeout, on_output, on_progress))
+        return future
+
+    def run(self, job_type, args=None, timeout=None, on_output=None, on_progress=None):
+        return self.submit(job_type, args, timeout, on_output, on_progress).result()
+
+    def cancel(self, future):
+        # Queued jobs are dropped; a running job can only be stopped by killing its worker,
+        # which the worker loop then replaces like any crashed worker
+        if future.cancel():
+            self._count("cancelled")
+            return True
+        with self._lock:
+            if future not in self._running:
+                return False
+            worker = self._running[future]
+            if worker is None:
+                self._cancel_requested.add(future)  # Picked up once the worker is ready
+        self._count("cancelled")
+        if worker is not None:
+            worker.kill()
+        return True
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _spawn(self):
+        self._count("spawned")
+        return BlenderWorker(self.command, startup_timeout=self.startup_timeout)
+
+    def _worker_loop(self):
+        worker = None
+        while True:
+            try:
+                item = self.jobs.get(timeout=self.health_interval)
+            except queue.Empty:
+                # Idle health check: replace workers that died or stopped answering
+                if worker is not None and not worker.ping():
+                    worker.kill()
+                    worker = None
+                    self._count("restarted")
+                continue
+            if item is None:
+                break
+
+            future, job_type, args, timeout, on_output, on_progress = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                self._running[future] = None
+            try:
+                if worker is None or not worker.alive():
+                    worker = self._spawn()
+                worker.on_output = on_output
+                worker.on_progress = on_progress
+                with self._lock:
+                    self._running[future] = worker
+                    cancelled = future in self._cancel_requested
+                if cancelled:
+                    raise JobError("cancelled")
+                future.set_result(worker.request(job_type, args, timeout))
+            except JobError as e:
+                self._count("failed")
+                future.set_exception(e)
+            except Exception as e:
+                # Hung or crashed worker: kill it so the next job gets a fresh process
+                self._count("failed")
+                if worker is not None:
+                    worker.kill()
+                    worker = None
+                    self._count("restarted")
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._running.pop(future, None)
+                    self._cancel_requested.discard(future)
+                self._count("jobs")
+
+            if worker is not None:
+                worker.on_output = None
+                worker.on_progress = None
+                worker.jobs_done += 1
+                if self.max_jobs_per_worker and worker.jobs_done >= self.max_jobs_per_worker:
+                    worker.close()
+                    worker = None
+                    self._count("recycled")
+
+        if worker is not None:
+            worker.close()
+
+    def shutdown(self, wait=True):
+        # Jobs submitted before this still run; the stop markers queue up behind them
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                for _ in self._threads:
+                    self.jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+# --- CLI: run a batch manifest through the pool ---
+def main():
+    import fbx_reader
+    import pose_similarity
+    from batch_manifest import load_manifest
+
+    parser = argparse.ArgumentParser(description="Run pose transfer jobs on a pool of warm Blender workers")
+    parser.add_argument("manifest", help="JSON/CSV manifest of pose/avatar jobs")
+    parser.add_argument("--blender", help="Blender executable")
+    parser.add_argument("--export-path", help="Default export folder for manifest jobs")
+    parser.add_argument("--size", type=int, default=2, help="Number of Blender workers")
+    parser.add_argument("--max-jobs", type=int, default=50, help="Recycle a worker after this many jobs")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-job timeout in seconds")
+    parser.add_argument("--no-preview", action="store_true", help="Skip the preview render")
+    parser.add_argument("--stub", action="store_true", help="Use the stub worker instead of Blender")
+    parser.add_argument("--no-preflight", action="store_true", help="Don't check the FBX files before queueing")
+    parser.add_argument("--dedupe-poses", choices=sorted(pose_similarity.DEDUPE_MODES),
+                        help="Near-identical poses: skip their transfers, or collapse them onto one run and copy its outputs")
+    parser.add_argument("--pose-tolerance", type=float, default=pose_similarity.DEFAULT_TOLERANCE,
+                        help="Degrees every bone may differ by for two poses to count as the same")
+    args = parser.parse_args()
+
+    if not args.stub and not args.blender:
+        parser.error("--blender is required unless --stub is given")
+
+    jobs = load_manifest(args.manifest, export_path=args.export_path, blender_exe=args.blender)
+    repeats = []
+    if args.dedupe_poses:
+        index = pose_similarity.fbx_index(list(dict.fromkeys(job["pose_fbx"] for job in jobs)))
+        jobs, repeats = pose_similarity.dedupe_jobs(jobs, index, args.pose_tolerance)
+        pose_similarity.print_dedupe(jobs, repeats, args.dedupe_poses)
+    command = worker_command(args.blender, stub=args.stub)
+
+    start = time.perf_counter()
+    failed = 0
+    with BlenderPool(args.blender, size=args.size, max_jobs_per_worker=args.max_jobs, command=command) as pool:
+        futures = []
+        done = set()
+        for job in jobs:
+            problems = [] if args.no_preflight else fbx_reader.preflight(job["pose_fbx"], job["avatar_fbx"])
+            if problems:
+                failed += 1
+                print(f"❌ {job['output_name']}: {'; '.join(problems)}")
+                continue
+            job_args = {key: job[key] for key in ("pose_fbx", "avatar_fbx", "export_path", "output_name")}
+            job_args["preview"] = not args.no_preview
+            tracker = ProgressTracker()
+            futures.append((job, tracker, pool.submit("pose_transfer", job_args, timeout=args.timeout,
+                                                      on_progress=tracker.update)))
+
+        for job, tracker, future in futures:
+            try:
+                future.result()
+                done.add(id(job))
+                print(f"✅ {job['output_name']} ({format_timings(tracker.timings)})")
+            except Exception as e:
+                failed += 1
+                print(f"❌ {job['output_name']}: {e}")
+        stats = dict(pool.stats)
+
+    if args.dedupe_poses == "collapse":
+        copied = sum(1 for job, leader in repeats if id(leader) in done and pose_similarity.copy_outputs(job, leader))
+        print(f"🧬 Copied outputs to {copied}/{len(repeats)} collapsed transfers")
+
+    print(f"Finished {len(jobs) - failed}/{len(jobs)} jobs in {time.perf_counter() - start:.1f}s {stats}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
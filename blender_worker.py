@@ -0,0 +1,90 @@
+import bpy
+import os
+import sys
+import json
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pose_transfer_runner
+import preview_render
+import glb_export
+from blender_pool import PROTOCOL_PREFIX
+
+
+def reply(message):
+    sys.stdout.write(PROTOCOL_PREFIX + json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+# --- Job handlers ---
+def handle_pose_transfer(args):
+    job = {
+        "pose_fbx": args["pose_fbx"],
+        "avatar_fbx": args["avatar_fbx"],
+        "export_path": args["export_path"],
+        "output_name": args["output_name"],
+        "blender_exe": bpy.app.binary_path,
+    }
+    options = {key: args[key] for key in pose_transfer_runner.DEFAULT_OPTIONS if key in args}
+    record = pose_transfer_runner.run_jobs([job], options=options)[0]
+    if record["status"] != "ok":
+        raise RuntimeError(record["error"])
+    return record
+
+
+def handle_render_preview(args):
+    settings = preview_render.preview_settings(args.get("preview_preset", "standard"))
+    angles = preview_render.view_angles(args.get("preview_views", "front"))
+    preview_render.render_fbx_preview(args["fbx"], args["image"], settings, angles)
+    return {"preview_image": args["image"]}
+
+
+def handle_convert_glb(args):
+    return glb_export.convert_fbx_to_glb(args["fbx"], args["glb"], args.get("profile", "full"))
+
+
+HANDLERS = {
+    "pose_transfer": handle_pose_transfer,
+    "render_preview": handle_render_preview,
+    "convert_glb": handle_convert_glb,
+    "ping": lambda args: {"pid": os.getpid()},
+}
+
+
+def reset_scene():
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    bpy.data.orphans_purge(do_recursive=True)
+
+
+def serve():
+    reply({"id": None, "ready": True, "pid": os.getpid()})
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+
+        request = json.loads(line)
+        if request.get("type") == "shutdown":
+            break
+
+        start = time.perf_counter()
+        try:
+            handler = HANDLERS.get(request.get("type"))
+            if handler is None:
+                raise ValueError(f"Unknown job type: {request.get('type')}")
+            result = handler(request.get("args") or {})
+            reply({"id": request.get("id"), "ok": True, "result": result, "elapsed": time.perf_counter() - start})
+        except Exception as e:
+            traceback.print_exc()
+            reply({"id": request.get("id"), "ok": False, "error": str(e), "elapsed": time.perf_counter() - start})
+        finally:
+            if request.get("type") != "ping":
+                reset_scene()
+
+
+if __name__ == "__main__":
+    serve()
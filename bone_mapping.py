@@ -0,0 +1,193 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+
+from result_cache import DEFAULT_CACHE_DIR, read_json, write_json_atomic
+
+DEFAULT_MAPPING_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "bone_maps")
+
+# Bump when the naming rules below change so cached tables are rebuilt
+MAPPING_VERSION = 1
+
+# Canonical (Mixamo-style) bone ids and the names other rigs use for them, after
+# namespace/side stripping and lower-casing (e.g. "spine_01" -> "spine01", "thigh_l" -> "thigh")
+ALIASES = {
+    "hips": ["hips", "hip", "pelvis"],
+    "spine": ["spine", "spine01", "abdomen"],
+    "spine1": ["spine1", "spine02", "chest"],
+    "spine2": ["spine2", "spine03", "upperchest"],
+    "neck": ["neck", "neck01"],
+    "head": ["head"],
+    "shoulder": ["shoulder", "clavicle", "collar"],
+    "arm": ["arm", "upperarm"],
+    "forearm": ["forearm", "lowerarm"],
+    "hand": ["hand", "wrist"],
+    "upleg": ["upleg", "thigh", "upperleg"],
+    "leg": ["leg", "calf", "shin", "lowerleg"],
+    "foot": ["foot", "ankle"],
+    "toebase": ["toebase", "ball", "toe"],
+}
+for finger in ("thumb", "index", "middle", "ring", "pinky"):
+    for n in range(1, 5):
+        ALIASES[f"hand{finger}{n}"] = [f"hand{finger}{n}", f"{finger}0{n}", f"{finger}{n}", f"f{finger}0{n}"]
+ALIASES["handpinky1"].append("little01")
+
+ALIAS_TO_ID = {alias: bone_id for bone_id, aliases in ALIASES.items() for alias in aliases}
+ROOT_ID = "hips"
+
+SIDE_PATTERNS = [
+    re.compile(r"^(?P<side>left|right)(?P<rest>.+)$", re.I),
+    re.compile(r"^(?P<rest>.+?)[._\- ]?(?P<side>left|right)$", re.I),
+    re.compile(r"^(?P<rest>.+?)[._\- ](?P<side>l|r)$", re.I),
+    re.compile(r"^(?P<side>l|r)[._\- ](?P<rest>.+)$", re.I),
+]
+RIG_PREFIX = re.compile(r"^(def|org|mch)[-_.]", re.I)
+
+_memory_cache = {}
+
+
+# --- Name normalization ---
+def strip_namespace(name):
+    # "mixamorig:Hips", "mixamorig1:Hips", "Armature|Hips", "Character1_Ctrl:Hips" -> "Hips"
+    return re.split(r"[:|]", name)[-1]
+
+
+def canonical_name(name):
+    name = RIG_PREFIX.sub("", strip_namespace(name))
+    side = ""
+    for pattern in SIDE_PATTERNS:
+        match = pattern.match(name)
+        if match:
+            side = match.group("side")[0].lower()
+            name = match.group("rest")
+            break
+    base = re.sub(r"[^a-z0-9]", "", name.lower())
+    return f"{side}:{ALIAS_TO_ID.get(base, base)}"
+
+
+def skeleton_signature(bone_names):
+    return hashlib.sha1("\n".join(sorted(bone_names)).encode()).hexdigest()[:16]
+
+
+# --- Mapping tables ---
+class BoneMapping:
+    def __init__(self, pairs, unmapped_source, unmapped_target, root=None, key=None):
+        self.pairs = pairs  # [(target_name, source_name)]
+        self.unmapped_source = unmapped_source
+        self.unmapped_target = unmapped_target
+        self.root = root  # (target_name, source_name) of the hips, or None
+        self.key = key
+
+    def to_json(self):
+        return {
+            "version": MAPPING_VERSION,
+            "pairs": self.pairs,
+            "unmapped_source": self.unmapped_source,
+            "unmapped_target": self.unmapped_target,
+            "root": self.root,
+        }
+
+    @classmethod
+    def from_json(cls, data, key=None):
+        root = tuple(data["root"]) if data.get("root") else None
+        return cls([tuple(p) for p in data["pairs"]], data["unmapped_source"], data["unmapped_target"], root, key)
+
+    def summary(self):
+        return f"{len(self.pairs)} bones mapped, {len(self.unmapped_target)} target / {len(self.unmapped_source)} source unmapped"
+
+
+def load_user_map(path):
+    # JSON object of {"source bone": "target bone"}
+    if not path:
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def build_mapping(source_names, target_names, user_map=None):
+    source_set = set(source_names)
+    mapped = {}
+
+    # 1. Explicit user-supplied pairs, 2. identical names, 3. canonical names
+    for source, target in (user_map or {}).items():
+        if source in source_set and target in target_names:
+            mapped[target] = source
+    used = set(mapped.values())
+    for target in target_names:
+        if target not in mapped and target in source_set and target not in used:
+            mapped[target] = target
+            used.add(target)
+
+    by_canonical = {}
+    for source in source_names:
+        if source not in used:
+            by_canonical.setdefault(canonical_name(source), source)
+    for target in target_names:
+        if target in mapped:
+            continue
+        source = by_canonical.pop(canonical_name(target), None)
+        if source is not None:
+            mapped[target] = source
+            used.add(source)
+
+    pairs = [(target, mapped[target]) for target in target_names if target in mapped]
+    root = next((p for p in pairs if canonical_name(p[0]) == f":{ROOT_ID}"), None)
+    if root is None:
+        root = next((p for p in pairs if "hips" in p[0].lower()), None)
+    return BoneMapping(
+        pairs,
+        unmapped_source=[name for name in source_names if name not in used],
+        unmapped_target=[name for name in target_names if name not in mapped],
+        root=root,
+    )
+
+
+def get_mapping(source_names, target_names, user_map_path=None, cache_dir=DEFAULT_MAPPING_CACHE_DIR):
+    user_map = load_user_map(user_map_path)
+    user_sig = hashlib.sha1(json.dumps(user_map, sort_keys=True).encode()).hexdigest()[:8] if user_map else "none"
+    key = f"v{MAPPING_VERSION}_{skeleton_signature(source_names)}_{skeleton_signature(target_names)}_{user_sig}"
+
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    path = os.path.join(cache_dir, f"{key}.json") if cache_dir else None
+    data = read_json(path) if path else None
+    if data is not None and data.get("version") == MAPPING_VERSION:
+        mapping = BoneMapping.from_json(data, key)
+    else:
+        mapping = build_mapping(source_names, target_names, user_map)
+        mapping.key = key
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            write_json_atomic(path, mapping.to_json())
+
+    _memory_cache[key] = mapping
+    return mapping
+
+
+# --- CLI: preview a mapping between two bone lists ---
+def main():
+    parser = argparse.ArgumentParser(description="Show how bones of a source rig map onto a target rig")
+    parser.add_argument("source", help="Text file with one source bone name per line")
+    parser.add_argument("target", help="Text file with one target bone name per line")
+    parser.add_argument("--bone-map", help="JSON file of explicit {source: target} pairs")
+    args = parser.parse_args()
+
+    def read_names(path):
+        with open(path, "r") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    mapping = build_mapping(read_names(args.source), read_names(args.target), load_user_map(args.bone_map))
+    for target, source in mapping.pairs:
+        print(f"{source:40s} -> {target}")
+    print(mapping.summary())
+    if mapping.unmapped_target:
+        print("Unmapped target bones:", ", ".join(mapping.unmapped_target))
+    if mapping.unmapped_source:
+        print("Unmapped source bones:", ", ".join(mapping.unmapped_source))
+
+
+if __name__ == "__main__":
+    main()
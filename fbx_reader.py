@@ -0,0 +1,449 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+import bone_mapping
+
+# Reads the node tree of binary FBX files without Blender. The file is memory-mapped and array
+# properties (vertices, key times, embedded textures) stay undecoded until asked for, so reading
+# the skeleton of a heavy avatar only touches the small Model/Connections records.
+BINARY_MAGIC = b"Kaydara FBX Binary  \x00\x1a\x00"
+MIN_BLENDER_VERSION = 7100  # Blender's importer refuses older binary files
+KTIME_PER_SECOND = 46186158000
+NAME_SEPARATOR = "\x00\x01"
+BONE_TYPES = {"LimbNode", "Limb", "Root"}
+
+# Subtrees a skeleton read never needs: mesh data and embedded media are the bulk of most files
+SKELETON_SKIP = {"Geometry", "Video", "Texture", "Material", "Documents", "References"}
+
+ARRAY_DTYPES = {"f": "<f4", "d": "<f8", "l": "<i8", "i": "<i4", "b": "u1"}
+SCALAR_FORMATS = {"Y": "<h", "C": "<?", "I": "<i", "F": "<f", "D": "<d", "L": "<q"}
+
+# GlobalSettings TimeMode -> frames per second (14 is "custom", see CustomFrameRate)
+TIME_MODES = {1: 120.0, 2: 100.0, 3: 60.0, 4: 50.0, 5: 48.0, 6: 30.0, 7: 30.0, 8: 30000 / 1001, 9: 30000 / 1001,
+              10: 25.0, 11: 24.0, 13: 24000 / 1001, 15: 96.0, 16: 72.0, 17: 60000 / 1001, 18: 120000 / 1001}
+
+_skeletons = {}
+_skeleton_lock = threading.Lock()
+
+
+class FBXError(Exception):
+    pass
+
+
+# --- Low-level node tree ---
+class LazyArray:
+    def __init__(self, buffer, offset, type_code, length, encoding, size):
+        self.buffer = buffer
+        self.offset = offset
+        self.type_code = type_code
+        self.length = length
+        self.encoding = encoding
+        self.size = size
+
+    def load(self):
+        raw = self.buffer[self.offset:self.offset + self.size]
+        if self.encoding == 1:
+            raw = zlib.decompress(raw)
+        elif self.type_code == "R":
+            return bytes(raw)
+        return np.frombuffer(raw, dtype=ARRAY_DTYPES[self.type_code], count=self.length)
+
+
+class FBXNode:
+    __slots__ = ("name", "props", "children")
+
+    def __init__(self, name, props, children):
+        self.name = name
+        self.props = props
+        self.children = children
+
+    def child(self, name):
+        return next((c for c in self.children if c.name == name), None)
+
+    def children_named(self, name):
+        return [c for c in self.children if c.name == name]
+
+    def value(self, index):
+        prop = self.props[index]
+        return prop.load() if isinstance(prop, LazyArray) else prop
+
+    def properties70(self):
+        # {"Lcl Translation": [x, y, z], ...} from the node's Properties70 block
+        block = self.child("Properties70")
+        if block is None:
+            return {}
+        return {p.props[0]: p.props[4:] for p in block.children if p.name == "P" and p.props}
+
+
+class FBXFile:
+    def __init__(self, path, skip=()):
+        self.path = path
+        self.skip = set(skip)
+        self._file = open(path, "rb")
+        self._map = None
+        try:
+            header = self._file.read(64)
+            if not header.startswith(BINARY_MAGIC) or len(header) < len(BINARY_MAGIC) + 4:
+                if header.lstrip().startswith(b"; FBX"):
+                    raise FBXError("ASCII FBX is not supported by Blender's importer")
+                raise FBXError("Not a binary FBX file")
+            size = os.fstat(self._file.fileno()).st_size
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.version = struct.unpack_from("<I", self._map, len(BINARY_MAGIC))[0]
+            self._wide = self.version >= 7500  # Record headers grew to 64-bit offsets in 7.5
+            self.roots = self._read_children(len(BINARY_MAGIC) + 4, size)
+        except (struct.error, zlib.error, IndexError, ValueError) as e:
+            self.close()
+            raise FBXError(f"Corrupt FBX: {e}")
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def find(self, name):
+        return next((node for node in self.roots if node.name == name), None)
+
+    # --- Parsing ---
+    def _read_children(self, offset, end):
+        children = []
+        while offset < end:
+            node, offset = self._read_node(offset)
+            if node is None:
+                break
+            if node is not False:
+                children.append(node)
+        return children
+
+    def _read_node(self, offset):
+        data = self._map
+        if self._wide:
+            node_end, prop_count, _prop_bytes = struct.unpack_from("<QQQ", data, offset)
+            offset += 24
+        else:
+            node_end, prop_count, _prop_bytes = struct.unpack_from("<III", data, offset)
+            offset += 12
+        name_length = data[offset]
+        name = data[offset + 1:offset + 1 + name_length].decode("ascii", "replace")
+        offset += 1 + name_length
+        if node_end == 0:
+            return None, offset  # Null record closing a child list
+        if name in self.skip:
+            return False, node_end
+
+        props = []
+        for _ in range(prop_count):
+            prop, offset = self._read_property(offset)
+            props.append(prop)
+        return FBXNode(name, props, self._read_children(offset, node_end)), node_end
+
+    def _read_property(self, offset):
+        data = self._map
+        code = chr(data[offset])
+        offset += 1
+        if code in SCALAR_FORMATS:
+            fmt = SCALAR_FORMATS[code]
+            return struct.unpack_from(fmt, data, offset)[0], offset + struct.calcsize(fmt)
+        if code in ARRAY_DTYPES:
+            length, encoding, size = struct.unpack_from("<III", data, offset)
+            offset += 12
+            return LazyArray(data, offset, code, length, encoding, size), offset + size
+        if code in "SR":
+            size = struct.unpack_from("<I", data, offset)[0]
+            offset += 4
+            if code == "R":
+                return LazyArray(data, offset, code, size, 0, size), offset + size
+            return data[offset:offset + size].decode("utf-8", "replace"), offset + size
+        raise FBXError(f"Unknown property type {code!r} at byte {offset - 1}")
+
+
+def object_name(value):
+    # Binary FBX stores "Name\x00\x01Class"
+    return value.split(NAME_SEPARATOR, 1)[0]
+
+
+# --- Skeleton ---
+def read_skeleton(fbx):
+    # Bones are LimbNode models plus any model a skin cluster deforms with (what Blender turns into bones)
+    objects = fbx.find("Objects")
+    connections = fbx.find("Connections")
+    models = {}
+    clusters = set()
+    for node in objects.children if objects else []:
+        if node.name == "Model" and len(node.props) > 2:
+            models[node.props[0]] = node
+        elif node.name == "Deformer" and len(node.props) > 2 and node.props[2] == "Cluster":
+            clusters.add(node.props[0])
+
+    parent_of = {}
+    deforming = set()
+    for c in connections.children if connections else []:
+        if c.name != "C" or c.props[0] != "OO":
+            continue
+        child, parent = c.props[1], c.props[2]
+        if child in models and parent in models:
+            parent_of[child] = parent
+        elif child in models and parent in clusters:
+            deforming.add(child)
+
+    bone_ids = [uid for uid, node in models.items() if node.props[2] in BONE_TYPES or uid in deforming]
+    bone_set = set(bone_ids)
+    index = {uid: i for i, uid in enumerate(bone_ids)}
+    armatures = []
+    for uid in bone_ids:
+        parent = parent_of.get(uid)
+        if parent is not None and parent not in bone_set and models[parent].props[2] not in BONE_TYPES:
+            name = object_name(models[parent].props[1])
+            if name not in armatures:
+                armatures.append(name)
+
+    count = len(bone_ids)
+    translations = np.zeros((count, 3))
+    rotations = np.zeros((count, 3))
+    pre_rotations = np.zeros((count, 3))
+    scales = np.ones((count, 3))
+    for i, uid in enumerate(bone_ids):
+        props = models[uid].properties70()
+        for key, target in (("Lcl Translation", translations), ("Lcl Rotation", rotations),
+                            ("PreRotation", pre_rotations), ("Lcl Scaling", scales)):
+            if key in props and len(props[key]) >= 3:
+                target[i] = props[key][:3]
+
+    creator = fbx.find("Creator")
+    settings = fbx.find("GlobalSettings")
+    global_props = settings.properties70() if settings else {}
+    return {
+        "version": fbx.version,
+        "creator": creator.props[0] if creator and creator.props else None,
+        "unit_scale": global_props.get("UnitScaleFactor", [1.0])[0],
+        "fps": frame_rate(global_props),
+        "bone_ids": bone_ids,
+        "bone_names": [object_name(models[uid].props[1]) for uid in bone_ids],
+        "parents": np.array([index.get(parent_of.get(uid), -1) for uid in bone_ids], dtype=np.int32),
+        "armatures": armatures,
+        "translations": translations,
+        "rotations": rotations,  # Euler degrees, FBX's default XYZ order
+        "pre_rotations": pre_rotations,
+        "scales": scales,
+        "meshes": sum(1 for node in models.values() if node.props[2] == "Mesh"),
+        "models": len(models),
+    }
+
+
+def frame_rate(global_props):
+    mode = global_props.get("TimeMode", [0])[0]
+    if mode in TIME_MODES:
+        return TIME_MODES[mode]
+    custom = global_props.get("CustomFrameRate", [0.0])[0]
+    return custom if custom > 0 else 24.0
+
+
+# --- Animation curves ---
+def read_animation(fbx, skeleton):
+    # {bone name: {"T"|"R"|"S": {axis: (times in seconds, values)}}} for animated bones
+    objects = fbx.find("Objects")
+    connections = fbx.find("Connections")
+    curves, curve_nodes = {}, {}
+    for node in objects.children if objects else []:
+        if node.name == "AnimationCurve":
+            curves[node.props[0]] = node
+        elif node.name == "AnimationCurveNode":
+            curve_nodes[node.props[0]] = node
+
+    channels = {"Lcl Translation": "T", "Lcl Rotation": "R", "Lcl Scaling": "S"}
+    bone_names = dict(zip(skeleton["bone_ids"], skeleton["bone_names"]))
+    node_target, node_curves = {}, {}
+    for c in connections.children if connections else []:
+        if c.name != "C" or c.props[0] != "OP" or len(c.props) < 4:
+            continue
+        child, parent, prop = c.props[1:4]
+        if child in curve_nodes and parent in bone_names and prop in channels:
+            node_target[child] = (bone_names[parent], channels[prop])
+        elif child in curves and parent in curve_nodes:
+            axis = "XYZ".index(prop[-1]) if prop[-1:] in ("X", "Y", "Z") else 0
+            node_curves.setdefault(parent, []).append((axis, child))
+
+    animation = {}
+    start, end = None, None
+    for node_id, (bone, channel) in node_target.items():
+        for axis, curve_id in node_curves.get(node_id, []):
+            curve = curves[curve_id]
+            times_node, values_node = curve.child("KeyTime"), curve.child("KeyValueFloat")
+            if times_node is None or values_node is None:
+                continue
+            times = times_node.value(0).astype(np.float64) / KTIME_PER_SECOND
+            values = values_node.value(0).astype(np.float64)
+            if not len(times):
+                continue
+            animation.setdefault(bone, {}).setdefault(channel, {})[axis] = (times, values)
+            start = times[0] if start is None else min(start, times[0])
+            end = times[-1] if end is None else max(end, times[-1])
+
+    fps = skeleton["fps"]
+    return {
+        "fps": fps,
+        "curves": animation,
+        "frame_range": (int(round(start * fps)), int(round(end * fps))) if start is not None else None,
+    }
+
+
+def sample_channel(skeleton, animation, bone_index, channel, seconds):
+    # Curve values at the given times (held flat outside the keys); unanimated axes keep the rest value
+    rest = {"T": skeleton["translations"], "R": skeleton["rotations"], "S": skeleton["scales"]}[channel]
+    seconds = np.atleast_1d(np.asarray(seconds, dtype=np.float64))
+    values = np.repeat(rest[bone_index][np.newaxis], len(seconds), axis=0)
+    axes = animation["curves"].get(skeleton["bone_names"][bone_index], {}).get(channel, {}) if animation else {}
+    for axis, (times, curve) in axes.items():
+        values[:, axis] = np.interp(seconds, times, curve)
+    return values
+
+
+def euler_to_quaternion(degrees):
+    # (N, 3) XYZ-order Euler degrees (X applied first) -> (N, 4) w, x, y, z
+    half = np.radians(np.asarray(degrees, dtype=np.float64)) / 2
+    cx, cy, cz = np.cos(half).T
+    sx, sy, sz = np.sin(half).T
+    return np.stack([
+        cz * cy * cx + sz * sy * sx,
+        cz * cy * sx - sz * sy * cx,
+        cz * sy * cx + sz * cy * sx,
+        sz * cy * cx - cz * sy * sx,
+    ], axis=-1)
+
+
+def local_rotations(skeleton, animation=None, seconds=0.0):
+    # (B, 4) FBX-space local rotations (PreRotation * Lcl Rotation) at one time. These are the
+    # file's own transforms, not Blender pose channels, but they compare poses of the same rig.
+    count = len(skeleton["bone_names"])
+    euler = np.array([sample_channel(skeleton, animation, i, "R", seconds)[0] for i in range(count)]).reshape(-1, 3)
+    return quaternion_multiply(euler_to_quaternion(skeleton["pre_rotations"].reshape(-1, 3)), euler_to_quaternion(euler))
+
+
+def quaternion_multiply(a, b):
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack([
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ], axis=-1)
+
+
+# --- Cached per-file summaries ---
+def load_skeleton(path):
+    # Memoised by (path, size, mtime) like result_cache.file_digest; raises FBXError/OSError
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    memo_key = (path, stat.st_size, stat.st_mtime_ns)
+    with _skeleton_lock:
+        if memo_key in _skeletons:
+            return _skeletons[memo_key]
+    with FBXFile(path, skip=SKELETON_SKIP) as fbx:
+        skeleton = read_skeleton(fbx)
+    with _skeleton_lock:
+        _skeletons[memo_key] = skeleton
+    return skeleton
+
+
+def summary(path):
+    with FBXFile(path, skip=SKELETON_SKIP) as fbx:
+        skeleton = read_skeleton(fbx)
+        animation = read_animation(fbx, skeleton)
+    return {
+        "path": os.path.abspath(path),
+        "version": skeleton["version"],
+        "creator": skeleton["creator"],
+        "armatures": skeleton["armatures"],
+        "bones": len(skeleton["bone_names"]),
+        "meshes": skeleton["meshes"],
+        "fps": skeleton["fps"],
+        "animated_bones": len(animation["curves"]),
+        "frame_range": animation["frame_range"],
+    }
+
+
+# --- Preflight ---
+def check_file(path, label):
+    # Returns (skeleton or None, [problems])
+    if not os.path.exists(path):
+        return None, [f"{label} FBX not found: {path}"]
+    try:
+        skeleton = load_skeleton(path)
+    except (FBXError, OSError) as e:
+        return None, [f"{label} FBX can't be read: {e}"]
+    problems = []
+    if skeleton["version"] < MIN_BLENDER_VERSION:
+        problems.append(f"{label} FBX version {skeleton['version']} is older than {MIN_BLENDER_VERSION}, which Blender can't import")
+    if not skeleton["bone_names"]:
+        problems.append(f"No armature found in {label} FBX.")
+    return skeleton, problems
+
+
+def preflight(pose_fbx, avatar_fbx, user_map=None):
+    # Problems that would make Blender fail (or transfer nothing), found without starting Blender
+    pose, problems = check_file(pose_fbx, "Pose")
+    avatar, avatar_problems = check_file(avatar_fbx, "Avatar")
+    problems += avatar_problems
+    if not problems and pose and avatar:
+        mapping = bone_mapping.build_mapping(pose["bone_names"], avatar["bone_names"], user_map)
+        if not mapping.pairs:
+            problems.append("Pose and avatar skeletons have no bones in common")
+    return problems
+
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Inspect binary FBX skeletons without Blender")
+    parser.add_argument("files", nargs="+", help="FBX files")
+    parser.add_argument("--avatar", help="Preflight each file as a pose against this avatar")
+    parser.add_argument("--bones", action="store_true", help="List bone names and parents")
+    parser.add_argument("--json", action="store_true", help="Print summaries as JSON lines")
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.files:
+        try:
+            info = summary(path)
+        except (FBXError, OSError) as e:
+            failed += 1
+            print(f"❌ {path}: {e}")
+            continue
+        if args.json:
+            print(json.dumps(info))
+        else:
+            frames = f", frames {info['frame_range'][0]}-{info['frame_range'][1]} @ {info['fps']:g} fps" if info["frame_range"] else ""
+            print(f"{os.path.basename(path)}: FBX {info['version']}, {info['bones']} bones "
+                  f"({', '.join(info['armatures']) or 'no armature object'}), {info['meshes']} meshes, "
+                  f"{info['animated_bones']} animated{frames}")
+        if args.bones:
+            skeleton = load_skeleton(path)
+            for name, parent in zip(skeleton["bone_names"], skeleton["parents"]):
+                print(f"  {name:40s} <- {skeleton['bone_names'][parent] if parent >= 0 else '-'}")
+        if args.avatar:
+            problems = preflight(path, args.avatar)
+            failed += bool(problems)
+            for problem in problems:
+                print(f"  ❌ {problem}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
-import subprocess
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
-import tempfile
+import queue
+import shutil
 import webbrowser
-import base64
 import threading
+from blender_pool import BlenderPool, JobError, WorkerError
+from preview_server import PreviewServer
+from result_cache import ConversionCache, conversion_key
+
+# Export profiles in glb_export.py; preview/thumbnail decimate, downscale textures and Draco-compress
+GLB_PROFILES = ["preview", "thumbnail", "full"]
 
 class FBXViewerApp:
     def __init__(self, root):
@@ -14,8 +19,16 @@ class FBXViewerApp:
 
         self.fbx_path = tk.StringVar()
         self.blender_path = tk.StringVar()
+        self.profile = tk.StringVar(value="preview")
+        self.status_text = tk.StringVar(value="")
+        self.pool = None
+        self.server = None
+        self.conversions = ConversionCache()
+        self.conversions.clean_scratch()
+        self.ui_calls = queue.Queue()  # Tk may only be touched from the main thread
 
         self._build_gui()
+        self.root.after(100, self.poll_ui_calls)
 
     def _build_gui(self):
         row = 0
@@ -30,7 +43,13 @@ class FBXViewerApp:
         add_row("FBX File:", self.fbx_path, self.select_fbx)
         add_row("Blender Executable:", self.blender_path, self.select_blender)
 
+        tk.Label(self.root, text="Profile:").grid(row=row, column=0, sticky='e', padx=5, pady=5)
+        tk.OptionMenu(self.root, self.profile, *GLB_PROFILES).grid(row=row, column=1, sticky='w', padx=5, pady=5)
+        row += 1
+
         tk.Button(self.root, text="Convert & Preview", command=self.run_conversion, width=30, bg="#2196F3", fg="white").grid(row=row, column=0, columnspan=3, pady=15)
+        row += 1
+        tk.Label(self.root, textvariable=self.status_text).grid(row=row, column=0, columnspan=3, pady=(0, 10))
 
     def select_fbx(self):
         file = filedialog.askopenfilename(title="Select FBX", filetypes=[("FBX Files", "*.fbx")])
@@ -42,106 +61,94 @@ class FBXViewerApp:
         if exe:
             self.blender_path.set(exe)
 
-    def run_conversion(self):
-        threading.Thread(target=self._convert_and_preview).start()
+    # --- Calls from the conversion thread, run by the Tk loop ---
+    def call_in_ui(self, fn):
+        self.ui_calls.put(fn)
+
+    def poll_ui_calls(self):
+        while True:
+            try:
+                fn = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            fn()
+        self.root.after(100, self.poll_ui_calls)
+
+    def show_error(self, title, message):
+        self.call_in_ui(lambda: messagebox.showerror(title, message))
 
-    def _convert_and_preview(self):
+    def set_status(self, text):
+        self.call_in_ui(lambda: self.status_text.set(text))
+
+    def run_conversion(self):
         fbx = self.fbx_path.get()
         blender = self.blender_path.get()
-
         if not all([fbx, blender]):
             messagebox.showerror("Missing Info", "Please select both FBX and Blender executable.")
             return
+        threading.Thread(target=self._convert_and_preview, args=(fbx, blender, self.profile.get()), daemon=True).start()
 
-        tmp_dir = tempfile.mkdtemp()
-        glb_path = os.path.join(tmp_dir, "model.glb")
-        blender_script = os.path.join(tmp_dir, "convert.py")
-
-        # Write Blender script
-        with open(blender_script, "w") as f:
-            f.write(f"""
-import bpy
-bpy.ops.wm.read_factory_settings(use_empty=True)
-bpy.ops.import_scene.fbx(filepath=r"{fbx}")
-bpy.ops.export_scene.gltf(filepath=r"{glb_path}", export_format='GLB', export_yup=True)
-bpy.ops.wm.quit_blender()
-""")
-
-        # Run Blender
+    def _convert_and_preview(self, fbx, blender, profile):
+        # Runs on its own thread: Tk variables and dialogs are only reached through call_in_ui
+        # An unchanged FBX converted with the same profile is served straight from the cache
         try:
-            subprocess.run([blender, "--background", "--python", blender_script], check=True)
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Blender failed:\n{e}")
+            key = conversion_key(fbx, profile)
+        except OSError as e:
+            self.show_error("Error", str(e))
             return
-
-        # Read GLB and encode as base64
-        with open(glb_path, "rb") as f:
-            glb_b64 = base64.b64encode(f.read()).decode("utf-8")
-
-        # Create HTML viewer
-        html_path = os.path.join(tmp_dir, "viewer.html")
-        with open(html_path, "w") as f:
-            f.write(self._build_html_viewer(glb_b64))
-
-        webbrowser.open(f"file:///{html_path.replace(os.sep, '/')}")
-
-    def _build_html_viewer(self, glb_b64):
-        return f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>GLB Viewer</title>
-    <style>body {{ margin: 0; overflow: hidden; }}</style>
-</head>
-<body>
-<script type="module">
-import * as THREE from "https://cdn.jsdelivr.net/npm/three@0.158.0/build/three.module.js";
-import {{ OrbitControls }} from "https://cdn.jsdelivr.net/npm/three@0.158.0/examples/jsm/controls/OrbitControls.js";
-import {{ GLTFLoader }} from "https://cdn.jsdelivr.net/npm/three@0.158.0/examples/jsm/loaders/GLTFLoader.js";
-
-const scene = new THREE.Scene();
-scene.background = new THREE.Color(0xf0f0f0);
-const camera = new THREE.PerspectiveCamera(70, window.innerWidth/window.innerHeight, 0.1, 1000);
-camera.position.set(0, 1.5, 3);
-
-const renderer = new THREE.WebGLRenderer({{ antialias: true }});
-renderer.setSize(window.innerWidth, window.innerHeight);
-document.body.appendChild(renderer.domElement);
-
-const controls = new OrbitControls(camera, renderer.domElement);
-controls.enableDamping = true;
-
-const light1 = new THREE.HemisphereLight(0xffffff, 0x444444, 1.2);
-scene.add(light1);
-
-const loader = new GLTFLoader();
-const b64 = "{glb_b64}";
-const arrayBuffer = Uint8Array.from(atob(b64), c => c.charCodeAt(0)).buffer;
-
-loader.parse(arrayBuffer, '', gltf => {{
-    scene.add(gltf.scene);
-}}, console.error);
-
-function animate() {{
-    requestAnimationFrame(animate);
-    controls.update();
-    renderer.render(scene, camera);
-}}
-animate();
-
-window.addEventListener('resize', () => {{
-    camera.aspect = window.innerWidth / window.innerHeight;
-    camera.updateProjectionMatrix();
-    renderer.setSize(window.innerWidth, window.innerHeight);
-}});
-</script>
-</body>
-</html>
-"""
+        glb_path = self.conversions.lookup(key)
+        if glb_path:
+            self.set_status(f"{profile}: cached GLB")
+        else:
+            glb_path = self.convert(fbx, blender, profile, key)
+            if glb_path is None:
+                return
+
+        # The local server streams the GLB from disk to the viewer
+        webbrowser.open(self.get_server().publish(glb_path, title=os.path.basename(fbx)))
+
+    def convert(self, fbx, blender, profile, key):
+        # Convert on a warm Blender worker into a scratch dir inside the cache, then move the GLB in
+        scratch = self.conversions.scratch_dir()
+        try:
+            report = self.get_pool(blender).run("convert_glb", {"fbx": fbx, "glb": os.path.join(scratch, "model.glb"),
+                                                                "profile": profile})
+            glb_path = self.conversions.store(key, report["glb"], label=f"{os.path.basename(fbx)} ({profile})")
+        except (JobError, WorkerError, OSError) as e:
+            self.show_error("Error", f"Blender failed:\n{e}")
+            return None
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        self.set_status(self.format_report(report))
+        return glb_path
+
+    def format_report(self, report):
+        mb = 1024 ** 2
+        return (f"{report['profile']}: {report['fbx_bytes'] / mb:.1f} MB FBX -> {report['glb_bytes'] / mb:.1f} MB GLB "
+                f"({report['glb_bytes'] / max(1, report['fbx_bytes']) - 1:+.0%})")
+
+    def get_pool(self, blender):
+        if self.pool is None or self.pool.blender_exe != blender:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False)
+            self.pool = BlenderPool(blender, size=1)
+        return self.pool
+
+    def get_server(self):
+        if self.server is None:
+            self.server = PreviewServer()
+        return self.server
+
+    def on_close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+        if self.server is not None:
+            self.server.shutdown()
+        self.root.destroy()
 
 # Run it
 if __name__ == "__main__":
     root = tk.Tk()
     app = FBXViewerApp(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
@@ -0,0 +1,121 @@
+import bpy
+import os
+import sys
+import argparse
+import numpy as np
+
+# "full" is the original full-fidelity export; the others trade detail for download size and GPU memory.
+# Draco is the only geometry compression Blender's glTF exporter offers (no meshopt).
+EXPORT_PROFILES = {
+    "full": {"triangles": None, "max_texture": None, "image_format": "AUTO", "draco": False},
+    "preview": {"triangles": 100000, "max_texture": 1024, "image_format": "JPEG", "draco": True},
+    "thumbnail": {"triangles": 20000, "max_texture": 512, "image_format": "JPEG", "draco": True},
+}
+
+
+def count_triangles(meshes):
+    total = 0
+    for obj in meshes:
+        loop_totals = np.empty(len(obj.data.polygons), dtype=np.int32)
+        obj.data.polygons.foreach_get("loop_total", loop_totals)
+        total += int((loop_totals - 2).sum())
+    return total
+
+
+# --- Mesh decimation ---
+def decimate_meshes(meshes, triangle_budget):
+    total = count_triangles(meshes)
+    if not total or total <= triangle_budget:
+        return
+    ratio = triangle_budget / total
+    for obj in meshes:
+        if obj.data.shape_keys:
+            # Modifiers can't be applied over shape keys; keep these meshes intact
+            print(f"⚠️ Not decimating {obj.name}: it has shape keys")
+            continue
+        modifier = obj.modifiers.new("PreviewDecimate", 'DECIMATE')
+        modifier.decimate_type = 'COLLAPSE'
+        modifier.ratio = ratio
+        with bpy.context.temp_override(object=obj, active_object=obj):
+            bpy.ops.object.modifier_move_to_index(modifier=modifier.name, index=0)
+            bpy.ops.object.modifier_apply(modifier=modifier.name)
+
+
+# --- Texture downscaling ---
+def downscale_textures(max_size):
+    pixels_before = pixels_after = 0
+    for image in bpy.data.images:
+        width, height = image.size
+        pixels_before += width * height
+        if max(width, height) > max_size:
+            scale = max_size / max(width, height)
+            width, height = max(1, int(width * scale)), max(1, int(height * scale))
+            image.scale(width, height)
+        pixels_after += width * height
+    return pixels_before, pixels_after
+
+
+def export_glb(glb_path, profile):
+    if os.path.lexists(glb_path):
+        os.remove(glb_path)  # Never overwrite in place; the old file may be shared with a cache entry
+    options = {"filepath": glb_path, "export_format": 'GLB', "export_yup": True}
+    if profile["image_format"] != "AUTO":
+        options["export_image_format"] = profile["image_format"]
+        options["export_jpeg_quality"] = 80
+    if profile["draco"]:
+        options.update(
+            export_draco_mesh_compression_enable=True,
+            export_draco_mesh_compression_level=6,
+            export_draco_position_quantization=14,
+            export_draco_normal_quantization=10,
+            export_draco_texcoord_quantization=12,
+        )
+    bpy.ops.export_scene.gltf(**options)
+
+
+def convert_fbx_to_glb(fbx_path, glb_path, profile_name="full"):
+    profile = EXPORT_PROFILES[profile_name]
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    bpy.ops.import_scene.fbx(filepath=fbx_path)
+
+    meshes = [obj for obj in bpy.context.scene.objects if obj.type == 'MESH']
+    triangles_before = count_triangles(meshes)
+    if profile["triangles"]:
+        decimate_meshes(meshes, profile["triangles"])
+    pixels = downscale_textures(profile["max_texture"]) if profile["max_texture"] else None
+    export_glb(glb_path, profile)
+
+    report = {
+        "glb": glb_path,
+        "profile": profile_name,
+        "fbx_bytes": os.path.getsize(fbx_path),
+        "glb_bytes": os.path.getsize(glb_path),
+        "triangles_before": triangles_before,
+        "triangles_after": count_triangles(meshes),
+    }
+    if pixels:
+        report["texture_pixels_before"], report["texture_pixels_after"] = pixels
+    print(format_report(report))
+    return report
+
+
+def format_report(report):
+    mb = 1024 ** 2
+    text = (f"✅ GLB ({report['profile']}): {report['fbx_bytes'] / mb:.1f} MB FBX -> {report['glb_bytes'] / mb:.1f} MB "
+            f"({report['glb_bytes'] / max(1, report['fbx_bytes']) - 1:+.0%}), "
+            f"{report['triangles_before']} -> {report['triangles_after']} triangles")
+    if "texture_pixels_before" in report:
+        text += f", textures {report['texture_pixels_before'] / 1e6:.1f} -> {report['texture_pixels_after'] / 1e6:.1f} MP"
+    return text
+
+
+if __name__ == "__main__":
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    parser = argparse.ArgumentParser(prog="glb_export.py")
+    parser.add_argument("fbx")
+    parser.add_argument("glb")
+    parser.add_argument("--profile", choices=sorted(EXPORT_PROFILES), default="full")
+    args = parser.parse_args(argv)
+    convert_fbx_to_glb(args.fbx, args.glb, args.profile)
+    bpy.ops.wm.quit_blender()
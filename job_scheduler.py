@@ -0,0 +1,496 @@
+import argparse
+import heapq
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+
+import fbx_reader
+from blender_pool import JobError, WorkerError
+from bone_mapping import load_user_map
+from progress_events import ProgressTracker, format_timings, parse_line
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RUNNER_SCRIPT = os.path.join(SCRIPT_DIR, "pose_transfer_runner.py")
+PREVIEW_SCRIPT = os.path.join(SCRIPT_DIR, "preview_render.py")
+GLB_SCRIPT = os.path.join(SCRIPT_DIR, "glb_export.py")
+STUB_SCRIPT = os.path.join(SCRIPT_DIR, "stub_blender.py")
+
+# Blender exits 0 even when a --python script raises unless told otherwise; with --python-exit-code 1
+# an uncaught exception exits 1, like the scripts' own exit for bad input (e.g. no armature).
+# 2 is argparse rejecting the command line. Retrying won't help either.
+PYTHON_EXIT_CODE = 1
+PERMANENT_EXIT_CODES = {1, 2}
+
+
+class TransientJobError(Exception):
+    pass
+
+
+# --- Sizing ---
+def available_memory_bytes():
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_concurrency(memory_per_job_gb=2.0):
+    cores = os.cpu_count() or 1
+    memory = available_memory_bytes()
+    if memory:
+        return max(1, min(cores, int(memory // (memory_per_job_gb * 1024 ** 3))))
+    return cores
+
+
+# --- Blender command lines (same argv contract as the UI) ---
+def preview_flags(args):
+    flags = []
+    if args.get("preview") is False:
+        flags.append("--no-preview")
+    elif args.get("preview") is True and args.get("output_format", "fbx") != "fbx":
+        flags.append("--preview")  # Skeleton-only outputs skip the preview unless asked
+    if args.get("preview_preset"):
+        flags += ["--preview-preset", args["preview_preset"]]
+    if args.get("preview_views", "front") != "front":
+        flags += ["--preview-views", str(args["preview_views"])]
+    return flags
+
+
+def animation_flags(args):
+    flags = []
+    if args.get("frames"):
+        flags += ["--frames", str(args["frames"])]
+        for key in ("frame_step", "max_frames", "reduce_tolerance"):
+            if args.get(key):
+                flags += ["--" + key.replace("_", "-"), str(args[key])]
+    return flags
+
+
+def output_flags(args):
+    if args.get("output_format", "fbx") != "fbx":
+        return ["--output-format", args["output_format"]]
+    return []
+
+
+def build_command(kind, args, blender_exe, blender_command=None):
+    # --python-exit-code only applies to scripts given after it
+    prefix = list(blender_command or [blender_exe]) + ["--python-exit-code", str(PYTHON_EXIT_CODE)]
+    if kind == "pose_transfer":
+        return prefix + ["--background", "--python", RUNNER_SCRIPT, "--",
+                         args["pose_fbx"], args["avatar_fbx"], args["export_path"], blender_exe, args["output_name"]
+                         ] + output_flags(args) + preview_flags(args) + animation_flags(args)
+    if kind == "render_preview":
+        return prefix + ["--background", "--python", PREVIEW_SCRIPT, "--", args["fbx"], args["image"]] + preview_flags(args)
+    if kind == "convert_glb":
+        return prefix + ["--background", "--python", GLB_SCRIPT, "--", args["fbx"], args["glb"],
+                         "--profile", args.get("profile", "full")]
+    raise ValueError(f"Unknown job kind: {kind}")
+
+
+def stub_command():
+    return [sys.executable, STUB_SCRIPT]
+
+
+def popen_group_kwargs():
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process):
+    if process.poll() is not None:
+        return
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    process.wait()
+
+
+# --- Jobs ---
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, args, priority=0, timeout=None, retries=None, name=None, on_done=None, on_output=None,
+                 on_progress=None):
+        self.id = next(Job._ids)
+        self.kind = kind
+        self.args = args
+        self.priority = priority  # Lower runs first
+        self.timeout = timeout
+        self.retries = retries
+        self.name = name or args.get("output_name") or f"{kind}-{self.id}"
+        self.on_done = on_done
+        self.on_output = on_output
+        self.on_progress = on_progress  # Called as on_progress(job, event) for each progress event
+        self.progress = ProgressTracker()
+
+        self.state = "queued"
+        self.cancelled = False
+        self.attempts = 0
+        self.error = None
+        self.result = None
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+        self.enqueued_at = self.submitted_at
+        self.started_at = None
+        self.finished_at = None
+        self.queue_wait = 0.0
+        self.run_time = 0.0
+        self._process = None  # Blender subprocess or pool future of the running attempt
+        self._pool_future = None
+
+
+class JobScheduler:
+    def __init__(self, blender_exe=None, max_workers=None, retries=2, backoff=2.0, timeout=None,
+                 pool=None, blender_command=None, preflight=True):
+        self.blender_exe = blender_exe
+        self.max_workers = max_workers or default_concurrency()
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool = pool
+        self.blender_command = blender_command
+        self.preflight = preflight
+
+        self.jobs = []
+        self._ready = []
+        self._delayed = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(self.max_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job):
+        problems = self.check(job) if self.preflight else []
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            if job.retries is None:
+                job.retries = self.retries
+            if job.timeout is None:
+                job.timeout = self.timeout
+            self.jobs.append(job)
+            if not problems:
+                heapq.heappush(self._ready, (job.priority, next(self._seq), job))
+                self._cond.notify()
+        if problems:
+            # Fails without ever starting Blender
+            self._finish(job, error="; ".join(problems))
+        return job
+
+    def check(self, job):
+        # Preflight: read both skeletons straight from the FBX files, no Blender needed
+        if job.kind != "pose_transfer" or not job.args.get("pose_fbx"):
+            return []
+        try:
+            user_map = load_user_map(job.args.get("bone_map"))
+        except (OSError, ValueError) as e:
+            return [f"Bone map can't be read: {e}"]
+        return fbx_reader.preflight(job.args["pose_fbx"], job.args["avatar_fbx"], user_map)
+
+    def cancel(self, job):
+        # Queued or retrying jobs are dropped; a running job has its Blender process tree killed
+        with self._cond:
+            if job.state in ("done", "failed", "cancelled"):
+                return False
+            job.cancelled = True
+            dropped = job.state != "running"
+            if dropped:
+                self._ready = [entry for entry in self._ready if entry[2] is not job]
+                heapq.heapify(self._ready)
+                self._delayed = [entry for entry in self._delayed if entry[1] is not job]
+                job.state = "cancelled"
+            process, pool_future = job._process, job._pool_future
+        if dropped:
+            self._finish(job, cancelled=True)
+        elif process is not None:
+            kill_process_tree(process)
+        elif pool_future is not None:
+            self.pool.cancel(pool_future)
+        return True
+
+    def pending(self):
+        with self._cond:
+            return sum(1 for job in self.jobs if job.state in ("queued", "running", "retrying"))
+
+    # --- Dispatch ---
+    def _next_job(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                for entry in [d for d in self._delayed if d[0] <= now]:
+                    self._delayed.remove(entry)
+                    heapq.heappush(self._ready, (entry[1].priority, next(self._seq), entry[1]))
+                if self._ready:
+                    job = heapq.heappop(self._ready)[2]
+                    job.state = "running"  # Under the lock, so cancel() knows to kill it instead
+                    return job
+                if self._closed and not self._delayed:
+                    return None  # Shutting down lets queued jobs and pending retries run first
+                wait = min(d[0] for d in self._delayed) - now if self._delayed else None
+                self._cond.wait(timeout=wait)
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job):
+        job.attempts += 1
+        now = time.monotonic()
+        job.queue_wait += now - job.enqueued_at
+        if job.started_at is None:
+            job.started_at = now
+        job.progress = ProgressTracker()  # Timings of a failed attempt don't count
+
+        try:
+            if self.pool is not None:
+                result = self._run_on_pool(job)
+            else:
+                result = self._run_subprocess(job)
+        except Exception as e:
+            job.run_time += time.monotonic() - now
+            if job.cancelled:
+                self._finish(job, cancelled=True)
+            elif isinstance(e, TransientJobError) and job.attempts <= job.retries:
+                delay = self.backoff * 2 ** (job.attempts - 1)
+                print(f"⚠️ {job.name} failed ({e}), retrying in {delay:.1f}s")
+                with self._cond:
+                    job.state = "retrying"
+                    job.enqueued_at = time.monotonic()
+                    self._delayed.append((job.enqueued_at + delay, job))
+                    self._cond.notify()
+            else:
+                self._finish(job, error=str(e))
+            return
+
+        job.run_time += time.monotonic() - now
+        self._finish(job, result=result)
+
+    def _run_on_pool(self, job):
+        job._pool_future = self.pool.submit(job.kind, job.args, timeout=job.timeout,
+                                            on_output=lambda line: self._output(job, line))
+        if job.cancelled:
+            self.pool.cancel(job._pool_future)
+        try:
+            return job._pool_future.result()
+        except CancelledError:
+            raise JobError("cancelled")
+        except WorkerError as e:
+            raise TransientJobError(str(e))
+
+    def _run_subprocess(self, job):
+        cmd = build_command(job.kind, job.args, self.blender_exe, self.blender_command)
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            **popen_group_kwargs()
+        )
+        job._process = process
+        if job.cancelled:
+            kill_process_tree(process)
+        timed_out = threading.Event()
+
+        def on_timeout():
+            timed_out.set()
+            kill_process_tree(process)
+
+        timer = threading.Timer(job.timeout, on_timeout) if job.timeout else None
+        if timer:
+            timer.start()
+        try:
+            for line in process.stdout:
+                self._output(job, line.rstrip("\n"))
+            returncode = process.wait()
+        finally:
+            job._process = None
+            if timer:
+                timer.cancel()
+
+        if timed_out.is_set():
+            raise TransientJobError(f"timed out after {job.timeout}s")
+        if returncode in PERMANENT_EXIT_CODES:
+            raise JobError(f"Blender exited with code {returncode}")
+        if returncode != 0:
+            raise TransientJobError(f"Blender exited with code {returncode}")
+        return {"returncode": returncode}
+
+    def _output(self, job, line):
+        # Progress events update the job; everything else is Blender's own log output
+        event = parse_line(line)
+        if event is None:
+            if job.on_output:
+                job.on_output(line)
+            else:
+                sys.stdout.write(line + "\n")
+            return
+        job.progress.update(event)
+        if job.on_progress:
+            job.on_progress(job, event)
+
+    def _finish(self, job, result=None, error=None, cancelled=False):
+        job.finished_at = time.monotonic()
+        job.result = result
+        job.error = error
+        if cancelled:
+            job.state = "cancelled"
+            print(f"🛑 {job.name}: cancelled")
+            job.future.cancel()
+        elif error:
+            job.state = "failed"
+            print(f"❌ {job.name}: {error}")
+            job.future.set_exception(JobError(error))
+        else:
+            job.state = "done"
+            job.future.set_result(result)
+        if job.on_done:
+            job.on_done(job)
+
+    # --- Lifecycle ---
+    def wait(self):
+        for job in list(self.jobs):
+            try:
+                job.future.result()
+            except Exception:
+                pass
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        # New submits are refused; jobs already queued still run unless cancel_pending drops them
+        with self._cond:
+            self._closed = True
+            pending = [job for job in self.jobs if job.state in ("queued", "retrying")] if cancel_pending else []
+            self._cond.notify_all()
+        for job in pending:
+            self.cancel(job)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    # --- Reporting ---
+    def report(self):
+        finished = [job for job in self.jobs if job.finished_at is not None]
+        succeeded = [job for job in finished if job.state == "done"]
+        cancelled = [job for job in finished if job.state == "cancelled"]
+        report = {
+            "jobs": len(self.jobs),
+            "succeeded": len(succeeded),
+            "failed": len(finished) - len(succeeded) - len(cancelled),
+            "cancelled": len(cancelled),
+            "retries": sum(max(0, job.attempts - 1) for job in self.jobs),
+            "concurrency": self.max_workers,
+            "jobs_per_minute": 0.0,
+            "queue_wait_avg": 0.0,
+            "queue_wait_max": 0.0,
+            "run_time_avg": 0.0,
+            "wall_time": 0.0,
+            "stage_avg": {},
+        }
+        if finished:
+            wall = max(job.finished_at for job in finished) - min(job.submitted_at for job in finished)
+            report["wall_time"] = wall
+            report["jobs_per_minute"] = len(succeeded) / (wall / 60.0) if wall > 0 else 0.0
+            report["queue_wait_avg"] = sum(job.queue_wait for job in finished) / len(finished)
+            report["queue_wait_max"] = max(job.queue_wait for job in finished)
+            report["run_time_avg"] = sum(job.run_time for job in finished) / len(finished)
+        totals = {}
+        for job in succeeded:
+            for stage, elapsed in job.progress.timings.items():
+                totals[stage] = totals.get(stage, 0.0) + elapsed
+        report["stage_avg"] = {stage: total / len(succeeded) for stage, total in totals.items()}
+        return report
+
+
+def format_report(report):
+    text = (
+        f"{report['succeeded']}/{report['jobs']} jobs succeeded ({report['failed']} failed, {report['retries']} retries) "
+        f"on {report['concurrency']} slots in {report['wall_time']:.1f}s\n"
+        f"Throughput: {report['jobs_per_minute']:.1f} jobs/min | "
+        f"Queue wait avg {report['queue_wait_avg']:.1f}s, max {report['queue_wait_max']:.1f}s | "
+        f"Run time avg {report['run_time_avg']:.1f}s"
+    )
+    if report["stage_avg"]:
+        text += f"\nStage avg: {format_timings(report['stage_avg'])}"
+    return text
+
+
+# --- CLI: schedule a batch manifest ---
+def main():
+    import pose_similarity
+    from batch_manifest import load_manifest
+
+    parser = argparse.ArgumentParser(description="Run pose transfer jobs N at a time with timeouts and retries")
+    parser.add_argument("manifest", help="JSON/CSV manifest of pose/avatar jobs")
+    parser.add_argument("--blender", help="Blender executable")
+    parser.add_argument("--export-path", help="Default export folder for manifest jobs")
+    parser.add_argument("--jobs", type=int, default=None, help="Concurrent Blender processes (default: cores/memory)")
+    parser.add_argument("--timeout", type=float, default=None, help="Kill a job after this many seconds")
+    parser.add_argument("--retries", type=int, default=2, help="Retries for timeouts and crashes")
+    parser.add_argument("--backoff", type=float, default=2.0, help="Initial retry delay in seconds (doubles each retry)")
+    parser.add_argument("--report", help="Write the summary report as JSON to this file")
+    parser.add_argument("--stub", action="store_true", help="Use the Blender stand-in instead of Blender")
+    parser.add_argument("--no-preflight", action="store_true", help="Don't check the FBX files before scheduling")
+    parser.add_argument("--dedupe-poses", choices=sorted(pose_similarity.DEDUPE_MODES),
+                        help="Near-identical poses: skip their transfers, or collapse them onto one run and copy its outputs")
+    parser.add_argument("--pose-tolerance", type=float, default=pose_similarity.DEFAULT_TOLERANCE,
+                        help="Degrees every bone may differ by for two poses to count as the same")
+    args = parser.parse_args()
+
+    if not args.stub and not args.blender:
+        parser.error("--blender is required unless --stub is given")
+
+    manifest_jobs = load_manifest(args.manifest, export_path=args.export_path, blender_exe=args.blender)
+    repeats = []
+    if args.dedupe_poses:
+        # Decided from the FBX files alone, before any Blender work is queued
+        index = pose_similarity.fbx_index(list(dict.fromkeys(entry["pose_fbx"] for entry in manifest_jobs)))
+        manifest_jobs, repeats = pose_similarity.dedupe_jobs(manifest_jobs, index, args.pose_tolerance)
+        pose_similarity.print_dedupe(manifest_jobs, repeats, args.dedupe_poses)
+    scheduler = JobScheduler(
+        args.blender or sys.executable,
+        max_workers=args.jobs,
+        retries=args.retries,
+        backoff=args.backoff,
+        timeout=args.timeout,
+        blender_command=stub_command() if args.stub else None,
+        preflight=not args.no_preflight,
+    )
+    submitted = {}
+    for entry in manifest_jobs:
+        job_args = {key: entry[key] for key in ("pose_fbx", "avatar_fbx", "export_path", "output_name")}
+        os.makedirs(entry["export_path"], exist_ok=True)
+        submitted[id(entry)] = scheduler.submit(Job("pose_transfer", job_args, priority=entry.get("priority", 0)))
+
+    scheduler.wait()
+    scheduler.shutdown()
+    report = scheduler.report()
+    print(format_report(report))
+    if args.dedupe_poses == "collapse":
+        copied = sum(1 for entry, leader in repeats
+                     if submitted[id(leader)].state == "done" and pose_similarity.copy_outputs(entry, leader))
+        print(f"🧬 Copied outputs to {copied}/{len(repeats)} collapsed transfers")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
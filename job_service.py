@@ -0,0 +1,431 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fbx_reader
+from batch_manifest import OUTPUT_FORMATS
+from blender_pool import BlenderPool, worker_command
+from job_scheduler import Job, JobScheduler
+from preview_views import view_angles
+from result_cache import (ConversionCache, DEFAULT_CACHE_DIR, ResultCache, VIEWS_SUFFIX, clone_or_copy,
+                          conversion_key, transfer_key, view_files)
+
+# Local HTTP front end to one machine's Blender capacity. Every request gets a ticket; tickets whose
+# inputs and settings hash to the same cache key share one Blender run, and finished results land in
+# the result/conversion caches, so a repeat request is answered without Blender at all.
+#
+#   POST /jobs                      {"kind": "pose_transfer"|"convert_glb", "args": {...}, "priority": 0}
+#   GET  /jobs                      all tickets
+#   GET  /jobs/<id>?wait=S&since=V  status; long-polls until the ticket changes past version V (or finishes)
+#   GET  /jobs/<id>/result?wait=S   200 with files once done, 202 while queued/running
+#   POST /jobs/<id>/cancel          (or DELETE /jobs/<id>) cancel; the Blender run stops once nobody waits on it
+#   GET  /health                    scheduler, pool and cache counters
+DEFAULT_PORT = 8765
+MAX_WAIT = 60.0
+TICKET_TTL = 3600.0  # Finished tickets are forgotten after this many seconds
+GLB_PROFILES = ["full", "preview", "thumbnail"]
+ANIMATION_OPTIONS = ("frames", "frame_step", "max_frames", "reduce_tolerance")
+FINISHED = ("done", "failed", "cancelled")
+
+
+class RequestError(Exception):
+    pass
+
+
+def transfer_params(args):
+    # Only the settings that change the output; same defaults as the UI, so both share cache entries
+    output_format = args.get("output_format", "fbx")
+    params = {"preview": args.get("preview", output_format == "fbx"),
+              "preview_preset": args.get("preview_preset", "standard")}
+    if output_format != "fbx":
+        params["output_format"] = output_format
+    if args.get("preview_views", "front") != "front":
+        params["preview_views"] = str(args["preview_views"])
+    params.update({key: args[key] for key in ANIMATION_OPTIONS if args.get(key)})
+    return params
+
+
+# --- One Blender run shared by every ticket with the same key ---
+class Run:
+    def __init__(self, kind, key, scratch):
+        self.kind = kind
+        self.key = key
+        self.scratch = scratch
+        self.job = None
+        self.tickets = []
+
+
+class JobService:
+    def __init__(self, scheduler, result_cache, conversion_cache):
+        self.scheduler = scheduler
+        self.result_cache = result_cache
+        self.conversion_cache = conversion_cache
+        self.tickets = {}
+        self.runs = {}  # cache key -> Run in flight
+        self.coalesced = 0
+        self._cond = threading.Condition()
+
+    # --- Submission ---
+    def submit(self, kind, args, priority=0):
+        if kind == "pose_transfer":
+            for name in ("pose_fbx", "avatar_fbx"):
+                if not args.get(name) or not os.path.exists(args[name]):
+                    raise RequestError(f"{name} not found: {args.get(name)}")
+            if bool(args.get("export_path")) != bool(args.get("output_name")):
+                raise RequestError("export_path and output_name go together")
+            if args.get("output_format", "fbx") not in OUTPUT_FORMATS:
+                raise RequestError(f"Unknown output format: {args['output_format']}")
+            try:
+                view_angles(args.get("preview_views", "front"))
+            except ValueError as e:
+                raise RequestError(str(e))
+            problems = fbx_reader.preflight(args["pose_fbx"], args["avatar_fbx"])
+            if problems:
+                raise RequestError("; ".join(problems))
+            key = transfer_key(args["pose_fbx"], args["avatar_fbx"], transfer_params(args))
+        elif kind == "convert_glb":
+            if not args.get("fbx") or not os.path.exists(args["fbx"]):
+                raise RequestError(f"fbx not found: {args.get('fbx')}")
+            if args.setdefault("profile", "preview") not in GLB_PROFILES:
+                raise RequestError(f"Unknown GLB profile: {args['profile']}")
+            key = conversion_key(args["fbx"], args["profile"])
+        else:
+            raise RequestError(f"Unknown job kind: {kind}")
+
+        ticket = {
+            "id": uuid.uuid4().hex[:12],
+            "kind": kind,
+            "args": args,
+            "key": key,
+            "state": "queued",
+            "version": 0,
+            "coalesced": False,
+            "cached": False,
+            "created": time.time(),
+            "finished": None,
+            "error": None,
+            "files": None,
+        }
+        with self._cond:
+            self._prune()
+            self.tickets[ticket["id"]] = ticket
+            run = self.runs.get(key)
+            if run is not None:
+                run.tickets.append(ticket)
+                ticket["coalesced"] = True
+                ticket["state"] = run.job.state
+                self.coalesced += 1
+                return ticket
+
+        cached = self.lookup(kind, key)
+        if cached is not None:
+            ticket["cached"] = True
+            self._deliver(ticket, cached)
+            return ticket
+        with self._cond:
+            run = self.runs.get(key)  # Someone started it while we checked the cache
+            if run is not None:
+                run.tickets.append(ticket)
+                ticket["coalesced"] = True
+                self.coalesced += 1
+                return ticket
+            self._start(kind, key, args, priority, ticket)
+        return ticket
+
+    def lookup(self, kind, key):
+        if kind == "pose_transfer":
+            return self.result_cache.get(key)
+        glb = self.conversion_cache.lookup(key)
+        return {"model.glb": glb} if glb else None
+
+    def _start(self, kind, key, args, priority, ticket):
+        # Runs write into a scratch dir next to the cache, so results are moved in rather than copied
+        if kind == "pose_transfer":
+            scratch = self.result_cache.scratch_dir()
+            job_args = dict(transfer_params(args), pose_fbx=args["pose_fbx"], avatar_fbx=args["avatar_fbx"],
+                            export_path=scratch, output_name="result")
+            name = args.get("output_name") or os.path.splitext(os.path.basename(args["pose_fbx"]))[0]
+        else:
+            scratch = self.conversion_cache.scratch_dir()
+            job_args = {"fbx": args["fbx"], "glb": os.path.join(scratch, "model.glb"), "profile": args["profile"]}
+            name = os.path.splitext(os.path.basename(args["fbx"]))[0]
+        run = Run(kind, key, scratch)
+        run.job = Job(kind, job_args, priority=priority, name=name,
+                      on_done=lambda job: self._run_done(run), on_progress=lambda job, event: self._touch(run))
+        run.tickets.append(ticket)
+        self.runs[key] = run
+        self.scheduler.submit(run.job)
+        return run
+
+    # --- Completion ---
+    def _touch(self, run):
+        with self._cond:
+            for ticket in run.tickets:
+                if ticket["state"] != "cancelled":
+                    ticket["state"] = run.job.state
+                    ticket["version"] += 1
+            self._cond.notify_all()
+
+    def _run_done(self, run):
+        job = run.job
+        with self._cond:
+            self.runs.pop(run.key, None)
+            tickets = list(run.tickets)
+
+        cached, error = None, job.error
+        if job.state == "done":
+            try:
+                if run.kind == "pose_transfer":
+                    # result.<ext> for the requested output format, plus result.png when a preview was rendered
+                    # and view_<angle>.png for multi-view previews
+                    files = {name: os.path.join(run.scratch, name) for name in os.listdir(run.scratch)
+                             if name.startswith("result.")}
+                    files.update(view_files(os.path.join(run.scratch, f"result{VIEWS_SUFFIX}")))
+                    cached = self.result_cache.put(run.key, files, label=job.name, move=True)
+                else:
+                    cached = {"model.glb": self.conversion_cache.store(run.key, job.args["glb"], label=job.name)}
+            except OSError as e:
+                error = f"Could not store result: {e}"
+        shutil.rmtree(run.scratch, ignore_errors=True)
+
+        for ticket in tickets:
+            if cached is not None:
+                self._deliver(ticket, cached)
+            else:
+                self._update(ticket, "cancelled" if job.state == "cancelled" else "failed", error=error)
+
+    def _deliver(self, ticket, cached):
+        # Copies (reflinks where possible) into the requested destination; without one, the cached
+        # files are returned as-is and stay valid until the cache evicts them
+        args = ticket["args"]
+        try:
+            if ticket["kind"] == "pose_transfer":
+                # Keyed by extension: {"fbx": ..., "png": ...}, {"bvh": ...}, {"npz": ...}; views as a list
+                files = {os.path.splitext(name)[1][1:]: path for name, path in cached.items()
+                         if not name.startswith("view_")}
+                views = {name[len("view_"):]: path for name, path in sorted(cached.items()) if name.startswith("view_")}
+                if args.get("export_path"):
+                    os.makedirs(args["export_path"], exist_ok=True)
+                    for ext, path in files.items():
+                        dst = os.path.join(args["export_path"], f"{args['output_name']}.{ext}")
+                        clone_or_copy(path, dst)
+                        files[ext] = dst
+                    views_dir = os.path.join(args["export_path"], f"{args['output_name']}{VIEWS_SUFFIX}")
+                    if views:
+                        os.makedirs(views_dir, exist_ok=True)
+                    for name, path in views.items():
+                        clone_or_copy(path, os.path.join(views_dir, name))
+                        views[name] = os.path.join(views_dir, name)
+                if views:
+                    files["views"] = list(views.values())
+            else:
+                files = {"glb": cached["model.glb"]}
+                if args.get("glb"):
+                    os.makedirs(os.path.dirname(os.path.abspath(args["glb"])), exist_ok=True)
+                    clone_or_copy(files["glb"], args["glb"])
+                    files["glb"] = args["glb"]
+        except OSError as e:
+            self._update(ticket, "failed", error=f"Could not deliver result: {e}")
+            return
+        self._update(ticket, "done", files=files)
+
+    def _update(self, ticket, state, error=None, files=None):
+        with self._cond:
+            if ticket["state"] == "cancelled":
+                return
+            ticket.update(state=state, error=error, files=files)
+            if state in FINISHED:
+                ticket["finished"] = time.time()
+            ticket["version"] += 1
+            self._cond.notify_all()
+
+    # --- Queries ---
+    def status(self, ticket_id):
+        with self._cond:
+            ticket = self.tickets.get(ticket_id)
+            if ticket is None:
+                return None
+            status = {k: v for k, v in ticket.items() if k != "args"}
+            run = self.runs.get(ticket["key"])
+            if run is not None and ticket in run.tickets:
+                status["attempts"] = run.job.attempts
+                status["timings"] = dict(run.job.progress.timings)
+                current = run.job.progress.current()
+                if current:
+                    status["stage"], status["stage_elapsed"] = current
+            return status
+
+    def wait(self, ticket_id, since=None, timeout=0.0):
+        # Long-poll: returns once the ticket's version passes `since` (or it finishes), or after timeout
+        deadline = time.monotonic() + min(timeout, MAX_WAIT)
+        with self._cond:
+            while True:
+                ticket = self.tickets.get(ticket_id)
+                if ticket is None or ticket["state"] in FINISHED:
+                    break
+                if since is not None and ticket["version"] > since:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        return self.status(ticket_id)
+
+    def cancel(self, ticket_id):
+        with self._cond:
+            ticket = self.tickets.get(ticket_id)
+            if ticket is None or ticket["state"] in FINISHED:
+                return False
+            run = self.runs.get(ticket["key"])
+            ticket.update(state="cancelled", finished=time.time())
+            ticket["version"] += 1
+            self._cond.notify_all()
+            orphaned = run is not None and ticket in run.tickets and all(
+                t["state"] == "cancelled" for t in run.tickets)
+        if orphaned:
+            self.scheduler.cancel(run.job)
+        return True
+
+    def _prune(self):
+        cutoff = time.time() - TICKET_TTL
+        for ticket_id in [i for i, t in self.tickets.items() if t["finished"] and t["finished"] < cutoff]:
+            del self.tickets[ticket_id]
+
+    def health(self):
+        with self._cond:
+            states = {}
+            for ticket in self.tickets.values():
+                states[ticket["state"]] = states.get(ticket["state"], 0) + 1
+            in_flight = len(self.runs)
+        return {
+            "tickets": states,
+            "runs_in_flight": in_flight,
+            "coalesced": self.coalesced,
+            "scheduler": self.scheduler.report(),
+            "pool": dict(self.scheduler.pool.stats) if self.scheduler.pool else None,
+            "cache": {"results": self.result_cache.stats(), "conversions": self.conversion_cache.stats()},
+        }
+
+
+# --- HTTP ---
+class JobRequestHandler(BaseHTTPRequestHandler):
+    server_version = "PoseTransferJobs/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def parse_path(self):
+        path, _, query = self.path.partition("?")
+        params = dict(part.partition("=")[::2] for part in query.split("&") if part)
+        return [p for p in path.split("/") if p], params
+
+    def do_GET(self):
+        service = self.server.service
+        parts, params = self.parse_path()
+        try:
+            wait = float(params.get("wait", 0))
+            since = int(params["since"]) if "since" in params else None
+        except ValueError:
+            return self.send_json(400, {"error": "wait and since must be numbers"})
+
+        if parts == ["health"]:
+            return self.send_json(200, service.health())
+        if parts == ["jobs"]:
+            return self.send_json(200, {"jobs": [service.status(i) for i in list(service.tickets)]})
+        if len(parts) == 2 and parts[0] == "jobs":
+            status = service.wait(parts[1], since, wait) if wait else service.status(parts[1])
+            return self.send_json(200, status) if status else self.send_json(404, {"error": "unknown job"})
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            status = service.wait(parts[1], None, wait) if wait else service.status(parts[1])
+            if status is None:
+                return self.send_json(404, {"error": "unknown job"})
+            code = {"done": 200, "failed": 500, "cancelled": 410}.get(status["state"], 202)
+            return self.send_json(code, status)
+        self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        service = self.server.service
+        parts, _params = self.parse_path()
+        if parts == ["jobs"]:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                ticket = service.submit(request.get("kind"), dict(request.get("args") or {}),
+                                        int(request.get("priority", 0)))
+            except (ValueError, TypeError, AttributeError) as e:
+                return self.send_json(400, {"error": f"Bad request: {e}"})
+            except (RequestError, OSError) as e:
+                return self.send_json(400, {"error": str(e)})
+            return self.send_json(202, service.status(ticket["id"]))
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            return self.cancel(parts[1])
+        self.send_json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        parts, _params = self.parse_path()
+        if len(parts) == 2 and parts[0] == "jobs":
+            return self.cancel(parts[1])
+        self.send_json(404, {"error": "not found"})
+
+    def cancel(self, ticket_id):
+        service = self.server.service
+        if service.status(ticket_id) is None:
+            return self.send_json(404, {"error": "unknown job"})
+        cancelled = service.cancel(ticket_id)
+        self.send_json(200 if cancelled else 409, service.status(ticket_id))
+
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Serve pose transfer and GLB conversion jobs over local HTTP")
+    parser.add_argument("--blender", help="Blender executable")
+    parser.add_argument("--stub", action="store_true", help="Use the Blender stand-in instead of Blender")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=2, help="Warm Blender workers")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-job timeout in seconds")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Result and conversion cache root")
+    args = parser.parse_args()
+
+    if not args.stub and not args.blender:
+        parser.error("--blender is required unless --stub is given")
+
+    command = worker_command(stub=True) if args.stub else None
+    pool = BlenderPool(args.blender, size=args.workers, command=command)
+    scheduler = JobScheduler(args.blender, max_workers=args.workers, timeout=args.timeout, pool=pool)
+    result_cache = ResultCache(args.cache_dir)
+    conversion_cache = ConversionCache(args.cache_dir)
+    for cache in (result_cache, conversion_cache):
+        cache.clean_scratch()
+
+    httpd = ThreadingHTTPServer((args.host, args.port), JobRequestHandler)
+    httpd.daemon_threads = True
+    httpd.service = JobService(scheduler, result_cache, conversion_cache)
+    print(f"🌐 Job service on http://{httpd.server_address[0]}:{httpd.server_address[1]} "
+          f"({args.workers} worker(s), Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Stopping")
+    finally:
+        httpd.server_close()
+        scheduler.shutdown(wait=False)
+        pool.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from result_cache import read_json, write_json_atomic
+
+# Per export folder: .pose_outputs/index.json lists every transfer output, and
+# .pose_outputs/thumbs/ holds small PNG thumbnails made once from the full preview renders.
+INDEX_DIR = ".pose_outputs"
+INDEX_VERSION = 1
+THUMB_SIZE = 256
+
+
+def make_thumbnail(image_path, thumb_path, size=THUMB_SIZE):
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        img.thumbnail((size, size))
+        tmp_path = f"{thumb_path}.{os.getpid()}.tmp.png"
+        img.save(tmp_path)
+    os.replace(tmp_path, thumb_path)
+
+
+class OutputIndex:
+    def __init__(self, export_dir):
+        self.export_dir = export_dir
+        self.index_dir = os.path.join(export_dir, INDEX_DIR)
+        self.thumb_dir = os.path.join(self.index_dir, "thumbs")
+        self.index_path = os.path.join(self.index_dir, "index.json")
+        self._lock = threading.Lock()
+        data = read_json(self.index_path)
+        if data is None or data.get("version") != INDEX_VERSION:
+            data = {"version": INDEX_VERSION, "dir_mtime": None, "outputs": {}}
+        self.data = data
+
+    @property
+    def outputs(self):
+        return self.data["outputs"]
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with self._lock:
+            write_json_atomic(self.index_path, self.data)
+
+    def add(self, name, key=None, pose_fbx=None, avatar_fbx=None, save=True):
+        # Called as each transfer lands, so the folder never needs rescanning for our own outputs
+        fbx = os.path.join(self.export_dir, f"{name}.fbx")
+        png = os.path.join(self.export_dir, f"{name}.png")
+        created = max((os.path.getmtime(p) for p in (fbx, png) if os.path.exists(p)), default=time.time())
+        entry = {
+            "name": name,
+            "fbx": f"{name}.fbx" if os.path.exists(fbx) else None,
+            "png": f"{name}.png" if os.path.exists(png) else None,
+            "key": key,
+            "pose_fbx": pose_fbx,
+            "avatar_fbx": avatar_fbx,
+            "created": created,
+        }
+        with self._lock:
+            self.outputs[name] = entry
+        if save:
+            self.save()
+        return entry
+
+    def refresh(self):
+        # Rescan only when the folder itself changed (files added, removed or renamed)
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)  # Created first so it doesn't bump the folder mtime later
+            dir_mtime = os.stat(self.export_dir).st_mtime_ns
+        except OSError:
+            return False
+        if dir_mtime == self.data["dir_mtime"]:
+            return False
+
+        found = {}
+        with os.scandir(self.export_dir) as it:
+            for item in it:
+                stem, ext = os.path.splitext(item.name)
+                if ext.lower() in (".fbx", ".png") and item.is_file():
+                    found.setdefault(stem, set()).add(ext.lower())
+
+        with self._lock:
+            for name in [n for n in self.outputs if n not in found]:
+                del self.outputs[name]
+        for name, exts in found.items():
+            entry = self.outputs.get(name)
+            if entry is None or (entry["png"] is None) != (".png" not in exts):
+                self.add(name, save=False)
+        self.data["dir_mtime"] = dir_mtime
+        self.save()
+        return True
+
+    def latest(self, count=None):
+        with self._lock:
+            entries = sorted(self.outputs.values(), key=lambda e: e["created"], reverse=True)
+        return entries[:count] if count else entries
+
+    def image_path(self, entry):
+        return os.path.join(self.export_dir, entry["png"]) if entry.get("png") else None
+
+    def thumbnail(self, entry):
+        # Thumbnails are generated lazily, the first time an entry is shown, and reused after that
+        image = self.image_path(entry)
+        if image is None or not os.path.exists(image):
+            return None
+        thumb = os.path.join(self.thumb_dir, f"{entry['name']}.png")
+        if not os.path.exists(thumb) or os.path.getmtime(thumb) < os.path.getmtime(image):
+            os.makedirs(self.thumb_dir, exist_ok=True)
+            make_thumbnail(image, thumb)
+        return thumb
+
+
+class LRUCache:
+    def __init__(self, max_items=200):
+        self.max_items = max_items
+        self._items = OrderedDict()
+
+    def get(self, key):
+        if key not in self._items:
+            return None
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def discard(self, key):
+        self._items.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._items
+
+
+# --- CLI: build/refresh an index and its thumbnails ---
+def main():
+    parser = argparse.ArgumentParser(description="Index the transfer outputs of an export folder")
+    parser.add_argument("export_dir", help="Export folder")
+    parser.add_argument("--thumbnails", action="store_true", help="Generate all missing thumbnails now")
+    args = parser.parse_args()
+
+    index = OutputIndex(args.export_dir)
+    start = time.perf_counter()
+    changed = index.refresh()
+    print(f"{len(index.outputs)} outputs indexed ({'rescanned' if changed else 'unchanged'}) in {time.perf_counter() - start:.2f}s")
+    if args.thumbnails:
+        made = sum(1 for entry in index.latest() if index.thumbnail(entry))
+        print(f"{made} thumbnails in {index.thumb_dir}")
+
+
+if __name__ == "__main__":
+    main()
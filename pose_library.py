@@ -0,0 +1,167 @@
+import argparse
+import os
+
+import numpy as np
+
+# Poses live in one .npz: a shared bone-name table plus per-pose arrays indexed by it.
+#   quaternions (P, B, 4) float32, locations (P, B, 3) float32, mask (P, B) bool
+#   rigs (R, B, 4, 4) float32: world-space rest matrices, one table per distinct rig, NaN where unknown
+#   rig_index (P,) int32: each pose's row in rigs, -1 when its rest pose is unknown
+# Bones a pose's rig doesn't have are masked out and left untouched when applied.
+# Libraries written before rest matrices were stored load with every rest pose unknown.
+
+
+class PoseLibrary:
+    def __init__(self, bone_names=None, pose_names=None, quaternions=None, locations=None, mask=None, sources=None,
+                 rigs=None, rig_index=None):
+        self.bone_names = list(bone_names or [])
+        self.pose_names = list(pose_names or [])
+        bones = len(self.bone_names)
+        self.quaternions = quaternions if quaternions is not None else np.zeros((0, bones, 4), np.float32)
+        self.locations = locations if locations is not None else np.zeros((0, bones, 3), np.float32)
+        self.mask = mask if mask is not None else np.zeros((0, bones), bool)
+        self.rigs = rigs if rigs is not None else np.zeros((0, bones, 4, 4), np.float32)
+        self.rig_index = rig_index if rig_index is not None else np.full(len(self.pose_names), -1, np.int32)
+        self.sources = list(sources or [""] * len(self.pose_names))
+        self._bone_index = {name: i for i, name in enumerate(self.bone_names)}
+
+    def __len__(self):
+        return len(self.pose_names)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            library = cls(
+                bone_names=data["bone_names"].tolist(),
+                pose_names=data["pose_names"].tolist(),
+                quaternions=data["quaternions"],
+                locations=data["locations"],
+                mask=data["mask"],
+                sources=data["sources"].tolist(),
+                rigs=data["rigs"] if "rigs" in data.files else None,
+                rig_index=data["rig_index"] if "rig_index" in data.files else None,
+            )
+            if "rest" in data.files and "rigs" not in data.files:
+                # Early libraries kept a rest table per pose
+                for row, rest in enumerate(data["rest"]):
+                    if np.isfinite(rest).any():
+                        library.rig_index[row] = library._rig(rest)
+        return library
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            bone_names=np.array(self.bone_names, dtype=str),
+            pose_names=np.array(self.pose_names, dtype=str),
+            quaternions=self.quaternions.astype(np.float32),
+            locations=self.locations.astype(np.float32),
+            mask=self.mask,
+            rigs=self.rigs.astype(np.float32),
+            rig_index=self.rig_index.astype(np.int32),
+            sources=np.array(self.sources, dtype=str),
+        )
+        os.replace(tmp_path, path)
+
+    def _grow_bones(self, names):
+        new = [name for name in names if name not in self._bone_index]
+        if not new:
+            return
+        for name in new:
+            self._bone_index[name] = len(self.bone_names)
+            self.bone_names.append(name)
+        pad = len(new)
+        poses = len(self.pose_names)
+        self.quaternions = np.concatenate([self.quaternions, np.zeros((poses, pad, 4), np.float32)], axis=1)
+        self.quaternions[:, -pad:, 0] = 1.0
+        self.locations = np.concatenate([self.locations, np.zeros((poses, pad, 3), np.float32)], axis=1)
+        self.mask = np.concatenate([self.mask, np.zeros((poses, pad), bool)], axis=1)
+        self.rigs = np.concatenate([self.rigs, np.full((len(self.rigs), pad, 4, 4), np.nan, np.float32)], axis=1)
+
+    def _rig(self, rest):
+        # Row of `rest` (B, 4, 4) in rigs, added if no pose stored so far came from the same rig
+        for i, rig in enumerate(self.rigs):
+            if np.array_equal(rig, rest, equal_nan=True):
+                return i
+        self.rigs = np.concatenate([self.rigs, np.asarray(rest, np.float32)[np.newaxis]])
+        return len(self.rigs) - 1
+
+    def _drop_unused_rigs(self):
+        used = np.unique(self.rig_index[self.rig_index >= 0])
+        if len(used) == len(self.rigs):
+            return
+        remap = np.full(len(self.rigs), -1, np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        self.rigs = self.rigs[used]
+        self.rig_index = np.where(self.rig_index >= 0, remap[self.rig_index], -1).astype(np.int32)
+
+    def add_poses(self, records):
+        # records: dicts with name, bone_names, quaternions (B, 4), locations (B, 3), source and
+        # optionally rest (B, 4, 4)
+        if not records:
+            return
+        for record in records:
+            self._grow_bones(record["bone_names"])
+
+        bones = len(self.bone_names)
+        count = len(records)
+        quaternions = np.zeros((count, bones, 4), np.float32)
+        quaternions[:, :, 0] = 1.0
+        locations = np.zeros((count, bones, 3), np.float32)
+        mask = np.zeros((count, bones), bool)
+        rig_index = np.full(count, -1, np.int32)
+        for row, record in enumerate(records):
+            columns = np.array([self._bone_index[name] for name in record["bone_names"]], dtype=np.intp)
+            quaternions[row, columns] = np.asarray(record["quaternions"], np.float32).reshape(-1, 4)
+            locations[row, columns] = np.asarray(record["locations"], np.float32).reshape(-1, 3)
+            mask[row, columns] = True
+            if record.get("rest") is not None:
+                rest = np.full((bones, 4, 4), np.nan, np.float32)
+                rest[columns] = np.asarray(record["rest"], np.float32).reshape(-1, 4, 4)
+                rig_index[row] = self._rig(rest)
+
+        # Re-indexing an existing pose replaces it
+        replaced = {record["name"] for record in records}
+        keep = np.array([name not in replaced for name in self.pose_names], dtype=bool)
+        self.pose_names = [name for name, k in zip(self.pose_names, keep) if k] + [r["name"] for r in records]
+        self.sources = [src for src, k in zip(self.sources, keep) if k] + [r.get("source", "") for r in records]
+        self.quaternions = np.concatenate([self.quaternions[keep], quaternions])
+        self.locations = np.concatenate([self.locations[keep], locations])
+        self.mask = np.concatenate([self.mask[keep], mask])
+        self.rig_index = np.concatenate([self.rig_index[keep], rig_index])
+        self._drop_unused_rigs()
+
+    def index(self, pose_name):
+        return self.pose_names.index(pose_name)
+
+    def pose(self, pose_name):
+        # Returns the bone names present in this pose with their (B, 4) quaternions and (B, 3) locations,
+        # plus (B, 4, 4) rest matrices when the library recorded them
+        row = self.index(pose_name)
+        columns = np.flatnonzero(self.mask[row])
+        pose = {
+            "bone_names": [self.bone_names[i] for i in columns],
+            "quaternions": self.quaternions[row, columns],
+            "locations": self.locations[row, columns],
+        }
+        rig = self.rig_index[row]
+        if rig >= 0 and len(columns) and np.isfinite(self.rigs[rig, columns]).all():
+            pose["rest"] = self.rigs[rig, columns]
+        return pose
+
+
+# --- CLI: inspect a library ---
+def main():
+    parser = argparse.ArgumentParser(description="List the poses stored in a pose library (.npz)")
+    parser.add_argument("library", help="Pose library file")
+    args = parser.parse_args()
+
+    library = PoseLibrary.load(args.library)
+    size = os.path.getsize(args.library)
+    print(f"{len(library)} poses, {len(library.bone_names)} bones, {size / 1024:.1f} KB")
+    for name, source, row in zip(library.pose_names, library.sources, library.mask):
+        print(f"{name:40s} {int(row.sum()):4d} bones  {source}")
+
+
+if __name__ == "__main__":
+    main()
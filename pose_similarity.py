@@ -0,0 +1,334 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+import fbx_reader
+from bone_mapping import canonical_name
+from pose_library import PoseLibrary
+from result_cache import VIEWS_SUFFIX, clone_or_copy, view_files
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # Falls back to vectorized brute force, fine for a few thousand poses
+    cKDTree = None
+
+# Poses are compared bone by bone on their local rotations. Each bone becomes its 3x3 rotation matrix:
+# unlike quaternions these have no q/-q ambiguity, and the distance between two of them is
+# 2*sqrt(2)*sin(angle/2), so a tolerance in degrees turns into a plain Euclidean radius.
+# The nearest-neighbour structure works on a PCA projection of those features. Projecting never
+# lengthens a distance, so range queries there return every true match, plus a few that the exact
+# per-bone check then drops.
+DEFAULT_TOLERANCE = 2.0  # Degrees, on every bone
+DEFAULT_DIMS = 16
+CHUNK = 4096
+
+
+# --- Features ---
+def rotation_features(quaternions):
+    # (P, B, 4) w, x, y, z -> (P, B * 9) flattened rotation matrices
+    q = np.asarray(quaternions, dtype=np.float64)
+    q = q / np.maximum(np.linalg.norm(q, axis=-1, keepdims=True), 1e-12)
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    matrices = np.stack([
+        1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y),
+        2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x),
+        2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y),
+    ], axis=-1)
+    return matrices.reshape(q.shape[0], q.shape[1] * 9)
+
+
+def aligned_quaternions(bone_names, quaternions, mask, bones):
+    # (P, len(bones), 4) in the order of `bones` (canonical names), so "mixamorig:Hips" and
+    # "mixamorig1:Hips" line up; bones a pose doesn't have stay at rest
+    columns = {}
+    for i, name in enumerate(bone_names):
+        columns.setdefault(canonical_name(name), []).append(i)
+    count = len(quaternions)
+    out = np.zeros((count, len(bones), 4))
+    out[..., 0] = 1.0
+    present = np.zeros((count, len(bones)), bool)
+    for column, bone in enumerate(bones):
+        for i in columns.get(bone, ()):
+            take = mask[:, i] & ~present[:, column]  # Several raw names can share a canonical name; first wins
+            out[take, column] = quaternions[take, i]
+            present[:, column] |= take
+    return out
+
+
+def bone_angles(a, b):
+    # Per-bone rotation angle in degrees between feature rows a (N, D) and b (N, D) -> (N, B)
+    a = a.reshape(a.shape[0], a.shape[1] // 9, 9)
+    b = b.reshape(b.shape[0], b.shape[1] // 9, 9)
+    cos = ((a * b).sum(axis=-1) - 1) / 2  # trace(Ra^T Rb) = 1 + 2 cos(angle)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def radius_for(tolerance, bones):
+    # Largest feature distance two poses can have when every bone is within `tolerance` degrees
+    return math.sqrt(bones) * 2 * math.sqrt(2) * math.sin(math.radians(tolerance) / 2)
+
+
+# --- Index ---
+class PoseIndex:
+    def __init__(self, names, bone_names, quaternions, mask, sources=None, dims=DEFAULT_DIMS):
+        self.names = list(names)
+        self.sources = list(sources or [""] * len(self.names))
+        self.bones = sorted({canonical_name(name) for name, used in zip(bone_names, mask.any(axis=0)) if used})
+        self.features = rotation_features(aligned_quaternions(bone_names, quaternions, mask, self.bones))
+        self._positions = {name: i for i, name in enumerate(self.names)}
+
+        self.mean = self.features.mean(axis=0) if len(self.names) else np.zeros(self.features.shape[1])
+        centered = self.features - self.mean
+        if len(self.names) > 1:
+            _u, _s, vt = np.linalg.svd(centered, full_matrices=False)
+            self.basis = vt[:dims].T
+        else:
+            self.basis = np.zeros((self.features.shape[1], 0))
+        self.points = centered @ self.basis
+        self.tree = cKDTree(self.points) if cKDTree is not None and len(self.names) else None
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_library(cls, library, dims=DEFAULT_DIMS):
+        return cls(library.pose_names, library.bone_names, library.quaternions, library.mask, library.sources, dims)
+
+    def project(self, features):
+        return (features - self.mean) @ self.basis
+
+    def features_for(self, bone_names, quaternions):
+        # Features of a pose that isn't in the index, e.g. a new FBX, on this index's bones
+        quaternions = np.asarray(quaternions, dtype=np.float64).reshape(1, -1, 4)
+        mask = np.ones((1, len(bone_names)), bool)
+        return rotation_features(aligned_quaternions(bone_names, quaternions, mask, self.bones))[0]
+
+    # --- Neighbour search on the projection ---
+    def _within(self, point, radius):
+        if not np.isfinite(radius):
+            return np.arange(len(self))
+        if self.tree is not None:
+            return np.asarray(self.tree.query_ball_point(point, radius), dtype=np.intp)
+        return np.flatnonzero(np.linalg.norm(self.points - point, axis=1) <= radius)
+
+    def _closest(self, point, count):
+        if self.tree is not None:
+            return np.atleast_1d(self.tree.query(point, k=count)[1])
+        distances = np.linalg.norm(self.points - point, axis=1)
+        return np.argpartition(distances, count - 1)[:count] if count < len(self) else np.arange(len(self))
+
+    def _pairs(self, radius):
+        # Candidate (i, j), i < j, pairs within `radius` on the projection
+        if self.tree is not None:
+            return self.tree.query_pairs(radius, output_type="ndarray")
+        pairs = []
+        norms = (self.points ** 2).sum(axis=1)
+        for start in range(0, len(self), 1024):
+            rows = self.points[start:start + 1024]
+            squared = norms[start:start + 1024, np.newaxis] + norms[np.newaxis] - 2 * rows @ self.points.T
+            i, j = np.nonzero(squared <= radius * radius)
+            i += start
+            keep = j > i
+            pairs.append(np.stack([i[keep], j[keep]], axis=1))
+        return np.concatenate(pairs) if pairs else np.zeros((0, 2), np.intp)
+
+    # --- Queries ---
+    def nearest(self, features, k=10, exclude=None):
+        # Exact k nearest poses: projected neighbours give an upper bound on the k-th distance, and
+        # every pose within that bound lies inside the same radius on the projection
+        if not len(self):
+            return []
+        point = self.project(features)
+        candidates = self._closest(point, min(len(self), k + (exclude is not None)))
+        distances = np.linalg.norm(self.features[candidates] - features, axis=1)
+        distances[candidates == exclude] = np.inf
+        bound = np.sort(distances)[min(k, len(distances)) - 1]
+        candidates = self._within(point, bound * (1 + 1e-6) + 1e-9)
+        distances = np.linalg.norm(self.features[candidates] - features, axis=1)
+        distances[candidates == exclude] = np.inf
+        order = np.argsort(distances, kind="stable")[:k]
+        order = order[np.isfinite(distances[order])]
+        angles = bone_angles(self.features[candidates[order]], np.broadcast_to(features, (len(order), len(features))))
+        return [{"name": self.names[i], "source": self.sources[i], "distance": float(distances[o]),
+                 "max_angle": float(angles[n].max(initial=0.0)), "mean_angle": float(angles[n].mean()) if angles.shape[1] else 0.0}
+                for n, (o, i) in enumerate(zip(order, candidates[order]))]
+
+    def similar(self, name, k=10):
+        i = self._positions[name]
+        return self.nearest(self.features[i], k, exclude=i)
+
+    def duplicate_pairs(self, tolerance=DEFAULT_TOLERANCE):
+        # (i, j) pairs whose every bone is within `tolerance` degrees
+        if len(self) < 2:
+            return np.zeros((0, 2), np.intp)
+        radius = radius_for(tolerance, len(self.bones))
+        pairs = self._pairs(radius * (1 + 1e-6) + 1e-9)
+        matches = []
+        for start in range(0, len(pairs), CHUNK):
+            chunk = pairs[start:start + CHUNK]
+            worst = bone_angles(self.features[chunk[:, 0]], self.features[chunk[:, 1]]).max(axis=1, initial=0.0)
+            matches.append(chunk[worst <= tolerance])
+        return np.concatenate(matches) if matches else np.zeros((0, 2), np.intp)
+
+    def duplicates(self, tolerance=DEFAULT_TOLERANCE):
+        # {duplicate name: kept name}. Poses are kept in index order, and a later pose within tolerance
+        # of a kept one joins it. Groups never chain: every duplicate is close to the pose it is kept as.
+        neighbours = {}
+        for i, j in self.duplicate_pairs(tolerance):
+            neighbours.setdefault(int(i), []).append(int(j))
+        leader = {}
+        for i in range(len(self)):
+            if i in leader:
+                continue
+            for j in neighbours.get(i, ()):
+                leader.setdefault(j, i)
+        return {self.names[j]: self.names[i] for j, i in leader.items()}
+
+    def groups(self, tolerance=DEFAULT_TOLERANCE):
+        groups = {}
+        for duplicate, kept in self.duplicates(tolerance).items():
+            groups.setdefault(kept, []).append(duplicate)
+        return groups
+
+
+# --- Sources ---
+def read_fbx_pose(path):
+    # (bone names, (B, 4) local rotations) at the first key, read without Blender
+    with fbx_reader.FBXFile(path, skip=fbx_reader.SKELETON_SKIP) as fbx:
+        skeleton = fbx_reader.read_skeleton(fbx)
+        animation = fbx_reader.read_animation(fbx, skeleton)
+    if not skeleton["bone_names"]:
+        raise fbx_reader.FBXError("no armature")
+    start = animation["frame_range"][0] / animation["fps"] if animation["frame_range"] else 0.0
+    return skeleton["bone_names"], fbx_reader.local_rotations(skeleton, animation, start)
+
+
+def fbx_index(paths, dims=DEFAULT_DIMS):
+    # Pose FBXs indexed by path. These are FBX-space rotations, so compare them with each other but
+    # not with a pose library, which stores Blender pose channels.
+    library = PoseLibrary()
+    records = []
+    for path in paths:
+        try:
+            bone_names, quaternions = read_fbx_pose(path)
+        except (fbx_reader.FBXError, OSError) as e:
+            print(f"⚠️ Not indexed: {path}: {e}")
+            continue
+        records.append({"name": path, "bone_names": bone_names, "quaternions": quaternions,
+                        "locations": np.zeros((len(bone_names), 3)), "source": path})
+    library.add_poses(records)
+    return PoseIndex.from_library(library, dims)
+
+
+def find_fbx(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _dirs, files in os.walk(path):
+                found += sorted(os.path.join(folder, name) for name in files if name.lower().endswith(".fbx"))
+        else:
+            found.append(path)
+    return found
+
+
+# --- Batch jobs ---
+def dedupe_jobs(jobs, index, tolerance=DEFAULT_TOLERANCE, pose_key="pose_fbx"):
+    # Splits jobs into ones to run and (duplicate job, job it repeats) pairs. A job only collapses onto
+    # the first job for the same avatar and export folder whose pose is the kept pose of its group.
+    kept_pose = index.duplicates(tolerance)
+    leaders = {}
+    for job in jobs:
+        if job[pose_key] not in kept_pose:
+            leaders.setdefault((job["avatar_fbx"], job["export_path"], job[pose_key]), job)
+    unique, repeats = [], []
+    for job in jobs:
+        pose = kept_pose.get(job[pose_key], job[pose_key])
+        leader = leaders.get((job["avatar_fbx"], job["export_path"], pose))
+        if leader is None or leader is job:
+            unique.append(job)
+        else:
+            repeats.append((job, leader))
+    return unique, repeats
+
+
+def copy_outputs(job, leader):
+    # Gives a collapsed job its own copies of the files its leader produced
+    copied = 0
+    folder = job["export_path"]
+    for name in os.listdir(folder):
+        stem, ext = os.path.splitext(name)
+        if stem == leader["output_name"] and os.path.isfile(os.path.join(folder, name)):
+            clone_or_copy(os.path.join(folder, name), os.path.join(folder, job["output_name"] + ext))
+            copied += 1
+    views = view_files(os.path.join(folder, leader["output_name"] + VIEWS_SUFFIX))
+    if views:
+        views_dir = os.path.join(folder, job["output_name"] + VIEWS_SUFFIX)
+        os.makedirs(views_dir, exist_ok=True)
+        for name, path in views.items():
+            clone_or_copy(path, os.path.join(views_dir, name[len("view_"):]))
+    return copied
+
+
+DEDUPE_MODES = {"skip": "skipped", "collapse": "collapsed"}
+
+
+def print_dedupe(unique, repeats, mode):
+    for job, leader in repeats:
+        print(f"⏭️ {job['output_name']}: {DEDUPE_MODES[mode]}, same pose as {leader['output_name']}")
+    print(f"🧬 {len(unique)} transfers to run, {len(repeats)} near-duplicates {DEDUPE_MODES[mode]}")
+
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Find similar and near-duplicate poses in a pose library or FBX folders")
+    parser.add_argument("sources", nargs="+", help="A pose library (.npz), or pose FBX files and folders")
+    parser.add_argument("--similar", metavar="POSE", help="List the poses closest to this pose name or FBX file")
+    parser.add_argument("-k", type=int, default=10, help="Number of similar poses to list")
+    parser.add_argument("--duplicates", action="store_true", help="List groups of near-identical poses")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Degrees every bone may differ by for two poses to count as duplicates")
+    parser.add_argument("--dims", type=int, default=DEFAULT_DIMS, help="PCA dimensions of the search structure")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if len(args.sources) == 1 and args.sources[0].lower().endswith(".npz"):
+        index = PoseIndex.from_library(PoseLibrary.load(args.sources[0]), args.dims)
+    else:
+        index = fbx_index(find_fbx(args.sources), args.dims)
+    backend = "scipy cKDTree" if index.tree is not None else "numpy"
+    print(f"🧬 Indexed {len(index)} poses, {len(index.bones)} bones in {time.perf_counter() - start:.2f}s ({backend})",
+          file=sys.stderr)
+
+    output = {}
+    if args.similar:
+        if args.similar in index.names:
+            output["similar"] = index.similar(args.similar, args.k)
+        elif os.path.exists(args.similar):
+            bone_names, quaternions = read_fbx_pose(args.similar)
+            output["similar"] = index.nearest(index.features_for(bone_names, quaternions), args.k)
+        else:
+            parser.error(f"pose not found in the index or on disk: {args.similar}")
+    if args.duplicates or not args.similar:
+        output["duplicates"] = index.groups(args.tolerance)
+
+    if args.json:
+        print(json.dumps(output, indent=2))
+        return
+    for match in output.get("similar", []):
+        print(f"{match['name']:50s} max {match['max_angle']:6.1f}°  mean {match['mean_angle']:5.1f}°")
+    if "duplicates" in output:
+        groups = output["duplicates"]
+        for kept, duplicates in groups.items():
+            print(f"{kept}\n" + "".join(f"  = {name}\n" for name in duplicates), end="")
+        print(f"{sum(len(d) for d in groups.values())} near-duplicates in {len(groups)} groups "
+              f"(every bone within {args.tolerance}°)")
+
+
+if __name__ == "__main__":
+    main()
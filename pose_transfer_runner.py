@@ -1,70 +1,534 @@
 import bpy
 import os
 import sys
-import subprocess
-import math
+import json
+import time
+import argparse
+import numpy as np
+from mathutils import Matrix
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from batch_manifest import OUTPUT_FORMATS, load_manifest, group_by_avatar
+import avatar_cache
+from pose_library import PoseLibrary
+import bone_mapping
+import fbx_reader
+import pose_similarity
+import preview_render
+import progress_events
+import rest_pose
+from progress_events import stage
+from animation_frames import parse_frame_range, sample_frames, make_continuous, reduce_keys
+
+
+class TransferError(Exception):
+    pass
+
 
 # --- Parse CLI args ---
-argv = sys.argv
-argv = argv[argv.index("--") + 1:] if "--" in argv else []
-
-pose_fbx = argv[0]
-avatar_fbx = argv[1]
-export_path = argv[2]
-blender_exe = argv[3]
-output_name = argv[4]  # No extension
-
-export_file = os.path.join(export_path, f"{output_name}.fbx")
-preview_image = os.path.join(export_path, f"{output_name}.png")
-preview_script = os.path.join(export_path, "render_preview_temp.py")
-
-# --- Clear scene ---
-bpy.ops.wm.read_factory_settings(use_empty=True)
-
-# --- Import avatar ---
-bpy.ops.import_scene.fbx(filepath=avatar_fbx)
-avatar_arm = [obj for obj in bpy.context.selected_objects if obj.type == 'ARMATURE']
-if not avatar_arm:
-    print("❌ No armature found in Avatar FBX.")
-    sys.exit(1)
-avatar = avatar_arm[0]
-
-# --- Import pose ---
-bpy.ops.import_scene.fbx(filepath=pose_fbx)
-pose_arm = [obj for obj in bpy.context.selected_objects if obj.type == 'ARMATURE']
-if not pose_arm:
-    print("❌ No armature found in Pose FBX.")
-    sys.exit(1)
-pose = pose_arm[-1]
+def parse_args():
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+
+    parser = argparse.ArgumentParser(prog="pose_transfer_runner.py")
+    parser.add_argument("positional", nargs="*", help="pose_fbx avatar_fbx export_path blender_exe output_name")
+    parser.add_argument("--batch", help="JSON/CSV manifest of pose/avatar jobs run in this session")
+    parser.add_argument("--export-path", help="Default export folder for batch jobs")
+    parser.add_argument("--results", help="Per-job result records (JSON lines) for batch runs")
+    parser.add_argument("--prepare-avatar", nargs="+", metavar="AVATAR_FBX", help="Import avatars into the .blend cache and exit")
+    parser.add_argument("--avatar-cache", default=avatar_cache.DEFAULT_AVATAR_CACHE_DIR, help="Folder for pre-converted avatar .blend files")
+    parser.add_argument("--no-avatar-cache", action="store_true", help="Always import the avatar FBX")
+    parser.add_argument("--index-poses", metavar="LIBRARY_NPZ", help="Extract the positional pose FBXs into a pose library and exit")
+    parser.add_argument("--pose-library", metavar="LIBRARY_NPZ", help="Apply poses from a pose library instead of pose FBXs")
+    parser.add_argument("--avatar", help="Avatar FBX for --pose-library runs")
+    parser.add_argument("--poses", nargs="+", help="Pose names to apply from --pose-library (default: all)")
+    parser.add_argument("--dedupe-poses", choices=sorted(pose_similarity.DEDUPE_MODES),
+                        help="--pose-library runs: skip near-identical poses, or collapse them onto one transfer and copy its outputs")
+    parser.add_argument("--pose-tolerance", type=float, default=pose_similarity.DEFAULT_TOLERANCE,
+                        help="Degrees every bone may differ by for two poses to count as the same")
+    parser.add_argument("--bone-map", help="JSON file of explicit {source bone: avatar bone} pairs")
+    parser.add_argument("--keying", choices=["auto", "fast", "bake"], default="auto",
+                        help="fast: write F-curves directly; bake: visual nla.bake; auto: bake only for rigs with constraints/drivers")
+    parser.add_argument("--output-format", choices=list(OUTPUT_FORMATS), default="fbx",
+                        help="fbx: posed avatar with meshes; armature-fbx/bvh: skeleton only; json/npz: per-bone transforms")
+    parser.add_argument("--preview", action="store_true", help="Render a preview even for skeleton-only output formats")
+    parser.add_argument("--no-preview", action="store_true", help="Skip the preview render")
+    parser.add_argument("--preview-preset", choices=sorted(preview_render.PREVIEW_PRESETS), default="standard",
+                        help="Preview quality: thumbnail/fast (Workbench) or standard (Eevee)")
+    parser.add_argument("--preview-resolution", type=int, help="Override the preset's preview resolution")
+    parser.add_argument("--preview-samples", type=int, help="Override the preset's render samples")
+    parser.add_argument("--preview-views", type=preview_render.views_arg, default="front",
+                        help="front, front-side-back, quad, or N for an N-angle turntable; several views make a contact sheet")
+    parser.add_argument("--bone-map-cache", default=bone_mapping.DEFAULT_MAPPING_CACHE_DIR, help="Folder for cached bone-mapping tables")
+    parser.add_argument("--frames", metavar="all|START:END", help="Transfer the pose FBX's animation instead of its current pose")
+    parser.add_argument("--frame-step", type=int, default=1, help="Sample every Nth source frame")
+    parser.add_argument("--max-frames", type=int, help="Evenly subsample the clip down to at most N frames")
+    parser.add_argument("--reduce-tolerance", type=float, default=0.0,
+                        help="Drop keys that linear interpolation reproduces within this tolerance (0: keep all)")
+    args = parser.parse_args(argv)
+
+    if args.no_avatar_cache:
+        args.avatar_cache = None
+    if args.pose_library and not (args.avatar and args.export_path):
+        parser.error("--pose-library needs --avatar and --export-path")
+    if args.index_poses and not args.positional:
+        parser.error("--index-poses needs pose FBX files")
+    if not (args.batch or args.prepare_avatar or args.index_poses or args.pose_library) and len(args.positional) != 5:
+        parser.error("expected: pose_fbx avatar_fbx export_path blender_exe output_name")
+    return args
+
+
+DEFAULT_OPTIONS = {
+    "avatar_cache": avatar_cache.DEFAULT_AVATAR_CACHE_DIR,
+    "bone_map": None,
+    "bone_map_cache": bone_mapping.DEFAULT_MAPPING_CACHE_DIR,
+    "keying": "auto",
+    "output_format": "fbx",
+    "preview": None,  # None: only when the output has meshes
+    "preview_preset": "standard",
+    "preview_resolution": None,
+    "preview_samples": None,
+    "preview_views": "front",
+    "frames": None,
+    "frame_step": 1,
+    "max_frames": None,
+    "reduce_tolerance": 0.0,
+}
+
+
+def options_from_args(args):
+    return dict(
+        DEFAULT_OPTIONS,
+        avatar_cache=args.avatar_cache,
+        bone_map=args.bone_map,
+        bone_map_cache=args.bone_map_cache,
+        keying=args.keying,
+        output_format=args.output_format,
+        preview=True if args.preview else False if args.no_preview else None,
+        preview_preset=args.preview_preset,
+        preview_resolution=args.preview_resolution,
+        preview_samples=args.preview_samples,
+        preview_views=args.preview_views,
+        frames=args.frames,
+        frame_step=args.frame_step,
+        max_frames=args.max_frames,
+        reduce_tolerance=args.reduce_tolerance,
+    )
+
+
+def job_from_positional(positional):
+    # No extension on output_name; blender_exe stays in the argv contract but previews now render in-session
+    pose_fbx, avatar_fbx, export_path, blender_exe, output_name = positional
+    return {
+        "pose_fbx": pose_fbx,
+        "avatar_fbx": avatar_fbx,
+        "export_path": export_path,
+        "blender_exe": blender_exe,
+        "output_name": output_name,
+    }
+
+
+# --- Import helpers ---
+def import_fbx(filepath):
+    bpy.ops.object.select_all(action='DESELECT')
+    bpy.ops.import_scene.fbx(filepath=filepath)
+    return list(bpy.context.selected_objects)
+
+
+def import_avatar(avatar_fbx):
+    imported = import_fbx(avatar_fbx)
+    avatar_arm = [obj for obj in imported if obj.type == 'ARMATURE']
+    if not avatar_arm:
+        raise TransferError("No armature found in Avatar FBX.")
+    return avatar_arm[0], imported
+
+
+# --- Avatar .blend cache ---
+def save_avatar_blend(avatar, objects, cache_dir, avatar_fbx):
+    os.makedirs(cache_dir, exist_ok=True)
+    _key, blend_path, _meta_path = avatar_cache.entry_paths(cache_dir, avatar_fbx, bpy.app.version_string)
+    tmp_path = f"{blend_path}.{os.getpid()}.tmp"
+    bpy.data.libraries.write(tmp_path, set(objects), path_remap='ABSOLUTE', fake_user=True)
+    os.replace(tmp_path, blend_path)
+    avatar_cache.record(cache_dir, avatar_fbx, bpy.app.version_string, avatar.name, [obj.name for obj in objects])
+    print(f"💾 Cached avatar: {blend_path}")
+
+
+def append_avatar_blend(entry, armature_only=False):
+    # Skeleton-only outputs never touch the meshes, so heavy avatars skip loading them entirely
+    names = [entry["armature"]]
+    if not armature_only:
+        names += [name for name in entry["objects"] if name != entry["armature"]]
+    with bpy.data.libraries.load(entry["blend"], link=False) as (data_from, data_to):
+        data_to.objects = [name for name in names if name in data_from.objects]
+
+    objects = [obj for obj in data_to.objects if obj is not None]
+    for obj in objects:
+        bpy.context.scene.collection.objects.link(obj)
+    if not objects or objects[0].type != 'ARMATURE':
+        delete_objects(objects)
+        raise TransferError("Cached avatar has no armature.")
+    return objects[0], objects
+
+
+def load_avatar(avatar_fbx, cache_dir=None, armature_only=False):
+    if not cache_dir:
+        return import_avatar(avatar_fbx)
+
+    entry = avatar_cache.lookup(cache_dir, avatar_fbx, bpy.app.version_string)
+    if entry:
+        try:
+            return append_avatar_blend(entry, armature_only)
+        except (OSError, RuntimeError, TransferError) as e:
+            print(f"⚠️ Rebuilding avatar cache entry: {e}")
+
+    avatar, imported = import_avatar(avatar_fbx)
+    try:
+        save_avatar_blend(avatar, imported, cache_dir, avatar_fbx)
+    except (OSError, RuntimeError) as e:
+        print(f"⚠️ Could not cache avatar: {e}")
+    return avatar, imported
+
+
+def prepare_avatars(avatar_fbxs, cache_dir):
+    failed = 0
+    for avatar_fbx in avatar_fbxs:
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        entry = avatar_cache.lookup(cache_dir, avatar_fbx, bpy.app.version_string)
+        if entry:
+            print(f"✅ Already cached: {avatar_fbx}")
+            continue
+        try:
+            avatar, imported = import_avatar(avatar_fbx)
+            save_avatar_blend(avatar, imported, cache_dir, avatar_fbx)
+        except TransferError as e:
+            failed += 1
+            print(f"❌ {avatar_fbx}: {e}")
+    return failed
+
+
+def import_pose(pose_fbx, options=None):
+    # Read the pose rig's bone data, then drop everything the import brought in
+    imported = import_fbx(pose_fbx)
+    pose_arm = [obj for obj in imported if obj.type == 'ARMATURE']
+    try:
+        if not pose_arm:
+            raise TransferError("No armature found in Pose FBX.")
+        if options and options["frames"]:
+            return read_pose_animation(pose_arm[-1], options)
+        return read_pose_arrays(pose_arm[-1])
+    finally:
+        delete_objects(imported)
+
+
+def delete_objects(objects):
+    for obj in objects:
+        if obj.name in bpy.data.objects:
+            bpy.data.objects.remove(obj, do_unlink=True)
+
+
+# --- Avatar state between jobs ---
+def reset_avatar(avatar, base_action):
+    anim = avatar.animation_data
+    if anim and anim.action and anim.action is not base_action:
+        baked = anim.action
+        anim.action = None
+        bpy.data.actions.remove(baked)
+    if base_action:
+        avatar.animation_data_create().action = base_action.copy()
+    for bone in avatar.pose.bones:
+        bone.matrix_basis = Matrix()
+
+
+# --- Pose data as arrays ---
+def rest_matrices(armature):
+    # (B, 4, 4) world-space rest matrices, in pose.bones order; foreach_get yields column-major
+    bones = armature.data.bones
+    local = np.empty(len(bones) * 16, dtype=np.float32)
+    bones.foreach_get("matrix_local", local)
+    local = local.reshape(-1, 4, 4).transpose(0, 2, 1)
+    return (np.array(armature.matrix_world, dtype=np.float32) @ local).astype(np.float32)
+
+
+def read_pose_arrays(pose):
+    bones = pose.pose.bones
+    quaternions = np.empty(len(bones) * 4, dtype=np.float32)
+    locations = np.empty(len(bones) * 3, dtype=np.float32)
+    bones.foreach_get("rotation_quaternion", quaternions)
+    bones.foreach_get("location", locations)
+    return {
+        "bone_names": [bone.name for bone in bones],
+        "quaternions": quaternions.reshape(-1, 4),
+        "locations": locations.reshape(-1, 3),
+        "rest": rest_matrices(pose),
+    }
+
+
+def read_pose_animation(pose, options):
+    # Evaluate the clip frame by frame with one bulk read per channel per frame.
+    # Arrays gain a leading frame axis: quaternions (F, B, 4), locations (F, B, 3).
+    action = pose.animation_data.action if pose.animation_data else None
+    if action is None:
+        raise TransferError("Pose FBX has no animation.")
+    try:
+        start, end = parse_frame_range(options["frames"], action.frame_range)
+    except ValueError as e:
+        raise TransferError(str(e))
+    frames = sample_frames(start, end, options["frame_step"], options["max_frames"])
+    if not len(frames):
+        raise TransferError(f"Empty frame range: {options['frames']}")
+
+    bones = pose.pose.bones
+    quaternions = np.empty((len(frames), len(bones) * 4), dtype=np.float32)
+    locations = np.empty((len(frames), len(bones) * 3), dtype=np.float32)
+    scene = bpy.context.scene
+    for row, frame in enumerate(frames):
+        scene.frame_set(int(frame))
+        bones.foreach_get("rotation_quaternion", quaternions[row])
+        bones.foreach_get("location", locations[row])
+
+    return {
+        "bone_names": [bone.name for bone in bones],
+        "quaternions": make_continuous(quaternions.reshape(len(frames), -1, 4)),
+        "locations": locations.reshape(len(frames), -1, 3),
+        "rest": rest_matrices(pose),
+        # Output frames start at 1 and keep the source spacing
+        "frames": (frames - start + 1).astype(np.float32),
+    }
+
+
+def load_pose_data(job, pose_cache, libraries, options=None):
+    if job.get("pose_library"):
+        key = f"{job['pose_library']}#{job['pose_name']}"
+        if key not in pose_cache:
+            if job["pose_library"] not in libraries:
+                libraries[job["pose_library"]] = PoseLibrary.load(job["pose_library"])
+            pose_cache[key] = libraries[job["pose_library"]].pose(job["pose_name"])
+        return pose_cache[key]
+
+    if job["pose_fbx"] not in pose_cache:
+        try:
+            pose_cache[job["pose_fbx"]] = import_pose(job["pose_fbx"], options)
+        except TransferError as e:
+            pose_cache[job["pose_fbx"]] = e
+    pose_data = pose_cache[job["pose_fbx"]]
+    if isinstance(pose_data, TransferError):
+        raise pose_data
+    return pose_data
+
 
 # --- Apply pose ---
-bpy.context.view_layer.objects.active = avatar
-bpy.ops.object.mode_set(mode='POSE')
-for bone in avatar.pose.bones:
-    if bone.name in pose.pose.bones:
-        src = pose.pose.bones[bone.name]
-        tgt = bone
-        tgt.rotation_mode = 'QUATERNION'
-        tgt.rotation_quaternion = src.rotation_quaternion
-        if "hips" in bone.name.lower():
-            tgt.location = src.location
-bpy.ops.object.mode_set(mode='OBJECT')
+_reported_mappings = set()
+
+
+def map_bones(avatar, pose_data, options):
+    # Name matching is cached per skeleton pair; only the index lookup runs per job
+    target_names = [bone.name for bone in avatar.pose.bones]
+    mapping = bone_mapping.get_mapping(pose_data["bone_names"], target_names, options["bone_map"], options["bone_map_cache"])
+    if mapping.key not in _reported_mappings:
+        _reported_mappings.add(mapping.key)
+        print(f"🦴 {mapping.summary()}")
+        if mapping.unmapped_target:
+            print(f"⚠️ Unmapped avatar bones: {', '.join(mapping.unmapped_target)}")
+    return mapping
+
+
+def mapping_indices(avatar, pose_data, mapping):
+    bones = avatar.pose.bones
+    target_index = {bone.name: i for i, bone in enumerate(bones)}
+    source_index = {name: i for i, name in enumerate(pose_data["bone_names"])}
+    targets = [target_index[target] for target, _source in mapping.pairs]
+    sources = [source_index[source] for _target, source in mapping.pairs]
+    root = (target_index[mapping.root[0]], source_index[mapping.root[1]]) if mapping.root else None
+
+    for i in targets:
+        if bones[i].rotation_mode != 'QUATERNION':
+            bones[i].rotation_mode = 'QUATERNION'
+    return targets, sources, root
+
+
+def mapped_parents(avatar, targets):
+    # For each mapped avatar bone, the position in `targets` of its nearest mapped ancestor, or -1
+    bones = avatar.pose.bones
+    position = {bones[i].name: n for n, i in enumerate(targets)}
+    parents = []
+    for i in targets:
+        parent = bones[i].parent
+        while parent is not None and parent.name not in position:
+            parent = parent.parent
+        parents.append(position[parent.name] if parent is not None else -1)
+    return parents
+
+
+def retarget_channels(avatar, pose_data, targets, sources, root):
+    # Source rotations (and the root translation) turned into avatar channels that point each bone
+    # the way its source bone points, whatever the two rigs' rest poses.
+    # Poses from libraries indexed before rest matrices were stored are copied as they are.
+    quaternions = pose_data["quaternions"][..., sources, :]
+    locations = pose_data["locations"][..., root[1], :] if root else None
+    if "rest" not in pose_data:
+        return quaternions, locations
+    source_rest = pose_data["rest"]
+    target_rest = rest_matrices(avatar)
+    quaternions = rest_pose.retarget_rotations(quaternions, source_rest[sources], target_rest[targets],
+                                               mapped_parents(avatar, targets))
+    if root:
+        source_root, target_root = source_rest[root[1]], target_rest[root[0]]
+        scale = rest_pose.hip_scale(source_root, target_root)
+        locations = rest_pose.retarget_location(locations, source_root, target_root, scale)
+    return quaternions, locations
+
+
+def apply_pose(avatar, pose_data, mapping):
+    bones = avatar.pose.bones
+    targets, sources, root = mapping_indices(avatar, pose_data, mapping)
+    rotations, root_location = retarget_channels(avatar, pose_data, targets, sources, root)
+
+    # One bulk read and one bulk write instead of per-bone property access
+    quaternions = np.empty(len(bones) * 4, dtype=np.float32)
+    bones.foreach_get("rotation_quaternion", quaternions)
+    quaternions = quaternions.reshape(-1, 4)
+    quaternions[targets] = rotations
+    bones.foreach_set("rotation_quaternion", quaternions.ravel())
+
+    if root:
+        bones[root[0]].location = root_location
+    avatar.update_tag()
+
+
+def apply_animation(avatar, pose_data, mapping):
+    # Build every frame's channels at once: unmapped bones hold their current pose,
+    # mapped bones take the source rotations and the root takes the source hip location
+    bones = avatar.pose.bones
+    targets, sources, root = mapping_indices(avatar, pose_data, mapping)
+    frames = pose_data["frames"]
+    rotations, root_locations = retarget_channels(avatar, pose_data, targets, sources, root)
+
+    samples = {channel: np.repeat(values[np.newaxis], len(frames), axis=0)
+               for channel, values in sample_pose_channels(avatar).items()}
+    samples["rotation_quaternion"][:, targets] = rotations
+    if root:
+        samples["location"][:, root[0]] = root_locations
+
+    # Leave the avatar showing the first frame
+    bones.foreach_set("rotation_quaternion", samples["rotation_quaternion"][0].ravel())
+    bones.foreach_set("location", samples["location"][0].ravel())
+    avatar.update_tag()
+    return frames, samples
+
 
 # --- Bake pose ---
-bpy.ops.nla.bake(
-    frame_start=1,
-    frame_end=1,
-    only_selected=False,
-    visual_keying=True,
-    clear_constraints=False,
-    use_current_action=True,
-    bake_types={'POSE'}
-)
-
-# --- Delete pose rig ---
-bpy.ops.object.select_all(action='DESELECT')
-pose.select_set(True)
-bpy.ops.object.delete()
+def bake_pose(avatar, frame_start=1, frame_end=1):
+    bpy.ops.object.select_all(action='DESELECT')
+    avatar.select_set(True)
+    bpy.context.view_layer.objects.active = avatar
+    bpy.ops.nla.bake(
+        frame_start=frame_start,
+        frame_end=frame_end,
+        only_selected=False,
+        visual_keying=True,
+        clear_constraints=False,
+        use_current_action=True,
+        bake_types={'POSE'}
+    )
+
+
+# --- Fast keying: write F-curves straight from the pose bones ---
+CHANNEL_SIZES = {"location": 3, "rotation_quaternion": 4, "rotation_euler": 3, "rotation_axis_angle": 4, "scale": 3}
+ROTATION_CHANNELS = {'QUATERNION': "rotation_quaternion", 'AXIS_ANGLE': "rotation_axis_angle"}
+
+
+def needs_visual_bake(avatar):
+    # Constraints and drivers change the evaluated pose, so only a visual bake captures it
+    if any(len(bone.constraints) for bone in avatar.pose.bones):
+        return True
+    anim = avatar.animation_data
+    return bool(anim and len(anim.drivers))
+
+
+def sample_pose_channels(avatar):
+    bones = avatar.pose.bones
+    samples = {}
+    for channel, size in CHANNEL_SIZES.items():
+        values = np.empty(len(bones) * size, dtype=np.float32)
+        bones.foreach_get(channel, values)
+        samples[channel] = values.reshape(-1, size)
+    return samples
+
+
+def write_fcurve(action, data_path, index, group, co, interpolation=None):
+    fcurve = action.fcurves.find(data_path, index=index)
+    if fcurve is not None:
+        # Keep keys outside the written range, like nla.bake with use_current_action
+        count = len(fcurve.keyframe_points)
+        if count:
+            old = np.empty(count * 2, dtype=np.float32)
+            fcurve.keyframe_points.foreach_get("co", old)
+            old = old.reshape(-1, 2)
+            keep = old[(old[:, 0] < co[0]) | (old[:, 0] > co[-2])]
+            if len(keep):
+                merged = np.concatenate([keep, co.reshape(-1, 2)])
+                co = merged[np.argsort(merged[:, 0], kind="stable")].ravel()
+        action.fcurves.remove(fcurve)
+
+    fcurve = action.fcurves.new(data_path, index=index, action_group=group)
+    fcurve.keyframe_points.add(len(co) // 2)
+    fcurve.keyframe_points.foreach_set("co", co)
+    if interpolation:
+        for point in fcurve.keyframe_points:
+            point.interpolation = interpolation
+    fcurve.update()
+
+
+def key_pose_fast(avatar, frames, samples, reduce_tolerance=0.0):
+    # samples: channel -> (frames, bones, size) arrays; one foreach_set per F-curve.
+    # With a tolerance, each curve keeps only the keys linear interpolation can't reproduce.
+    anim = avatar.animation_data_create()
+    if anim.action is None:
+        anim.action = bpy.data.actions.new(name=f"{avatar.name}Action")
+    action = anim.action
+
+    frames = np.asarray(frames, dtype=np.float32)
+    co = np.empty((len(frames), 2), dtype=np.float32)
+    co[:, 0] = frames
+    keys = 0
+    for i, bone in enumerate(avatar.pose.bones):
+        rotation = ROTATION_CHANNELS.get(bone.rotation_mode, "rotation_euler")
+        for channel in ("location", rotation, "scale"):
+            data_path = bone.path_from_id(channel)
+            for index in range(CHANNEL_SIZES[channel]):
+                co[:, 1] = samples[channel][:, i, index]
+                keep = reduce_keys(frames, co[:, 1], reduce_tolerance)
+                reduced = not keep.all()
+                write_fcurve(action, data_path, index, bone.name, co[keep].ravel(), 'LINEAR' if reduced else None)
+                keys += int(keep.sum())
+    return keys
+
+
+def key_pose(avatar, keying, animation=None, reduce_tolerance=0.0):
+    bake = keying == "bake" or (keying == "auto" and needs_visual_bake(avatar))
+    if animation is None:
+        if bake:
+            bake_pose(avatar)
+            return "bake"
+        samples = sample_pose_channels(avatar)
+        key_pose_fast(avatar, [1.0], {channel: values[np.newaxis] for channel, values in samples.items()})
+        return "fast"
+
+    # Clips are always keyed directly first; a visual bake then resamples them through constraints
+    frames, samples = animation
+    key_pose_fast(avatar, frames, samples, 0.0 if bake else reduce_tolerance)
+    if bake:
+        bake_pose(avatar, int(frames[0]), int(frames[-1]))
+        return "bake"
+    return "fast"
+
+
+def set_export_range(frames, session):
+    # The FBX exporter bakes the scene range; single poses keep the session's original range
+    scene = bpy.context.scene
+    scene.frame_start, scene.frame_end = (int(frames[0]), int(frames[-1])) if frames is not None else session["frame_range"]
+
 
 # --- Clean custom props ---
 def clear_custom_props(obj):
@@ -72,96 +536,324 @@ def clear_custom_props(obj):
         if key not in '_RNA_UI':
             del obj[key]
 
-clear_custom_props(avatar)
-for child in avatar.children:
-    if child.type == 'MESH':
-        clear_custom_props(child)
 
 # --- Export posed FBX ---
-bpy.ops.object.select_all(action='DESELECT')
-avatar.select_set(True)
-for child in avatar.children:
-    if child.type == 'MESH':
+def export_avatar(avatar, export_file, with_meshes=True):
+    meshes = [child for child in avatar.children if child.type == 'MESH'] if with_meshes else []
+    clear_custom_props(avatar)
+    for child in meshes:
+        clear_custom_props(child)
+
+    bpy.ops.object.select_all(action='DESELECT')
+    avatar.select_set(True)
+    for child in meshes:
         child.select_set(True)
 
-bpy.context.view_layer.objects.active = avatar
-bpy.ops.export_scene.fbx(
-    filepath=export_file,
-    use_selection=True,
-    apply_unit_scale=True,
-    bake_anim=True,
-    bake_anim_use_all_bones=True,
-    bake_anim_use_nla_strips=False,
-    add_leaf_bones=False
-)
-
-print(f"✅ Exported FBX: {export_file}")
-
-# --- Write preview render script ---
-with open(preview_script, "w") as f:
-    f.write(f"""
-import bpy
-import math
-
-bpy.ops.wm.read_factory_settings(use_empty=True)
-bpy.ops.import_scene.fbx(filepath=r"{export_file}")
-
-avatar = [obj for obj in bpy.context.selected_objects if obj.type == 'ARMATURE']
-if not avatar:
-    print("❌ No armature found in preview.")
-    exit(1)
-avatar = avatar[0]
-
-# Add lighting
-def add_light(name, type, loc, energy=1000):
-    bpy.ops.object.light_add(type=type, location=loc)
-    light = bpy.context.object
-    light.name = name
-    light.data.energy = energy
-    return light
-
-add_light("Key", "AREA", (3, -3, 4), 1000)
-add_light("Fill", "AREA", (-3, -2, 2), 500)
-add_light("Back", "AREA", (0, 4, 3), 750)
-
-# Add fixed camera
-bpy.ops.object.camera_add(location=(0, -2.2, 0.9))
-camera = bpy.context.object
-camera.data.lens = 35
-camera.rotation_euler = (math.radians(90), 0, 0)
-bpy.context.scene.camera = camera
-
-avatar.location = (0, 0, 0)
-
-# Force update
-bpy.context.view_layer.update()
-
-# Render settings
-scene = bpy.context.scene
-scene.render.image_settings.file_format = 'PNG'
-scene.render.image_settings.color_mode = 'RGBA'
-scene.render.film_transparent = True
-scene.render.filepath = r"{preview_image}"
-scene.render.resolution_x = 1024
-scene.render.resolution_y = 1024
-
-# Ensure all images are loaded before rendering
-for img in bpy.data.images:
-    if img.packed_file is None and img.source == 'FILE':
-        img.reload()
-
-bpy.ops.render.render(write_still=True)
-print("🖼️ Preview rendered to {preview_image}")
-""")
-
-# --- Run Blender subprocess to render preview ---
-print("🚀 Running Blender subprocess for preview render...")
-subprocess.run([
-    blender_exe,
-    "--background",
-    "--python", preview_script
-])
-
-# --- Clean up ---
-if os.path.exists(preview_script):
-    os.remove(preview_script)
+    bpy.context.view_layer.objects.active = avatar
+    bpy.ops.export_scene.fbx(
+        filepath=export_file,
+        use_selection=True,
+        object_types={'ARMATURE', 'MESH'} if with_meshes else {'ARMATURE'},
+        apply_unit_scale=True,
+        bake_anim=True,
+        bake_anim_use_all_bones=True,
+        bake_anim_use_nla_strips=False,
+        add_leaf_bones=False
+    )
+
+    print(f"✅ Exported FBX: {export_file}")
+
+
+# --- Skeleton-only exports ---
+def export_bvh(avatar, export_file, frames):
+    bpy.ops.object.select_all(action='DESELECT')
+    avatar.select_set(True)
+    bpy.context.view_layer.objects.active = avatar
+    bpy.ops.export_anim.bvh(
+        filepath=export_file,
+        check_existing=False,
+        frame_start=int(frames[0]),
+        frame_end=int(frames[-1]),
+        rotate_mode='NATIVE',
+        root_transform_only=False
+    )
+    print(f"✅ Exported BVH: {export_file}")
+
+
+def sample_bone_transforms(avatar, frames):
+    # Row-major 4x4 matrices per frame and bone: "matrix" is the evaluated armature-space pose
+    # (constraints included), "matrix_basis" the bone's own channels relative to its rest pose
+    scene = bpy.context.scene
+    bones = avatar.pose.bones
+    count = len(bones)
+    names = [bone.name for bone in bones]
+    index = {name: i for i, name in enumerate(names)}
+
+    rest = np.empty(count * 16, dtype=np.float32)
+    avatar.data.bones.foreach_get("matrix_local", rest)
+    matrix = np.empty((len(frames), count * 16), dtype=np.float32)
+    basis = np.empty((len(frames), count * 16), dtype=np.float32)
+    for i, frame in enumerate(frames):
+        scene.frame_set(int(frame))
+        bones.foreach_get("matrix", matrix[i])
+        bones.foreach_get("matrix_basis", basis[i])
+
+    def to_rows(values):
+        # foreach_get yields Blender's column-major memory order
+        return values.reshape(-1, count, 4, 4).transpose(0, 1, 3, 2)
+
+    return {
+        "armature": avatar.name,
+        "bones": names,
+        "parents": np.array([index[bone.parent.name] if bone.parent else -1 for bone in bones], dtype=np.int32),
+        "frames": np.asarray(frames, dtype=np.float32),
+        "fps": scene.render.fps / scene.render.fps_base,
+        "world": np.array(avatar.matrix_world, dtype=np.float32),
+        "rest": to_rows(rest)[0],
+        "matrix": to_rows(matrix),
+        "matrix_basis": to_rows(basis),
+    }
+
+
+def write_bone_transforms(export_file, transforms, output_format):
+    if output_format == "npz":
+        np.savez_compressed(export_file, **{key: np.asarray(value) for key, value in transforms.items()})
+    else:
+        data = {key: np.round(value, 6).tolist() if isinstance(value, np.ndarray) else value
+                for key, value in transforms.items()}
+        with open(export_file, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+    print(f"✅ Exported bone transforms: {export_file}")
+
+
+def export_result(avatar, export_file, frames, output_format):
+    # Exporters open with "wb": drop any existing file first, so a copy or link of it elsewhere
+    # (the result cache, a collapsed duplicate) is left intact instead of truncated
+    if os.path.lexists(export_file):
+        os.remove(export_file)
+    if output_format in ("fbx", "armature-fbx"):
+        export_avatar(avatar, export_file, with_meshes=output_format == "fbx")
+    elif output_format == "bvh":
+        export_bvh(avatar, export_file, frames)
+    else:
+        write_bone_transforms(export_file, sample_bone_transforms(avatar, frames), output_format)
+
+
+# --- Preview render ---
+def render_preview(avatar, preview_image, session, options):
+    # Lights and camera are added once per session and reused for every job
+    if session.get("preview_objects") is None:
+        session["preview_objects"] = preview_render.setup_preview_scene()
+    bpy.context.scene.frame_set(1)
+    settings = preview_render.preview_settings(
+        options["preview_preset"], options["preview_resolution"], options["preview_samples"])
+    preview_render.render_posed_avatar(avatar, preview_image, settings, preview_render.view_angles(options["preview_views"]))
+
+
+# --- Run jobs ---
+def wants_preview(options):
+    if options["preview"] is None:
+        return options["output_format"] == "fbx"
+    return options["preview"]
+
+
+def run_job(job, avatar, base_action, session, record, options):
+    timings = record["timings"]
+    name = job["output_name"]
+    export_file = os.path.join(job["export_path"], name + OUTPUT_FORMATS[options["output_format"]])
+    preview_image = os.path.join(job["export_path"], f"{name}.png")
+
+    with stage("import_pose", timings, job=name) as info:
+        pose_data = load_pose_data(job, session["pose_cache"], session["libraries"], options)
+        info["bones"] = len(pose_data["bone_names"])
+
+    with stage("map_bones", timings, job=name) as info:
+        mapping = map_bones(avatar, pose_data, options)
+        record["mapped_bones"] = info["mapped"] = len(mapping.pairs)
+        record["unmapped_bones"] = mapping.unmapped_target
+        info["unmapped"] = len(mapping.unmapped_target)
+
+    with stage("apply", timings, job=name) as info:
+        reset_avatar(avatar, base_action)
+        if "frames" in pose_data:
+            animation = apply_animation(avatar, pose_data, mapping)
+            record["frames"] = info["frames"] = len(animation[0])
+        else:
+            apply_pose(avatar, pose_data, mapping)
+            animation = None
+
+    with stage("bake", timings, job=name) as info:
+        record["keying"] = info["keying"] = key_pose(avatar, options["keying"], animation, options["reduce_tolerance"])
+
+    with stage("export", timings, job=name) as info:
+        os.makedirs(job["export_path"], exist_ok=True)
+        set_export_range(animation[0] if animation else None, session)
+        export_result(avatar, export_file, animation[0] if animation else [1], options["output_format"])
+        info["size"] = progress_events.file_size(export_file)
+
+    if wants_preview(options):
+        with stage("preview", timings, job=name) as info:
+            render_preview(avatar, preview_image, session, options)
+            info["size"] = progress_events.file_size(preview_image)
+    else:
+        preview_image = None
+
+    return export_file, preview_image
+
+
+def run_jobs(jobs, on_result=None, options=None):
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    results = []
+    scene = bpy.context.scene
+    session = {"pose_cache": {}, "libraries": {}, "preview_objects": None,
+               "frame_range": (scene.frame_start, scene.frame_end)}
+    armature_only = options["output_format"] != "fbx" and not wants_preview(options)
+    for avatar_fbx, avatar_jobs in group_by_avatar(jobs).items():
+        # Clips are evaluated frame by frame, so read them before the avatar's meshes join the scene
+        pose_times = [{} for _job in avatar_jobs]
+        if options["frames"]:
+            for job, preload in zip(avatar_jobs, pose_times):
+                try:
+                    with stage("import_pose", preload, job=job["output_name"]) as info:
+                        info["bones"] = len(load_pose_data(job, session["pose_cache"], session["libraries"], options)["bone_names"])
+                except Exception:
+                    pass  # Reported by the job itself
+
+        avatar_timings = {}
+        try:
+            with stage("import_avatar", avatar_timings, job=avatar_jobs[0]["output_name"], avatar=avatar_fbx) as info:
+                avatar, avatar_objects = load_avatar(avatar_fbx, options["avatar_cache"], armature_only)
+                info["bones"] = len(avatar.pose.bones)
+                info["objects"] = len(avatar_objects)
+            avatar_error = None
+        except TransferError as e:
+            avatar, avatar_objects, avatar_error = None, [], str(e)
+        base_action = avatar.animation_data.action if avatar and avatar.animation_data else None
+
+        for i, job in enumerate(avatar_jobs):
+            timings = dict(pose_times[i], import_avatar=avatar_timings["import_avatar"] if i == 0 else 0.0)
+            record = dict(job, status="failed", error=avatar_error, timings=timings)
+            progress_events.emit("job_start", job=job["output_name"])
+            job_start = time.perf_counter()
+            if avatar is not None:
+                try:
+                    record["export_file"], record["preview_image"] = run_job(job, avatar, base_action, session, record, options)
+                    record["status"] = "ok"
+                except Exception as e:
+                    record["error"] = str(e)
+            timings["total"] = time.perf_counter() - job_start + timings["import_avatar"] + pose_times[i].get("import_pose", 0.0)
+            progress_events.emit("job_end", job=job["output_name"], status=record["status"], error=record["error"],
+                                 timings=timings)
+            if record["error"]:
+                print(f"❌ {job['output_name']}: {record['error']}")
+            results.append(record)
+            if on_result:
+                on_result(record)
+
+        # Drop the avatar before the next one; pose data stays loaded for reuse
+        if avatar is not None:
+            reset_avatar(avatar, base_action)
+            delete_objects(avatar_objects)
+            bpy.data.orphans_purge(do_recursive=True)
+
+    return results
+
+
+# --- Pose library ---
+def index_poses(pose_fbxs, library_path):
+    library = PoseLibrary.load(library_path) if os.path.exists(library_path) else PoseLibrary()
+    records = []
+    for pose_fbx in pose_fbxs:
+        # Files without a readable skeleton are rejected before paying for an import
+        _skeleton, problems = fbx_reader.check_file(pose_fbx, "Pose")
+        if problems:
+            print(f"❌ {pose_fbx}: {'; '.join(problems)}")
+            continue
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        try:
+            pose_data = import_pose(pose_fbx)
+        except TransferError as e:
+            print(f"❌ {pose_fbx}: {e}")
+            continue
+        name = os.path.splitext(os.path.basename(pose_fbx))[0]
+        records.append(dict(pose_data, name=name, source=os.path.abspath(pose_fbx)))
+        print(f"📥 Indexed {name} ({len(pose_data['bone_names'])} bones)")
+
+    library.add_poses(records)
+    library.save(library_path)
+    print(f"✅ Pose library: {len(library)} poses in {library_path}")
+    return len(pose_fbxs) - len(records)
+
+
+def library_jobs(library_path, avatar_fbx, export_path, blender_exe, pose_names=None):
+    library = PoseLibrary.load(library_path)
+    avatar_stem = os.path.splitext(os.path.basename(avatar_fbx))[0]
+    return [{
+        "pose_library": os.path.abspath(library_path),
+        "pose_name": name,
+        "avatar_fbx": avatar_fbx,
+        "export_path": export_path,
+        "blender_exe": blender_exe,
+        "output_name": f"{avatar_stem}__{name}",
+    } for name in (pose_names or library.pose_names)]
+
+
+def write_batch_results(jobs, results_path, options):
+    with open(results_path, "w") as results_file:
+        def write_record(record):
+            results_file.write(json.dumps(record) + "\n")
+            results_file.flush()
+
+        results = run_jobs(jobs, on_result=write_record, options=options)
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    total_time = sum(r["timings"]["total"] for r in results)
+    print(f"✅ Batch finished: {len(results) - failed}/{len(results)} succeeded in {total_time:.1f}s")
+    print(f"📄 Results written to {results_path}")
+    return results
+
+
+def main():
+    args = parse_args()
+
+    if args.index_poses:
+        failed = index_poses(args.positional, args.index_poses)
+        sys.exit(1 if failed else 0)
+
+    if args.pose_library:
+        jobs = library_jobs(args.pose_library, args.avatar, args.export_path, bpy.app.binary_path, args.poses)
+        repeats = []
+        if args.dedupe_poses:
+            index = pose_similarity.PoseIndex.from_library(PoseLibrary.load(args.pose_library))
+            jobs, repeats = pose_similarity.dedupe_jobs(jobs, index, args.pose_tolerance, pose_key="pose_name")
+            pose_similarity.print_dedupe(jobs, repeats, args.dedupe_poses)
+        results_path = args.results or os.path.join(args.export_path, "library_results.jsonl")
+        results = write_batch_results(jobs, results_path, options_from_args(args))
+        if args.dedupe_poses == "collapse":
+            succeeded = {r["output_name"] for r in results if r["status"] == "ok"}
+            for job, leader in repeats:
+                if leader["output_name"] in succeeded:
+                    pose_similarity.copy_outputs(job, leader)
+        sys.exit(1 if any(r["status"] != "ok" for r in results) else 0)
+
+    if args.prepare_avatar:
+        failed = prepare_avatars(args.prepare_avatar, args.avatar_cache or avatar_cache.DEFAULT_AVATAR_CACHE_DIR)
+        sys.exit(1 if failed else 0)
+
+    if not args.batch:
+        results = run_jobs([job_from_positional(args.positional)], options=options_from_args(args))
+        if results[0]["status"] != "ok":
+            sys.exit(1)
+        return
+
+    jobs = load_manifest(args.batch, export_path=args.export_path)
+    results_path = args.results or os.path.splitext(os.path.abspath(args.batch))[0] + "_results.jsonl"
+    results = write_batch_results(jobs, results_path, options_from_args(args))
+    if any(r["status"] != "ok" for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
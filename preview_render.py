@@ -0,0 +1,273 @@
+import bpy
+import math
+import os
+import shutil
+import sys
+import argparse
+import numpy as np
+from mathutils import Matrix, Vector
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from preview_views import PREVIEW_PRESETS, VIEWS_SUFFIX, view_angles
+
+WORKBENCH_AA = ["1", "5", "8", "11", "16", "32"]
+
+# Light rig relative to the avatar's centre, laid out for a ~1m bounding radius (a standing human)
+LIGHT_RIG = [
+    ("Key", (3, -3, 3.1), 1000),
+    ("Fill", (-3, -2, 1.1), 500),
+    ("Back", (0, 4, 2.1), 750),
+]
+REFERENCE_RADIUS = 1.0
+FRAME_MARGIN = 1.05  # Breathing room around the bounding sphere
+
+
+def preview_settings(preset="standard", resolution=None, samples=None):
+    settings = dict(PREVIEW_PRESETS[preset])
+    if resolution:
+        settings["resolution"] = resolution
+    if samples:
+        settings["samples"] = samples
+    return settings
+
+
+# Add lighting
+def add_light(name, type, loc, energy=1000):
+    bpy.ops.object.light_add(type=type, location=loc)
+    light = bpy.context.object
+    light.name = name
+    light.data.energy = energy
+    return light
+
+
+def views_arg(value):
+    # argparse type for --preview-views
+    try:
+        view_angles(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def views_folder(preview_image):
+    return os.path.splitext(preview_image)[0] + VIEWS_SUFFIX
+
+
+def setup_preview_scene():
+    # Placed for a ~1.8m avatar; frame_view() moves camera and lights to the actual avatar before each render
+    center = Vector((0, 0, 0.9))
+    lights = []
+    for name, offset, energy in LIGHT_RIG:
+        light = add_light(name, "AREA", center + Vector(offset), energy)
+        light["rig_offset"] = offset
+        light["rig_energy"] = energy
+        light["rig_size"] = light.data.size
+        lights.append(light)
+
+    bpy.ops.object.camera_add(location=(0, -2.2, 0.9))
+    camera = bpy.context.object
+    camera.data.lens = 35
+    camera.rotation_euler = (math.radians(90), 0, 0)
+    bpy.context.scene.camera = camera
+    return lights + [camera]
+
+
+# --- Camera fitting ---
+def avatar_bounds(avatar):
+    # World-space box of the posed (deformed) meshes, or of the bones for skeleton-only scenes
+    bpy.context.view_layer.update()
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    points = []
+    for obj in getattr(avatar, "children_recursive", avatar.children):
+        if obj.type == 'MESH' and not obj.hide_render:
+            evaluated = obj.evaluated_get(depsgraph)
+            points += [evaluated.matrix_world @ Vector(corner) for corner in evaluated.bound_box]
+    if not points:
+        for bone in avatar.pose.bones:
+            points += [avatar.matrix_world @ bone.head, avatar.matrix_world @ bone.tail]
+    if not points:
+        return Vector((0, 0, 0.9)), REFERENCE_RADIUS
+
+    lo = Vector(tuple(min(p[i] for p in points) for i in range(3)))
+    hi = Vector(tuple(max(p[i] for p in points) for i in range(3)))
+    return (lo + hi) / 2, max((hi - lo).length / 2, 1e-3)
+
+
+def frame_view(center, radius, angle):
+    # Orbits the camera around the avatar's vertical axis and keeps the bounding sphere in frame;
+    # the light rig turns with it and scales with the avatar, so every view is lit the same way
+    scene = bpy.context.scene
+    camera = scene.camera
+    turn = Matrix.Rotation(math.radians(angle), 3, 'Z')
+    distance = radius * FRAME_MARGIN / math.sin(camera.data.angle / 2)
+    camera.location = center + turn @ Vector((0, -distance, 0))
+    camera.rotation_euler = (math.radians(90), 0, math.radians(angle))
+    camera.data.clip_start = distance * 0.01
+    camera.data.clip_end = distance + radius * 4
+
+    scale = radius / REFERENCE_RADIUS
+    for obj in scene.objects:
+        if obj.type == 'LIGHT' and "rig_offset" in obj:
+            obj.location = center + turn @ (Vector(obj["rig_offset"]) * scale)
+            obj.data.energy = obj["rig_energy"] * scale ** 2
+            obj.data.size = obj["rig_size"] * scale
+
+
+def configure_render(scene, settings):
+    if settings["engine"] == "WORKBENCH":
+        scene.render.engine = 'BLENDER_WORKBENCH'
+        scene.display.shading.light = 'STUDIO'
+        scene.display.shading.color_type = 'TEXTURE'
+        scene.display.render_aa = min(WORKBENCH_AA, key=lambda aa: abs(int(aa) - settings["samples"]))
+    else:
+        try:
+            scene.render.engine = 'BLENDER_EEVEE_NEXT'  # Blender 4.2+
+        except TypeError:
+            scene.render.engine = 'BLENDER_EEVEE'
+        scene.eevee.taa_render_samples = settings["samples"]
+
+
+def render_still(preview_image, settings=None, reload_images=True):
+    settings = settings or preview_settings()
+
+    # Force update
+    bpy.context.view_layer.update()
+
+    # Render settings
+    scene = bpy.context.scene
+    configure_render(scene, settings)
+    scene.render.image_settings.file_format = 'PNG'
+    scene.render.image_settings.color_mode = 'RGBA'
+    scene.render.film_transparent = True
+    scene.render.filepath = preview_image
+    scene.render.resolution_x = settings["resolution"]
+    scene.render.resolution_y = settings["resolution"]
+    scene.render.resolution_percentage = 100
+
+    # Ensure all images are loaded before rendering
+    if reload_images:
+        for img in bpy.data.images:
+            if img.packed_file is None and img.source == 'FILE':
+                img.reload()
+
+    bpy.ops.render.render(write_still=True)
+    print(f"🖼️ Preview rendered to {preview_image}")
+
+
+# --- Contact sheet ---
+def read_pixels(path):
+    image = bpy.data.images.load(path)
+    try:
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+    finally:
+        bpy.data.images.remove(image)
+    return pixels.reshape(height, width, 4)
+
+
+def shrink(pixels, size):
+    # Box filter on premultiplied colour so transparent edges don't darken; nearest sampling for odd ratios
+    height, width = pixels.shape[:2]
+    if (height, width) == (size, size):
+        return pixels
+    premul = pixels.copy()
+    premul[..., :3] *= premul[..., 3:]
+    if height % size == 0 and width % size == 0:
+        premul = premul.reshape(size, height // size, size, width // size, 4).mean(axis=(1, 3))
+    else:
+        premul = premul[np.arange(size) * height // size][:, np.arange(size) * width // size]
+    alpha = premul[..., 3:]
+    premul[..., :3] = np.divide(premul[..., :3], alpha, out=np.zeros_like(premul[..., :3]), where=alpha > 0)
+    return premul
+
+
+def write_contact_sheet(view_images, sheet_path, size):
+    # Near-square grid that fits in size x size, so galleries treat it like a single preview
+    columns = math.ceil(math.sqrt(len(view_images)))
+    rows = math.ceil(len(view_images) / columns)
+    tile = size // columns
+    sheet = np.zeros((rows * tile, columns * tile, 4), dtype=np.float32)
+    for i, path in enumerate(view_images):
+        row, column = divmod(i, columns)
+        y = (rows - 1 - row) * tile  # Blender images start at the bottom row
+        sheet[y:y + tile, column * tile:(column + 1) * tile] = shrink(read_pixels(path), tile)
+
+    image = bpy.data.images.new("ContactSheet", columns * tile, rows * tile, alpha=True)
+    try:
+        image.pixels.foreach_set(sheet.ravel())
+        image.filepath_raw = sheet_path
+        image.file_format = 'PNG'
+        image.save()
+    finally:
+        bpy.data.images.remove(image)
+    print(f"🖼️ Contact sheet of {len(view_images)} views written to {sheet_path}")
+
+
+def render_views(avatar, preview_image, settings=None, angles=(0,), reload_images=True):
+    # One render per angle in the already loaded scene; several angles also make a contact sheet
+    settings = settings or preview_settings()
+    center, radius = avatar_bounds(avatar)
+    views_dir = views_folder(preview_image)
+    if os.path.isdir(views_dir):
+        shutil.rmtree(views_dir)  # Views from an earlier run with other angles
+    if os.path.lexists(preview_image):
+        os.remove(preview_image)  # Written fresh, never in place, like export_result in the runner
+    if len(angles) == 1:
+        frame_view(center, radius, angles[0])
+        render_still(preview_image, settings, reload_images)
+        return
+
+    os.makedirs(views_dir)
+    view_images = []
+    for angle in angles:
+        frame_view(center, radius, angle)
+        view_images.append(os.path.join(views_dir, f"{angle:03d}.png"))
+        render_still(view_images[-1], settings, reload_images)
+        reload_images = False  # Once per session is enough
+    write_contact_sheet(view_images, preview_image, settings["resolution"])
+
+
+def render_posed_avatar(avatar, preview_image, settings=None, angles=(0,)):
+    # Render the avatar already posed in this session at the origin, as the exported FBX would be
+    location = avatar.location.copy()
+    avatar.location = (0, 0, 0)
+    try:
+        render_views(avatar, preview_image, settings, angles, reload_images=False)
+    finally:
+        avatar.location = location
+
+
+def render_fbx_preview(fbx_path, preview_image, settings=None, angles=(0,)):
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    bpy.ops.import_scene.fbx(filepath=fbx_path)
+
+    avatar = [obj for obj in bpy.context.selected_objects if obj.type == 'ARMATURE']
+    if not avatar:
+        raise RuntimeError("No armature found in preview.")
+    avatar = avatar[0]
+
+    setup_preview_scene()
+    avatar.location = (0, 0, 0)
+    render_views(avatar, preview_image, settings, angles)
+
+
+if __name__ == "__main__":
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    parser = argparse.ArgumentParser(prog="preview_render.py")
+    parser.add_argument("fbx")
+    parser.add_argument("image")
+    parser.add_argument("--preview-preset", choices=sorted(PREVIEW_PRESETS), default="standard")
+    parser.add_argument("--preview-resolution", type=int)
+    parser.add_argument("--preview-samples", type=int)
+    parser.add_argument("--preview-views", type=views_arg, default="front",
+                        help="front, front-side-back, quad, or N for an N-angle turntable")
+    args = parser.parse_args(argv)
+    try:
+        render_fbx_preview(args.fbx, args.image,
+                           preview_settings(args.preview_preset, args.preview_resolution, args.preview_samples),
+                           view_angles(args.preview_views))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
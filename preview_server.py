@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import urllib.request
+import uuid
+import webbrowser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VENDOR_DIR = os.path.join(SCRIPT_DIR, "vendor", "three")
+THREE_VERSION = "0.158.0"
+THREE_CDN = f"https://cdn.jsdelivr.net/npm/three@{THREE_VERSION}/"
+
+# three.js files the viewer needs, relative to the package root. Files vendored under VENDOR_DIR are
+# served from disk; a missing one redirects the browser to the same pinned release on the CDN, so the
+# viewer still loads on a checkout that hasn't run `--fetch-vendor` (the server itself never downloads).
+VENDOR_FILES = [
+    "LICENSE",
+    "build/three.module.js",
+    "examples/jsm/controls/OrbitControls.js",
+    "examples/jsm/loaders/GLTFLoader.js",
+    "examples/jsm/utils/BufferGeometryUtils.js",
+    "examples/jsm/loaders/DRACOLoader.js",
+    "examples/jsm/libs/draco/gltf/draco_decoder.js",
+    "examples/jsm/libs/draco/gltf/draco_decoder.wasm",
+    "examples/jsm/libs/draco/gltf/draco_wasm_wrapper.js",
+]
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".wasm": "application/wasm",
+    ".glb": "model/gltf-binary",
+    ".png": "image/png",
+}
+CHUNK_SIZE = 1024 * 1024
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+# --- Vendored three.js ---
+def vendor_path(name):
+    return os.path.join(VENDOR_DIR, *name.split("/"))
+
+
+def missing_vendor_files():
+    return [name for name in VENDOR_FILES if not os.path.isfile(vendor_path(name))]
+
+
+def fetch_vendor(force=False):
+    # Only ever called from the CLI; downloads into a temp file so a failed fetch leaves no partial file
+    for name in VENDOR_FILES:
+        path = vendor_path(name)
+        if os.path.isfile(path) and not force:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with urllib.request.urlopen(THREE_CDN + name, timeout=30) as response, open(tmp_path, "wb") as f:
+                shutil.copyfileobj(response, f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        print(f"📦 Vendored three.js {name}")
+    print(f"✅ three.js {THREE_VERSION} vendored in {VENDOR_DIR}")
+
+
+def warn_missing_vendor():
+    missing = missing_vendor_files()
+    if missing:
+        print(f"⚠️ {len(missing)} three.js file(s) missing from {VENDOR_DIR}; the viewer loads them from "
+              f"{THREE_CDN} until `python preview_server.py --fetch-vendor` is run")
+    return missing
+
+
+# --- Viewer page ---
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>__TITLE__</title>
+    <style>
+        body { margin: 0; overflow: hidden; font-family: monospace; }
+        #progress { position: absolute; top: 50%; width: 100%; text-align: center; font-size: 18px; }
+    </style>
+    <script type="importmap">__IMPORTMAP__</script>
+</head>
+<body>
+<div id="progress">Loading...</div>
+<script type="module">
+import * as THREE from "three";
+import { OrbitControls } from "three/addons/controls/OrbitControls.js";
+import { GLTFLoader } from "three/addons/loaders/GLTFLoader.js";
+import { DRACOLoader } from "three/addons/loaders/DRACOLoader.js";
+
+const model = __MODEL__;
+const progress = document.getElementById("progress");
+
+const scene = new THREE.Scene();
+scene.background = new THREE.Color(0xf0f0f0);
+const camera = new THREE.PerspectiveCamera(70, window.innerWidth / window.innerHeight, 0.01, 1000);
+camera.position.set(0, 1.5, 3);
+
+const renderer = new THREE.WebGLRenderer({ antialias: true });
+renderer.setSize(window.innerWidth, window.innerHeight);
+document.body.appendChild(renderer.domElement);
+
+const controls = new OrbitControls(camera, renderer.domElement);
+controls.enableDamping = true;
+scene.add(new THREE.HemisphereLight(0xffffff, 0x444444, 1.2));
+
+// Preview profiles are Draco-compressed; the decoder is only fetched when a model needs it
+const dracoLoader = new DRACOLoader();
+dracoLoader.setDecoderPath("/vendor/three/examples/jsm/libs/draco/gltf/");
+const loader = new GLTFLoader();
+loader.setDRACOLoader(dracoLoader);
+
+// Streamed from disk by the local server, no base64 round trip
+loader.load(model.url, gltf => {
+    scene.add(gltf.scene);
+    const box = new THREE.Box3().setFromObject(gltf.scene);
+    const center = box.getCenter(new THREE.Vector3());
+    const size = box.getSize(new THREE.Vector3()).length() || 1;
+    controls.target.copy(center);
+    camera.position.copy(center).add(new THREE.Vector3(0, size * 0.2, size * 1.2));
+    progress.remove();
+}, event => {
+    const total = event.total || model.size;
+    progress.textContent = total ? `Loading ${(100 * event.loaded / total).toFixed(0)}%` : `Loading ${(event.loaded / 1048576).toFixed(1)} MB`;
+}, error => {
+    progress.textContent = `Failed to load model: ${error.message || error}`;
+});
+
+function animate() {
+    requestAnimationFrame(animate);
+    controls.update();
+    renderer.render(scene, camera);
+}
+animate();
+
+window.addEventListener('resize', () => {
+    camera.aspect = window.innerWidth / window.innerHeight;
+    camera.updateProjectionMatrix();
+    renderer.setSize(window.innerWidth, window.innerHeight);
+});
+</script>
+</body>
+</html>
+"""
+
+
+def viewer_html(model_url, title, size):
+    importmap = {"imports": {
+        "three": "/vendor/three/build/three.module.js",
+        "three/addons/": "/vendor/three/examples/jsm/",
+    }}
+    html = VIEWER_HTML.replace("__TITLE__", title.replace("<", "&lt;"))
+    html = html.replace("__IMPORTMAP__", json.dumps(importmap))
+    return html.replace("__MODEL__", json.dumps({"url": model_url, "size": size}))
+
+
+# --- HTTP ---
+class PreviewRequestHandler(BaseHTTPRequestHandler):
+    server_version = "PoseTransferPreview/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def handle_request(self, send_body):
+        path = self.path.split("?", 1)[0]
+        try:
+            if path.startswith("/view/"):
+                entry = self.server.models.get(path[len("/view/"):])
+                if entry is None:
+                    return self.send_error(404)
+                body = viewer_html(f"/model/{entry['token']}.glb", entry["title"], os.path.getsize(entry["path"])).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPES[".html"])
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+            elif path.startswith("/model/") and path.endswith(".glb"):
+                entry = self.server.models.get(path[len("/model/"):-len(".glb")])
+                if entry is None:
+                    return self.send_error(404)
+                self.send_file(entry["path"], send_body, cache=False)
+            elif path.startswith("/vendor/three/"):
+                name = path[len("/vendor/three/"):]
+                path = vendor_path(name)
+                if name not in VENDOR_FILES:
+                    return self.send_error(404)
+                if not os.path.isfile(path):
+                    return self.redirect(THREE_CDN + name)
+                self.send_file(path, send_body, cache=True)
+            else:
+                self.send_error(404)
+        except OSError as e:
+            if not isinstance(e, (BrokenPipeError, ConnectionResetError)):
+                self.send_error(500, str(e))
+
+    def redirect(self, url):
+        self.send_response(302)
+        self.send_header("Location", url)
+        self.send_header("Content-Length", "0")
+        self.send_header("Cache-Control", "no-store")  # Picks up files vendored later
+        self.end_headers()
+
+    def send_file(self, path, send_body, cache):
+        # Streams from disk in chunks; honours single byte ranges so large GLBs load incrementally
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        status = 200
+        match = RANGE_PATTERN.match(self.headers.get("Range", ""))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start > end or start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream"))
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Cache-Control", "max-age=86400" if cache else "no-store")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not send_body:
+            return
+
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+class PreviewServer:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), PreviewRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.models = {}
+        self.host, self.port = self.httpd.server_address[:2]
+        warn_missing_vendor()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def publish(self, glb_path, title=None):
+        # Returns the viewer URL for a GLB on disk; the file is read per request, never copied
+        token = uuid.uuid4().hex[:12]
+        self.httpd.models[token] = {
+            "token": token,
+            "path": os.path.abspath(glb_path),
+            "title": title or os.path.basename(glb_path),
+            "published": time.time(),
+        }
+        return f"http://{self.host}:{self.port}/view/{token}"
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+# --- CLI: view a GLB in the browser ---
+def main():
+    parser = argparse.ArgumentParser(description="Serve a GLB and the three.js viewer from a local HTTP server")
+    parser.add_argument("glb", nargs="?", help="GLB file to view")
+    parser.add_argument("--port", type=int, default=0, help="Port to listen on (default: any free port)")
+    parser.add_argument("--fetch-vendor", action="store_true", help="Download missing pinned three.js files into vendor/three and exit")
+    parser.add_argument("--force", action="store_true", help="With --fetch-vendor, re-download files that already exist")
+    parser.add_argument("--no-browser", action="store_true", help="Print the URL instead of opening it")
+    args = parser.parse_args()
+
+    if args.fetch_vendor:
+        fetch_vendor(force=args.force)
+        return
+    if not args.glb:
+        parser.error("a GLB file is required unless --fetch-vendor is given")
+
+    with PreviewServer(port=args.port) as server:
+        url = server.publish(args.glb)
+        print(f"🌐 Viewer: {url} (Ctrl+C to stop)")
+        if not args.no_browser:
+            webbrowser.open(url)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
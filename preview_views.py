@@ -0,0 +1,25 @@
+# Preview camera angles and quality presets, shared by preview_render.py (inside Blender) and the orchestration side
+# (job service, watch folder, stub), so it must not import bpy.
+
+# Angles in degrees around the avatar (0 = front); a number N instead is an N-angle turntable.
+# Several views render to <name>_views/<angle>.png and <name>.png becomes their contact sheet.
+VIEW_SETS = {"front": [0], "front-side-back": [0, 90, 180], "quad": [0, 90, 180, 270]}
+MAX_TURNTABLE_VIEWS = 36
+VIEWS_SUFFIX = "_views"
+
+# Quality presets; "standard" matches the original 1024px Eevee preview
+PREVIEW_PRESETS = {
+    "thumbnail": {"engine": "WORKBENCH", "resolution": 256, "samples": 5},
+    "fast": {"engine": "WORKBENCH", "resolution": 512, "samples": 8},
+    "standard": {"engine": "EEVEE", "resolution": 1024, "samples": 64},
+}
+
+
+def view_angles(views="front"):
+    views = str(views)
+    if views in VIEW_SETS:
+        return VIEW_SETS[views]
+    if not views.isdigit() or not 0 < int(views) <= MAX_TURNTABLE_VIEWS:
+        raise ValueError(f"Preview views must be one of {', '.join(VIEW_SETS)} or a turntable count "
+                         f"1-{MAX_TURNTABLE_VIEWS}, got {views!r}")
+    return [round(i * 360 / int(views)) for i in range(int(views))]
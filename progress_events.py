@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Progress events share stdout with Blender's logging, so they carry a marker like worker replies.
+#   {"event": "stage_start", "stage": "export", "time": ...}
+#   {"event": "stage_end", "stage": "export", "start": ..., "end": ..., "elapsed": ..., "ok": true, "size": ...}
+#   {"event": "job_start" | "job_end", "job": "<output_name>", ...}
+EVENT_PREFIX = "@@POSE_PROGRESS@@ "
+
+STAGES = ["import_avatar", "import_pose", "map_bones", "apply", "bake", "export", "preview"]
+STAGE_LABELS = {
+    "import_avatar": "Import avatar",
+    "import_pose": "Import pose",
+    "map_bones": "Map bones",
+    "apply": "Apply",
+    "bake": "Bake",
+    "export": "Export",
+    "preview": "Render",
+}
+
+
+# --- Emitting (Blender side) ---
+def emit(event, **fields):
+    sys.stdout.write(EVENT_PREFIX + json.dumps(dict(fields, event=event, time=time.time())) + "\n")
+    sys.stdout.flush()
+
+
+@contextmanager
+def stage(name, timings=None, **fields):
+    # Yields a dict; whatever the block puts in it (bone counts, file sizes) goes out with stage_end
+    details = {}
+    emit("stage_start", stage=name, **fields)
+    start = time.time()
+    ok = False
+    try:
+        yield details
+        ok = True
+    finally:
+        end = time.time()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + end - start
+        emit("stage_end", stage=name, start=start, end=end, elapsed=end - start, ok=ok, **dict(fields, **details))
+
+
+def file_size(path):
+    return os.path.getsize(path) if path and os.path.exists(path) else None
+
+
+# --- Reading (orchestration side) ---
+def parse_line(line):
+    if not line.startswith(EVENT_PREFIX):
+        return None
+    try:
+        return json.loads(line[len(EVENT_PREFIX):])
+    except ValueError:
+        return None
+
+
+class ProgressTracker:
+    def __init__(self):
+        self.stage = None
+        self.stage_started = None
+        self.timings = {}
+        self.details = {}
+        self.events = 0
+
+    def update(self, event):
+        self.events += 1
+        kind = event.get("event")
+        if kind == "stage_start":
+            self.stage = event["stage"]
+            self.stage_started = event["time"]
+        elif kind == "stage_end":
+            name = event["stage"]
+            self.timings[name] = self.timings.get(name, 0.0) + event["elapsed"]
+            self.details[name] = {k: v for k, v in event.items() if k not in ("event", "stage", "time", "start", "end")}
+            if self.stage == name:
+                self.stage = None
+
+    def current(self):
+        # (stage, seconds spent in it so far) or None between stages
+        if self.stage is None:
+            return None
+        return self.stage, time.time() - self.stage_started
+
+
+def format_timings(timings):
+    names = [name for name in STAGES if name in timings] + sorted(set(timings) - set(STAGES))
+    return " | ".join(f"{STAGE_LABELS.get(name, name)} {timings[name]:.1f}s" for name in names)
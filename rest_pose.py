@@ -0,0 +1,113 @@
+import numpy as np
+
+from fbx_reader import quaternion_multiply
+
+# Rest-pose compensation between two rigs, on plain arrays so it runs without Blender.
+# A rest matrix is a bone's world-space rest transform (armature matrix_world @ bone.matrix_local),
+# row-major 4x4. Quaternions are (w, x, y, z), matching Blender's rotation_quaternion.
+MIN_HIP_HEIGHT = 1e-4  # Below this a rig's hips sit at its origin and give no usable scale
+
+
+def quaternion_conjugate(q):
+    return q * np.array([1.0, -1.0, -1.0, -1.0], dtype=q.dtype)
+
+
+def matrix_to_quaternion(matrices):
+    # (..., 3, 3) rotation matrices, possibly scaled, to unit quaternions with w >= 0.
+    # Shepperd's method: solve from whichever of w, x, y, z is largest, so 180 degree turns stay exact.
+    m = np.asarray(matrices, dtype=np.float64)
+    m = m / np.linalg.norm(m, axis=-2, keepdims=True)
+    m00, m01, m02 = m[..., 0, 0], m[..., 0, 1], m[..., 0, 2]
+    m10, m11, m12 = m[..., 1, 0], m[..., 1, 1], m[..., 1, 2]
+    m20, m21, m22 = m[..., 2, 0], m[..., 2, 1], m[..., 2, 2]
+    pivots = np.sqrt(np.maximum(0.0, np.stack([
+        1.0 + m00 + m11 + m22, 1.0 + m00 - m11 - m22, 1.0 - m00 + m11 - m22, 1.0 - m00 - m11 + m22,
+    ], axis=-1))) / 2
+    w_diff, x_diff, y_diff = m21 - m12, m02 - m20, m10 - m01
+    xy, xz, yz = m01 + m10, m02 + m20, m12 + m21
+    numerators = np.stack([
+        np.stack([pivots[..., 0] ** 2 * 4, w_diff, x_diff, y_diff], axis=-1),
+        np.stack([w_diff, pivots[..., 1] ** 2 * 4, xy, xz], axis=-1),
+        np.stack([x_diff, xy, pivots[..., 2] ** 2 * 4, yz], axis=-1),
+        np.stack([y_diff, xz, yz, pivots[..., 3] ** 2 * 4], axis=-1),
+    ], axis=-2)
+    best = np.argmax(pivots, axis=-1)
+    pivot = np.take_along_axis(pivots, best[..., np.newaxis], axis=-1)
+    q = np.take_along_axis(numerators, best[..., np.newaxis, np.newaxis], axis=-2)[..., 0, :] / (4 * pivot)
+    q *= np.where(q[..., :1] < 0, -1.0, 1.0)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def bone_alignment(source_rest, target_rest):
+    # (B, 4) world rotations turning each target bone's rest direction onto its source bone's, by the
+    # shortest arc so the bone's roll is kept. A Blender bone points along its rest matrix's Y axis.
+    a = np.asarray(target_rest[:, :3, 1], dtype=np.float64)
+    b = np.asarray(source_rest[:, :3, 1], dtype=np.float64)
+    a = a / np.linalg.norm(a, axis=-1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=-1, keepdims=True)
+    q = np.concatenate([1.0 + np.sum(a * b, axis=-1, keepdims=True), np.cross(a, b)], axis=-1)
+    opposite = q[:, 0] < 1e-6
+    if opposite.any():
+        # Half turn about any axis perpendicular to the bone
+        helper = np.where(np.abs(a[opposite, :1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]])
+        q[opposite] = np.concatenate([np.zeros((opposite.sum(), 1)), np.cross(a[opposite], helper)], axis=-1)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def parent_order(parents):
+    # Bone indices with every parent before its children
+    depth = {}
+
+    def depth_of(i):
+        if i not in depth:
+            depth[i] = 0 if parents[i] < 0 else depth_of(parents[i]) + 1
+        return depth[i]
+    return sorted(range(len(parents)), key=depth_of)
+
+
+def retarget_rotations(quaternions, source_rest, target_rest, parents):
+    # Each target bone is posed to point where its source bone points in world space:
+    #   target world = source world . Rs^-1 . A . Rt
+    # where A turns the target's rest bone direction onto the source's (bone_alignment). A T-pose
+    # source on an A-pose avatar therefore lifts the avatar's arms into the T, and rigs whose rest
+    # poses match reduce to re-expressing the rotation in the target's bone axes, Rt^-1 Rs q Rs^-1 Rt.
+    # World poses are built parent first; unmapped bones in between are taken to stay at rest.
+    # quaternions: (B, 4) or (F, B, 4); source_rest/target_rest: (B, 4, 4) for the same bone pairs;
+    # parents: (B,) index of each pair's nearest mapped parent, -1 for roots
+    q = np.asarray(quaternions, dtype=np.float64)
+    rs = matrix_to_quaternion(source_rest[:, :3, :3])
+    rt = matrix_to_quaternion(target_rest[:, :3, :3])
+    offset = quaternion_multiply(quaternion_multiply(quaternion_conjugate(rs), bone_alignment(source_rest, target_rest)), rt)
+
+    source_world = np.empty_like(q)
+    target_world = np.empty_like(q)
+    result = np.empty_like(q)
+    for b in parent_order(parents):
+        p = parents[b]
+        # World orientation each bone would have with its own channels at identity
+        if p < 0:
+            source_base, target_base = rs[b], rt[b]
+        else:
+            source_base = quaternion_multiply(source_world[..., p, :], quaternion_multiply(quaternion_conjugate(rs[p]), rs[b]))
+            target_base = quaternion_multiply(target_world[..., p, :], quaternion_multiply(quaternion_conjugate(rt[p]), rt[b]))
+        source_world[..., b, :] = quaternion_multiply(source_base, q[..., b, :])
+        target_world[..., b, :] = quaternion_multiply(source_world[..., b, :], offset[b])
+        result[..., b, :] = quaternion_multiply(quaternion_conjugate(target_base), target_world[..., b, :])
+    return result.astype(np.float32)
+
+
+def hip_scale(source_rest, target_rest):
+    # Ratio of the two rigs' rest hip heights, so a short avatar doesn't inherit a tall rig's stride
+    source_height, target_height = source_rest[2, 3], target_rest[2, 3]
+    if abs(source_height) < MIN_HIP_HEIGHT or abs(target_height) < MIN_HIP_HEIGHT:
+        return 1.0
+    return float(target_height / source_height)
+
+
+def retarget_location(locations, source_rest, target_rest, scale=1.0):
+    # Root translation: source bone-local offset -> world offset, scaled, -> target bone-local offset.
+    # locations: (3,) or (F, 3); source_rest/target_rest: one bone's (4, 4)
+    source_axes = np.asarray(source_rest[:3, :3], dtype=np.float64)
+    target_axes = np.asarray(target_rest[:3, :3], dtype=np.float64)
+    to_target = np.linalg.solve(target_axes, source_axes) * scale
+    return (np.asarray(locations, dtype=np.float64) @ to_target.T).astype(np.float32)
@@ -0,0 +1,354 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+from preview_views import VIEWS_SUFFIX
+
+try:
+    import fcntl
+except ImportError:  # Windows: restores fall back to a plain copy
+    fcntl = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pose_transfer")
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+DEFAULT_CONVERSION_MAX_BYTES = 2 * 1024 ** 3
+SCRATCH_MAX_AGE = 3600  # Leftover .tmp- dirs older than this belong to crashed processes
+FICLONE = 0x40049409  # Linux ioctl: share extents copy-on-write (btrfs, XFS); NOT a hard link
+
+# Anything that changes what Blender produces for the same inputs
+RUNNER_SOURCES = ["pose_transfer_runner.py", "preview_render.py", "preview_views.py", "bone_mapping.py",
+                  "animation_frames.py", "rest_pose.py"]
+CONVERTER_SOURCES = ["glb_export.py"]
+
+_digests = {}
+_digest_lock = threading.Lock()
+
+
+# --- Content hashing ---
+def file_digest(path):
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    memo_key = (path, st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        if memo_key in _digests:
+            return _digests[memo_key]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _digest_lock:
+        _digests[memo_key] = digest
+    return digest
+
+
+def sources_version(sources):
+    sha = hashlib.sha256()
+    for name in sources:
+        path = os.path.join(SCRIPT_DIR, name)
+        sha.update(name.encode())
+        if os.path.exists(path):
+            sha.update(file_digest(path).encode())
+    return sha.hexdigest()[:16]
+
+
+def runner_version():
+    return sources_version(RUNNER_SOURCES)
+
+
+def make_key(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def conversion_key(fbx, profile):
+    return make_key({
+        "fbx": file_digest(fbx),
+        "converter": sources_version(CONVERTER_SOURCES),
+        "profile": profile,
+    })
+
+
+def transfer_key(pose_fbx, avatar_fbx, params=None):
+    return make_key({
+        "pose": file_digest(pose_fbx),
+        "avatar": file_digest(avatar_fbx),
+        "runner": runner_version(),
+        "params": params or {},
+    })
+
+
+# --- Atomic JSON helpers ---
+def write_json_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def read_json(path, default=None):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def clone_or_copy(src, dst):
+    # Restores go into user-writable folders that Blender later overwrites in place, so they must
+    # never share an inode with the cache: reflink where the filesystem can, otherwise a plain copy
+    if os.path.exists(dst):
+        os.remove(dst)
+    if fcntl is not None:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+    else:
+        shutil.copyfile(src, dst)
+    # Keep the timestamp but not the cache's read-only mode
+    st = os.stat(src)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def make_read_only(path):
+    os.chmod(path, stat.S_IMODE(os.stat(path).st_mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def remove_tree(path):
+    # Cached files are read-only, which blocks deletion on Windows
+    if os.name == "nt":
+        for folder, _, names in os.walk(path):
+            for name in names:
+                try:
+                    os.chmod(os.path.join(folder, name), stat.S_IWRITE)
+                except OSError:
+                    pass
+    shutil.rmtree(path, ignore_errors=True)
+
+
+# --- Size-capped LRU store of file sets keyed by content hash ---
+class ContentCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _meta_path(self, key):
+        return os.path.join(self.entry_dir(key), "meta.json")
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+            stats_path = os.path.join(self.root, "stats.json")
+            stats = read_json(stats_path, {"hits": 0, "misses": 0})
+            stats[field] = stats.get(field, 0) + 1
+            write_json_atomic(stats_path, stats)
+
+    def get(self, key):
+        meta = read_json(self._meta_path(key))
+        if meta is None or not all(os.path.exists(os.path.join(self.entry_dir(key), n)) for n in meta["files"]):
+            self._count("misses")
+            return None
+        meta["last_used"] = time.time()
+        write_json_atomic(self._meta_path(key), meta)
+        self._count("hits")
+        return {name: os.path.join(self.entry_dir(key), name) for name in meta["files"]}
+
+    def scratch_dir(self):
+        # Work dir on the cache's filesystem, so finished files can be moved in with put(move=True)
+        return tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+
+    def put(self, key, files, label=None, move=False):
+        # Build the entry in a scratch dir and rename it into place so readers never see a partial entry
+        os.makedirs(os.path.dirname(self.entry_dir(key)), exist_ok=True)
+        tmp_dir = self.scratch_dir()
+        try:
+            size = 0
+            for name, src in files.items():
+                size += os.path.getsize(src)
+                if move:
+                    shutil.move(src, os.path.join(tmp_dir, name))
+                else:
+                    shutil.copy2(src, os.path.join(tmp_dir, name))
+                make_read_only(os.path.join(tmp_dir, name))
+            now = time.time()
+            write_json_atomic(os.path.join(tmp_dir, "meta.json"), {
+                "key": key, "files": sorted(files), "size": size, "label": label, "created": now, "last_used": now,
+            })
+            try:
+                os.rename(tmp_dir, self.entry_dir(key))
+            except OSError:
+                pass  # Another process stored the same entry first
+        finally:
+            if os.path.exists(tmp_dir):
+                remove_tree(tmp_dir)
+        self.evict()
+        return {name: os.path.join(self.entry_dir(key), name) for name in files}
+
+    def restore(self, key, destinations):
+        cached = self.get(key)
+        if cached is None:
+            return False
+        if callable(destinations):
+            destinations = destinations(cached)
+        for name, dst in destinations.items():
+            if name not in cached:
+                continue
+            os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+            clone_or_copy(cached[name], dst)
+        return True
+
+    def entries(self):
+        entries = []
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if prefix.startswith(".") or not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                meta = read_json(os.path.join(prefix_dir, key, "meta.json"))
+                if meta is not None:
+                    entries.append(meta)
+        return entries
+
+    def remove(self, key):
+        remove_tree(self.entry_dir(key))
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda e: e["last_used"])
+        total = sum(e["size"] for e in entries)
+        removed = 0
+        while entries and total > self.max_bytes:
+            entry = entries.pop(0)
+            self.remove(entry["key"])
+            total -= entry["size"]
+            removed += 1
+        return removed
+
+    def purge(self, older_than_days=None):
+        cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        removed = 0
+        for entry in self.entries():
+            if cutoff is None or entry["last_used"] < cutoff:
+                self.remove(entry["key"])
+                removed += 1
+        self.clean_scratch()
+        return removed
+
+    def clean_scratch(self, max_age=SCRATCH_MAX_AGE):
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".tmp-") and os.path.isdir(path) and now - os.path.getmtime(path) > max_age:
+                remove_tree(path)
+
+    def stats(self):
+        entries = self.entries()
+        totals = read_json(os.path.join(self.root, "stats.json"), {"hits": 0, "misses": 0})
+        return {
+            "root": self.root,
+            "entries": len(entries),
+            "size": sum(e["size"] for e in entries),
+            "max_bytes": self.max_bytes,
+            "hits": totals.get("hits", 0),
+            "misses": totals.get("misses", 0),
+        }
+
+
+# --- Pose transfer results ---
+def view_files(views_dir):
+    # {"view_<angle>.png": path} for the views of a multi-view preview, if there are any
+    if not os.path.isdir(views_dir):
+        return {}
+    return {f"view_{name}": os.path.join(views_dir, name) for name in os.listdir(views_dir) if name.endswith(".png")}
+
+
+class ResultCache(ContentCache):
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(os.path.join(root, "results"), max_bytes)
+
+    def lookup(self, key, export_path, output_name, ext=".fbx"):
+        def destinations(cached):
+            # Multi-view previews are stored flat as view_<angle>.png
+            views_dir = os.path.join(export_path, f"{output_name}{VIEWS_SUFFIX}")
+            files = {
+                f"result{ext}": os.path.join(export_path, f"{output_name}{ext}"),
+                "result.png": os.path.join(export_path, f"{output_name}.png"),
+            }
+            files.update({name: os.path.join(views_dir, name[len("view_"):]) for name in cached if name.startswith("view_")})
+            return files
+        return self.restore(key, destinations)
+
+    def store(self, key, export_path, output_name, ext=".fbx"):
+        files = {f"result{ext}": os.path.join(export_path, f"{output_name}{ext}")}
+        preview = os.path.join(export_path, f"{output_name}.png")
+        if os.path.exists(preview):
+            files["result.png"] = preview
+        files.update(view_files(os.path.join(export_path, f"{output_name}{VIEWS_SUFFIX}")))
+        return self.put(key, files, label=output_name)
+
+
+# --- FBX -> GLB conversions for the viewer ---
+class ConversionCache(ContentCache):
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CONVERSION_MAX_BYTES):
+        super().__init__(os.path.join(root, "conversions"), max_bytes)
+
+    def lookup(self, key):
+        # Cached GLBs are served in place; nothing is copied out
+        cached = self.get(key)
+        return cached["model.glb"] if cached else None
+
+    def store(self, key, glb_path, label=None):
+        return self.put(key, {"model.glb": glb_path}, label=label, move=True)["model.glb"]
+
+
+CACHES = {"results": ResultCache, "conversions": ConversionCache}
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} GB"
+
+
+# --- CLI: inspect and purge ---
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or purge the pose transfer caches")
+    parser.add_argument("command", choices=["stats", "list", "purge"])
+    parser.add_argument("--dir", default=DEFAULT_CACHE_DIR, help="Cache root folder")
+    parser.add_argument("--cache", choices=sorted(CACHES), default="results",
+                        help="Pose transfer results or viewer GLB conversions")
+    parser.add_argument("--older-than", type=float, default=None, help="purge: only entries unused for N days (default: all)")
+    args = parser.parse_args()
+
+    cache = CACHES[args.cache](args.dir)
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"{stats['entries']} entries, {format_size(stats['size'])} of {format_size(stats['max_bytes'])} "
+              f"in {stats['root']} ({stats['hits']} hits / {stats['misses']} misses)")
+    elif args.command == "list":
+        for entry in sorted(cache.entries(), key=lambda e: e["last_used"], reverse=True):
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))
+            print(f"{entry['key'][:12]}  {format_size(entry['size']):>10}  {last_used}  {entry.get('label') or ''}")
+    elif args.command == "purge":
+        print(f"Removed {cache.purge(args.older_than)} entries")
+
+
+if __name__ == "__main__":
+    main()
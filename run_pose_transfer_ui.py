@@ -1,15 +1,28 @@
 import subprocess
 import os
-import threading
 import platform
 import json
-import glob
+import queue
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from tkinterdnd2 import DND_FILES, TkinterDnD
 import tkinter as tk
 from tkinter import filedialog
 from PIL import Image, ImageTk
+from blender_pool import BlenderPool
+from job_scheduler import Job, JobScheduler
+from result_cache import ResultCache, DEFAULT_CACHE_DIR, transfer_key
+from progress_events import STAGE_LABELS, format_timings
+from output_index import OutputIndex, LRUCache
+
+GALLERY_TILE = 104  # 96px thumbnail plus spacing
+MAX_JOB_ROWS = 50  # Oldest finished jobs drop off the list beyond this
+ACTIVE_STATES = ("queued", "running", "retrying")
+JOB_COLORS = {"queued": "#007700", "running": "#00FF00", "retrying": "#AAAA00", "done": "#00AA00",
+              "failed": "#FF3333", "cancelled": "#777777"}
 
 class PoseTransferUI:
     def __init__(self, root):
@@ -26,12 +39,46 @@ class PoseTransferUI:
         self.exported_fbx_path = ""
         self.export_folder_path = ""
         self.preview_image = None
+        self.pool = None
+        self.scheduler = None
+        self.pool_size = 1
+        self.max_jobs_per_worker = 50
+        self.job_timeout = None
+        self.active_jobs = 0
+        self.cache_dir = DEFAULT_CACHE_DIR
+        self.cache_max_gb = 5
+        self.preview_preset = "standard"
+        self.preview_views = "front"  # Or front-side-back, quad, N: the preview becomes a contact sheet
+        self.cache_text = tk.StringVar(value="Cache: 0 hits / 0 misses")
+        self.timing_text = tk.StringVar(value="")
+        self.progress_queue = queue.Queue()
+        self.progress_job = None
+        self.job_rows = []  # Newest first, same order as the job list
+        self.last_job_refresh = 0.0
+        self.ui_calls = queue.Queue()
+        self.window_active = True
+        self.title_anim = None
+        self.loading_anim = None
+        self.focus_check_pending = False
+        self.output_index = None
+        self.gallery_entries = []
+        self.gallery_visible = set()
+        self.thumb_cache = LRUCache(max_items=200)
+        self.thumb_pending = set()
+        self.thumb_loader = ThreadPoolExecutor(max_workers=1)
+        self.job_starter = ThreadPoolExecutor(max_workers=1)  # One at a time, so jobs queue in click order
+        self.gallery_redraw_pending = False
 
         self.settings_file = "settings.json"
         self.load_saved_paths()
+        self.result_cache = ResultCache(self.cache_dir, max_bytes=int(self.cache_max_gb * 1024 ** 3))
         self._build_gui()
         self.animate_title()
-        self.load_last_preview()
+        self.poll_ui_calls()
+        # Idle animations pause while the window is in the background
+        self.root.bind("<FocusIn>", lambda e: self.schedule_focus_check(), add="+")
+        self.root.bind("<FocusOut>", lambda e: self.schedule_focus_check(), add="+")
+        self.open_gallery(self.export_folder.get())
 
     def _build_gui(self):
         entry_style = {"bg": "#001100", "fg": "#00FF00", "insertbackground": "#00FF00"}
@@ -92,11 +139,19 @@ class PoseTransferUI:
         self.status_label.grid(row=row, column=0, columnspan=3, pady=2)
         row += 1
 
+        self.timing_label = tk.Label(self.left_frame, textvariable=self.timing_text, bg="black", fg="#00AA00", font=("Courier", 9))
+        self.timing_label.grid(row=row, column=0, columnspan=3, pady=2)
+        row += 1
+
+        self.cache_label = tk.Label(self.left_frame, textvariable=self.cache_text, bg="black", fg="#007700", font=("Courier", 9))
+        self.cache_label.grid(row=row, column=0, columnspan=3, pady=2)
+        row += 1
+
         self.button_row = tk.Frame(self.left_frame, bg="black")
         self.button_row.grid(row=row, column=0, columnspan=3, pady=15)
 
         self.run_button = tk.Button(
-            self.button_row, text="Run Pose Transfer", command=self.run_in_thread, width=20, font=("Courier", 10, "bold"), **button_style
+            self.button_row, text="Run Pose Transfer", command=self.run_pose_transfer, width=20, font=("Courier", 10, "bold"), **button_style
         )
         self.run_button.pack(side="left", padx=5)
 
@@ -107,18 +162,44 @@ class PoseTransferUI:
         self.view_folder_button.pack(side="left", padx=5)
         row += 1
 
+        # Job list: every submitted transfer with its live state; Cancel kills the selected ones
+        self.jobs_frame = tk.Frame(self.left_frame, bg="black")
+        self.jobs_frame.grid(row=row, column=0, columnspan=3, sticky="we", padx=5)
+        self.job_list = tk.Listbox(
+            self.jobs_frame, height=6, selectmode="extended", bg="#001100", fg="#00FF00",
+            selectbackground="#005500", font=("Courier", 9), highlightthickness=0, activestyle="none"
+        )
+        self.job_list.pack(side="left", fill="x", expand=True)
+        self.job_list.bind("<<ListboxSelect>>", lambda e: self.update_cancel_button())
+        self.cancel_button = tk.Button(
+            self.jobs_frame, text="Cancel", command=self.cancel_selected_jobs, width=10,
+            font=("Courier", 10, "bold"), state=tk.DISABLED, **button_style
+        )
+        self.cancel_button.pack(side="left", padx=5, anchor="n")
+        row += 1
+
+        # Output gallery: newest first, thumbnails loaded only for the visible tiles
+        self.gallery_frame = tk.Frame(self.root, bg="black")
+        self.gallery_frame.pack(fill="x", padx=10, pady=(0, 10))
+        self.gallery_canvas = tk.Canvas(self.gallery_frame, height=GALLERY_TILE, bg="black", highlightthickness=0)
+        self.gallery_scroll = tk.Scrollbar(self.gallery_frame, orient="horizontal", command=self.gallery_canvas.xview)
+        self.gallery_canvas.configure(xscrollcommand=self.on_gallery_scroll)
+        self.gallery_canvas.pack(fill="x")
+        self.gallery_scroll.pack(fill="x")
+        self.gallery_canvas.bind("<Configure>", lambda e: self.schedule_gallery_redraw())
+        self.gallery_canvas.bind("<MouseWheel>", lambda e: self.gallery_canvas.xview_scroll(-1 if e.delta > 0 else 1, "units"))
+
     def animate_title(self):
-        def glitch():
-            if random.random() < 0.9:
-                text = ''.join(random.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") if random.random() < 0.2 else c for c in self.title_text)
-                self.title_var.set(text)
-            else:
-                self.title_var.set(self.title_text)
-            self.root.after(100, glitch)
-        glitch()
+        if random.random() < 0.9:
+            text = ''.join(random.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") if random.random() < 0.2 else c for c in self.title_text)
+            self.title_var.set(text)
+        else:
+            self.title_var.set(self.title_text)
+        self.title_anim = self.root.after(100, self.animate_title)
 
     def start_matrix_loading(self):
-        self.loading_label.after(100, self._matrix_tick)
+        if self.loading_anim is None:
+            self.loading_anim = self.loading_label.after(100, self._matrix_tick)
 
     def _matrix_tick(self):
         self.loading_label.config(text=self.loading_chars[self.loading_index % len(self.loading_chars)])
@@ -126,10 +207,38 @@ class PoseTransferUI:
         self.loading_anim = self.loading_label.after(100, self._matrix_tick)
 
     def stop_matrix_loading(self):
-        if hasattr(self, 'loading_anim'):
+        if self.loading_anim is not None:
             self.loading_label.after_cancel(self.loading_anim)
+            self.loading_anim = None
             self.loading_label.config(text="")
 
+    # --- Window focus ---
+    def schedule_focus_check(self):
+        # Focus moving between our own widgets sends FocusOut then FocusIn; look once both have arrived
+        if not self.focus_check_pending:
+            self.focus_check_pending = True
+            self.root.after(50, self.check_focus)
+
+    def check_focus(self):
+        self.focus_check_pending = False
+        try:
+            active = self.root.focus_get() is not None
+        except KeyError:  # Focus is in a Tk-internal widget such as a file dialog
+            active = True
+        if active == self.window_active:
+            return
+        self.window_active = active
+        if active:
+            self.animate_title()
+            if self.active_jobs:
+                self.start_matrix_loading()
+        else:
+            if self.title_anim is not None:
+                self.root.after_cancel(self.title_anim)
+                self.title_anim = None
+            self.title_var.set(self.title_text)
+            self.stop_matrix_loading()
+
     def select_pose_fbx(self):
         file = filedialog.askopenfilename(title="Select Pose FBX", filetypes=[("FBX files", "*.fbx")])
         if file:
@@ -147,6 +256,7 @@ class PoseTransferUI:
         if folder:
             self.export_folder.set(folder)
             self.save_paths()
+            self.open_gallery(folder)
 
     def select_blender_exe(self):
         exe = filedialog.askopenfilename(title="Select Blender Executable", filetypes=[("Executable", "*.exe" if os.name == 'nt' else "*")])
@@ -173,6 +283,13 @@ class PoseTransferUI:
                     self.export_folder.set(data.get("export_folder", ""))
                     self.blender_exe.set(data.get("blender_exe", ""))
                     self.output_name.set(data.get("output_name", "posed_avatar"))
+                    self.pool_size = int(data.get("pool_size", self.pool_size))
+                    self.max_jobs_per_worker = int(data.get("max_jobs_per_worker", self.max_jobs_per_worker))
+                    self.job_timeout = data.get("job_timeout", self.job_timeout)
+                    self.cache_dir = data.get("cache_dir", self.cache_dir)
+                    self.cache_max_gb = float(data.get("cache_max_gb", self.cache_max_gb))
+                    self.preview_preset = data.get("preview_preset", self.preview_preset)
+                    self.preview_views = str(data.get("preview_views", self.preview_views))
             except Exception as e:
                 print("Failed to load settings:", e)
 
@@ -182,7 +299,14 @@ class PoseTransferUI:
             "avatar_fbx": self.avatar_fbx.get(),
             "export_folder": self.export_folder.get(),
             "blender_exe": self.blender_exe.get(),
-            "output_name": self.output_name.get()
+            "output_name": self.output_name.get(),
+            "pool_size": self.pool_size,
+            "max_jobs_per_worker": self.max_jobs_per_worker,
+            "job_timeout": self.job_timeout,
+            "cache_dir": self.cache_dir,
+            "cache_max_gb": self.cache_max_gb,
+            "preview_preset": self.preview_preset,
+            "preview_views": self.preview_views
         }
         try:
             with open(self.settings_file, "w") as f:
@@ -190,15 +314,7 @@ class PoseTransferUI:
         except Exception as e:
             print("Failed to save settings:", e)
 
-    def run_in_thread(self):
-        thread = threading.Thread(target=self.run_pose_transfer)
-        thread.start()
-
     def run_pose_transfer(self):
-        self.status_text.set("Running pose transfer...")
-        self.view_folder_button.config(state=tk.DISABLED)
-        self.start_matrix_loading()
-
         pose = self.pose_fbx.get()
         avatar = self.avatar_fbx.get()
         export = self.export_folder.get()
@@ -207,45 +323,359 @@ class PoseTransferUI:
 
         if not all([pose, avatar, export, blender, name]):
             self.status_text.set("Please fill in all fields.")
-            self.stop_matrix_loading()
             return
 
         self.exported_fbx_path = os.path.join(export, f"{name}.fbx")
         self.export_folder_path = export
-        preview_img_path = os.path.join(export, f"{name}.png")
-        script_path = os.path.abspath("pose_transfer_runner.py")
+        job_args = {"pose_fbx": pose, "avatar_fbx": avatar, "export_path": export, "output_name": name}
+        job_args.update(self.transfer_params())
 
-        cmd = [blender, "--background", "--python", script_path, "--", pose, avatar, export, blender, name]
+        self.active_jobs += 1  # Counted from now, so the loading animation covers the cache check too
+        self.view_folder_button.config(state=tk.DISABLED)
+        self.status_text.set("Checking cache...")
+        self.timing_text.set("")
+        if self.window_active:
+            self.start_matrix_loading()
+        self.job_starter.submit(self.start_transfer, blender, job_args, self.transfer_params())
+
+    def start_transfer(self, blender, job_args, params):
+        # Starter thread: hashing both FBXs, restoring a cache hit and the preflight in submit() all
+        # read files, so none of it runs on the UI thread; results come back through call_in_ui
+        # Identical inputs and settings were already transferred: reuse the stored FBX and PNG
+        try:
+            cache_key = transfer_key(job_args["pose_fbx"], job_args["avatar_fbx"], params)
+            hit = self.result_cache.lookup(cache_key, job_args["export_path"], job_args["output_name"])
+        except OSError as e:
+            self.call_in_ui(lambda: self.transfer_not_started(f"\u274C {e}"))
+            return
+        if hit:
+            self.call_in_ui(lambda: self.finish_cached(job_args, cache_key))
+            return
+
+        scheduler = self.get_scheduler(blender)  # Only ever called from this thread, in click order
+        job = Job("pose_transfer", job_args, on_done=self.on_transfer_done, on_progress=self.on_job_progress)
+        job.cache_key = cache_key
+        job.scheduler = scheduler  # Still the one to cancel through if the pool is replaced later
+        self.call_in_ui(lambda: self.add_job_row(job))  # Queued ahead of any finish_transfer for it
+        scheduler.submit(job)  # A preflight failure finishes it right away, via the UI queue
+        pending = scheduler.pending()
+        self.call_in_ui(lambda: self.transfer_queued(job, pending))
+
+    def transfer_queued(self, job, pending):
+        self.update_cache_text()
+        if job.state in ACTIVE_STATES:
+            self.status_text.set(f"Running pose transfer... ({pending} queued)")
+
+    def finish_cached(self, job_args, cache_key):
+        self.update_cache_text()
+        completion_time = datetime.now().strftime("%H:%M:%S")
+        self.status_text.set(f"\u2705 Pose transfer complete (cached)! [{completion_time}]")
+        self.add_output(job_args["export_path"], job_args["output_name"], cache_key,
+                        job_args["pose_fbx"], job_args["avatar_fbx"])
+        self.view_folder_button.config(state=tk.NORMAL)
+        self.transfer_ended()
+
+    def transfer_not_started(self, message):
+        self.status_text.set(message)
+        self.transfer_ended()
+
+    def transfer_ended(self):
+        self.active_jobs -= 1
+        if self.active_jobs == 0:
+            self.stop_matrix_loading()
 
+    def on_job_progress(self, job, event):
+        # Called on a scheduler thread; Tk is only touched from poll_progress
+        self.progress_queue.put(job)
+
+    def poll_progress(self):
+        changed = set()
+        while True:
+            try:
+                job = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            changed.add(job)
+            self.progress_job = job
+
+        # Elapsed times and queued -> running changes don't send events; refresh those rows twice a second
+        now = time.monotonic()
+        if self.active_jobs and now - self.last_job_refresh >= 0.5:
+            self.last_job_refresh = now
+            changed.update(job for job in self.job_rows if job.state in ACTIVE_STATES)
+        if not changed:
+            return
+        for job in changed:
+            self.update_job_row(job)
+
+        job = self.progress_job
+        if job is not None and job.state == "running":
+            current = job.progress.current()
+            if current:
+                stage, elapsed = current
+                self.status_text.set(f"Running: {STAGE_LABELS.get(stage, stage)} ({elapsed:.1f}s)")
+            if job.progress.timings:
+                self.timing_text.set(format_timings(job.progress.timings))
+
+    # --- Job list ---
+    def job_row_text(self, job):
+        if job.state == "running":
+            current = job.progress.current()
+            if current:
+                stage, elapsed = current
+                detail = f"{STAGE_LABELS.get(stage, stage)} ({elapsed:.1f}s)"
+            else:
+                detail = f"starting ({time.monotonic() - job.started_at:.1f}s)" if job.started_at else "starting"
+        elif job.state == "done":
+            detail = f"done in {job.run_time:.1f}s"
+        elif job.state == "failed":
+            detail = f"failed: {job.error}"
+        elif job.state == "cancelled":
+            detail = "cancelled"
+        else:
+            detail = job.state
+        return f"{job.name[:28]:<28} {detail}"
+
+    def add_job_row(self, job):
+        self.job_rows.insert(0, job)
+        self.job_list.insert(0, self.job_row_text(job))
+        self.job_list.itemconfig(0, fg=JOB_COLORS.get(job.state, "#00FF00"))
+        while len(self.job_rows) > MAX_JOB_ROWS:
+            finished = [i for i, row in enumerate(self.job_rows) if row.state not in ACTIVE_STATES]
+            if not finished:
+                break
+            del self.job_rows[finished[-1]]
+            self.job_list.delete(finished[-1])
+        self.update_cancel_button()
+
+    def update_job_row(self, job):
         try:
-            subprocess.run(cmd, check=True)
+            i = self.job_rows.index(job)
+        except ValueError:
+            return
+        selected = self.job_list.selection_includes(i)
+        self.job_list.delete(i)
+        self.job_list.insert(i, self.job_row_text(job))
+        self.job_list.itemconfig(i, fg=JOB_COLORS.get(job.state, "#00FF00"))
+        if selected:
+            self.job_list.selection_set(i)
+
+    def selected_jobs(self):
+        return [self.job_rows[i] for i in self.job_list.curselection()]
+
+    def update_cancel_button(self):
+        jobs = self.selected_jobs() or self.job_rows
+        active = any(job.state in ACTIVE_STATES for job in jobs)
+        self.cancel_button.config(state=tk.NORMAL if active else tk.DISABLED)
+
+    def cancel_selected_jobs(self):
+        # With nothing selected, Cancel stops the newest unfinished job
+        jobs = [job for job in self.selected_jobs() if job.state in ACTIVE_STATES]
+        if not jobs:
+            jobs = [job for job in self.job_rows if job.state in ACTIVE_STATES][:1]
+        for job in jobs:
+            self.status_text.set(f"Cancelling {job.name}...")
+            # Killing a process tree waits for it to exit, so it never runs on the UI thread
+            threading.Thread(target=job.scheduler.cancel, args=(job,), daemon=True).start()
+
+    def on_transfer_done(self, job):
+        # Scheduler thread: file work happens here, widget updates are handed to the UI thread
+        if job.state == "done":
+            try:
+                self.result_cache.store(job.cache_key, job.args["export_path"], job.args["output_name"])
+            except OSError as e:
+                print("Failed to cache result:", e)
+        self.call_in_ui(lambda: self.finish_transfer(job))
+
+    def finish_transfer(self, job):
+        if job.state == "done":
             completion_time = datetime.now().strftime("%H:%M:%S")
             self.status_text.set(f"\u2705 Pose transfer complete! [{completion_time}]")
-            self.load_preview_image(preview_img_path)
+            if job.progress.timings:
+                self.timing_text.set(format_timings(job.progress.timings))
+            args = job.args
+            self.add_output(args["export_path"], args["output_name"], job.cache_key, args["pose_fbx"], args["avatar_fbx"])
             self.view_folder_button.config(state=tk.NORMAL)
-        except subprocess.CalledProcessError:
-            self.status_text.set("\u274C Blender failed to run. Check console output.")
-        finally:
-            self.stop_matrix_loading()
+        elif job.state == "cancelled":
+            self.status_text.set(f"\u26D4 Pose transfer cancelled: {job.name}")
+        else:
+            self.status_text.set(f"\u274C Pose transfer failed: {job.error}")
+        self.update_job_row(job)
+        self.update_cancel_button()
+        self.transfer_ended()
+
+    def transfer_params(self):
+        params = {"preview": True, "preview_preset": self.preview_preset}
+        if self.preview_views != "front":
+            params["preview_views"] = self.preview_views
+        return params
+
+    def update_cache_text(self):
+        self.cache_text.set(f"Cache: {self.result_cache.hits} hits / {self.result_cache.misses} misses")
+
+    def get_scheduler(self, blender):
+        # Warm Blender workers are kept between runs; a new executable needs a new pool
+        if self.pool is None or self.pool.blender_exe != blender:
+            if self.pool is not None:
+                # Jobs already queued were meant for the old executable: let them finish on the old
+                # pool, then close it, without holding up the UI
+                threading.Thread(target=self.retire_scheduler, args=(self.scheduler, self.pool), daemon=True).start()
+            self.pool = BlenderPool(blender, size=self.pool_size, max_jobs_per_worker=self.max_jobs_per_worker)
+            self.scheduler = JobScheduler(blender, max_workers=self.pool_size, timeout=self.job_timeout, pool=self.pool)
+        return self.scheduler
+
+    def retire_scheduler(self, scheduler, pool):
+        scheduler.shutdown(wait=True)
+        pool.shutdown(wait=True)
+
+    def on_close(self):
+        self.job_starter.shutdown(wait=False)
+        if self.pool is not None:
+            self.scheduler.shutdown(wait=False, cancel_pending=True)
+            self.pool.shutdown(wait=False)
+        self.thumb_loader.shutdown(wait=False)
+        self.root.destroy()
+
+    # --- UI thread hand-off ---
+    def call_in_ui(self, fn):
+        self.ui_calls.put(fn)
+
+    def poll_ui_calls(self):
+        while True:
+            try:
+                fn = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            fn()
+        self.poll_progress()
+        # In the background with nothing running, wake up rarely so an idle window costs next to nothing
+        if self.window_active:
+            delay = 50
+        else:
+            delay = 250 if self.active_jobs else 1000
+        self.root.after(delay, self.poll_ui_calls)
+
+    # --- Output gallery ---
+    def open_gallery(self, export_dir):
+        # The index is read and refreshed off the UI thread; only changed folders are rescanned
+        if not export_dir or not os.path.isdir(export_dir):
+            return
+
+        def load():
+            index = OutputIndex(export_dir)
+            index.refresh()
+            self.call_in_ui(lambda: self.show_gallery(index))
+        self.thumb_loader.submit(load)
+
+    def show_gallery(self, index):
+        self.output_index = index
+        self.gallery_entries = index.latest()
+        self.gallery_canvas.xview_moveto(0)
+        self.schedule_gallery_redraw()
+        if self.gallery_entries:
+            self.show_entry(self.gallery_entries[0])
+
+    def add_output(self, export_dir, name, key, pose_fbx, avatar_fbx):
+        if self.output_index is None or os.path.abspath(self.output_index.export_dir) != os.path.abspath(export_dir):
+            self.output_index = OutputIndex(export_dir)
+        index = self.output_index
+        entry = index.add(name, key=key, pose_fbx=pose_fbx, avatar_fbx=avatar_fbx)
+        self.thumb_cache.discard(self.thumb_key(index, name))  # The render may have been replaced
+        self.gallery_entries = index.latest()
+        self.schedule_gallery_redraw()
+        self.show_entry(entry)
+
+    def on_gallery_scroll(self, first, last):
+        self.gallery_scroll.set(first, last)
+        self.schedule_gallery_redraw()
+
+    def schedule_gallery_redraw(self):
+        if not self.gallery_redraw_pending:
+            self.gallery_redraw_pending = True
+            self.root.after_idle(self.draw_gallery)
+
+    def draw_gallery(self):
+        self.gallery_redraw_pending = False
+        canvas = self.gallery_canvas
+        entries = self.gallery_entries
+        width = len(entries) * GALLERY_TILE
+        canvas.configure(scrollregion=(0, 0, width, GALLERY_TILE))
+        canvas.delete("tile")
+
+        first, last = canvas.xview()
+        start = int(first * width) // GALLERY_TILE
+        end = min(len(entries), int(last * width) // GALLERY_TILE + 1)
+        self.gallery_visible = {self.thumb_key(self.output_index, entry["name"]) for entry in entries[start:end]}
+        for i in range(start, end):
+            entry = entries[i]
+            x = i * GALLERY_TILE + 4
+            tag = f"tile{i}"
+            photo = self.thumb_cache.get(self.thumb_key(self.output_index, entry["name"]))
+            if photo is not None:
+                canvas.create_image(x, 4, image=photo, anchor="nw", tags=("tile", tag))
+            else:
+                canvas.create_rectangle(x, 4, x + 96, 100, outline="#003300", tags=("tile", tag))
+                canvas.create_text(x + 48, 52, text=entry["name"][:12], fill="#007700", font=("Courier", 8), tags=("tile", tag))
+                self.request_thumbnail(entry)
+            canvas.tag_bind(tag, "<Button-1>", lambda e, entry=entry: self.show_entry(entry))
+
+    @staticmethod
+    def thumb_key(index, name):
+        # Thumbnails are cached per export folder; the same output name can exist in several
+        return os.path.abspath(index.export_dir), name
+
+    def request_thumbnail(self, entry):
+        index = self.output_index
+        key = self.thumb_key(index, entry["name"])
+        if key in self.thumb_pending or entry.get("png") is None:
+            return
+        self.thumb_pending.add(key)
 
-    def load_preview_image(self, path):
-        if os.path.exists(path):
+        def load():
+            image = None
             try:
-                img = Image.open(path).convert("RGBA").resize((256, 256))
-                self.preview_image = ImageTk.PhotoImage(img)
-                self.preview_label.config(image=self.preview_image, text="")
-            except Exception as e:
-                print("Failed to load preview image:", e)
+                if key in self.gallery_visible:  # Scrolled past (or to another folder) before we got to it
+                    image = self.decode_thumbnail(index, entry, 96)
+            finally:
+                self.call_in_ui(lambda: self.thumbnail_ready(key, image))
+        self.thumb_loader.submit(load)
+
+    def thumbnail_ready(self, key, image):
+        self.thumb_pending.discard(key)
+        if image is not None:
+            self.thumb_cache.put(key, ImageTk.PhotoImage(image))
+            self.schedule_gallery_redraw()
+
+    def decode_thumbnail(self, index, entry, size):
+        # Decodes the small cached thumbnail, never the full-size render
+        try:
+            thumb = index.thumbnail(entry)
+            if thumb is None:
+                return None
+            img = Image.open(thumb).convert("RGBA")
+            img.thumbnail((size, size))
+            return img
+        except Exception as e:
+            print("Failed to load thumbnail:", e)
+            return None
+
+    def show_entry(self, entry):
+        index = self.output_index
+        self.exported_fbx_path = os.path.join(index.export_dir, entry["fbx"]) if entry.get("fbx") else ""
+        self.export_folder_path = index.export_dir
+
+        def load():
+            image = self.decode_thumbnail(index, entry, 256)
+            self.call_in_ui(lambda: self.show_preview(image))
+        self.thumb_loader.submit(load)
+
+    def show_preview(self, image):
+        if image is not None:
+            self.preview_image = ImageTk.PhotoImage(image)
+            self.preview_label.config(image=self.preview_image, text="")
         else:
             self.preview_label.config(image="", text="waiting for render")
 
-    def load_last_preview(self):
-        export_dir = self.export_folder.get()
-        if export_dir:
-            previews = sorted(glob.glob(os.path.join(export_dir, "*.png")), key=os.path.getmtime, reverse=True)
-            if previews:
-                self.load_preview_image(previews[0])
-
     def open_export_folder(self):
         if os.path.exists(self.export_folder_path):
             try:
@@ -263,4 +693,5 @@ class PoseTransferUI:
 if __name__ == "__main__":
     root = TkinterDnD.Tk()
     app = PoseTransferUI(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
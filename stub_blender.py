@@ -0,0 +1,265 @@
+import json
+import os
+import shutil
+import struct
+import sys
+import time
+import traceback
+import zlib
+
+# Stand-in for `blender --background --python <script> -- args` on machines without Blender.
+# It speaks the same worker protocol and writes placeholder outputs so the orchestration
+# around Blender (pools, queues, file handling) can run end to end.
+from batch_manifest import OUTPUT_FORMATS
+from blender_pool import PROTOCOL_PREFIX
+from preview_views import VIEWS_SUFFIX, view_angles
+from progress_events import stage
+
+DELAY = float(os.environ.get("STUB_BLENDER_DELAY", "0.05"))
+
+
+def open_output(path):
+    # Like the runner's exporters: an existing output is replaced, never truncated in place
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.lexists(path):
+        os.remove(path)
+    return open(path, "wb")
+
+
+def write_placeholder(path, size=1024):
+    with open_output(path) as f:
+        f.write(b"STUB" + b"\0" * max(0, size - 4))
+
+
+# --- Minimal binary FBX: an armature of LimbNode models, padded with an embedded blob ---
+STUB_BONES = ["Hips", "Spine", "Chest", "Neck", "Head", "LeftUpperArm", "LeftLowerArm", "RightUpperArm",
+              "RightLowerArm", "LeftUpperLeg", "LeftLowerLeg", "RightUpperLeg", "RightLowerLeg"]
+FBX_VERSION = 7400
+
+
+def fbx_property(value):
+    if isinstance(value, bytes):
+        return b"R" + struct.pack("<I", len(value)) + value
+    if isinstance(value, str):
+        data = value.encode()
+        return b"S" + struct.pack("<I", len(data)) + data
+    if isinstance(value, float):
+        return b"D" + struct.pack("<d", value)
+    return b"L" + struct.pack("<q", value)
+
+
+def fbx_node(name, props=(), children=(), offset=0):
+    # 7.4 record: end offset, property count, property bytes, name; children end with a null record
+    prop_data = b"".join(fbx_property(value) for value in props)
+    head_size = 13 + len(name)
+    body = b""
+    if children:
+        for child in children:
+            body += fbx_node(*child, offset=offset + head_size + len(prop_data) + len(body))
+        body += b"\0" * 13
+    end = offset + head_size + len(prop_data) + len(body)
+    return struct.pack("<IIIB", end, len(props), len(prop_data), len(name)) + name.encode() + prop_data + body
+
+
+def write_fbx(path, bone_names, size=0, rotations=None):
+    # rotations: optional {bone name: (x, y, z) Euler degrees}, so stand-in poses can differ
+    rotations = rotations or {}
+    bones = []
+    for i, name in enumerate(bone_names):
+        props = [("P", ("Lcl Translation", "Lcl Translation", "", "A", 0.0, 0.1, 0.0))]
+        if name in rotations:
+            props.append(("P", ("Lcl Rotation", "Lcl Rotation", "", "A", *map(float, rotations[name]))))
+        bones.append(("Model", (100 + i, f"{name}\x00\x01Model", "LimbNode"), [("Properties70", (), props)]))
+    links = [("C", ("OO", 1, 0))] + [("C", ("OO", 100 + i, 99 + i if i else 1)) for i in range(len(bone_names))]
+    nodes = [
+        ("FBXHeaderExtension", (), [("FBXVersion", (FBX_VERSION,))]),
+        ("Creator", ("stub_blender",)),
+        ("GlobalSettings", (), [("Properties70", (), [("P", ("TimeMode", "enum", "", "", 11))])]),
+        ("Objects", (), [("Model", (1, "Armature\x00\x01Model", "Null"))] + bones),
+        ("Connections", (), links),
+    ]
+    data = b"Kaydara FBX Binary  \x00\x1a\x00" + struct.pack("<I", FBX_VERSION)
+    for node in nodes:
+        data += fbx_node(*node, offset=len(data))
+    padding = max(0, size - len(data) - 64)
+    if padding:
+        # Stands in for mesh and texture data; skeleton reads skip it without decoding
+        data += fbx_node("Video", (2, "Texture\x00\x01Video", "Clip"), [("Content", (b"\0" * padding,))], offset=len(data))
+    data += b"\0" * 13
+    with open_output(path) as f:
+        f.write(data)
+
+
+def write_png(path, width=64, height=64, rgba=(0, 255, 0, 255)):
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    row = b"\0" + bytes(rgba) * width
+    png = b"\x89PNG\r\n\x1a\n"
+    png += chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+    png += chunk(b"IDAT", zlib.compress(row * height))
+    png += chunk(b"IEND", b"")
+    with open_output(path) as f:
+        f.write(png)
+
+
+def write_preview(image, views="front"):
+    # Same files as preview_render: <name>.png, plus <name>_views/<angle>.png for several views
+    angles = view_angles(views)
+    views_dir = os.path.splitext(image)[0] + VIEWS_SUFFIX
+    shutil.rmtree(views_dir, ignore_errors=True)
+    if len(angles) > 1:
+        for angle in angles:
+            write_png(os.path.join(views_dir, f"{angle:03d}.png"))
+    write_png(image)
+
+
+# --- Fake job handlers ---
+def handle_pose_transfer(args):
+    output_format = args.get("output_format", "fbx")
+    export_file = os.path.join(args["export_path"], args["output_name"] + OUTPUT_FORMATS[output_format])
+    preview_image = os.path.join(args["export_path"], f"{args['output_name']}.png")
+    name = args["output_name"]
+    timings = {}
+    for stage_name, path in (("import_avatar", args["avatar_fbx"]), ("import_pose", args["pose_fbx"])):
+        with stage(stage_name, timings, job=name):
+            if not os.path.exists(path):
+                raise RuntimeError(f"File not found: {path}")
+    with stage("apply", timings, job=name):
+        time.sleep(DELAY / 2)
+    with stage("export", timings, job=name) as info:
+        time.sleep(DELAY / 2)
+        # Skeleton-only outputs don't carry the avatar's meshes and textures
+        if output_format in ("fbx", "armature-fbx"):
+            write_fbx(export_file, STUB_BONES, os.path.getsize(args["avatar_fbx"]) if output_format == "fbx" else 0)
+        else:
+            write_placeholder(export_file, 4096)
+        info["size"] = os.path.getsize(export_file)
+    preview = args.get("preview")
+    if preview or (preview is None and output_format == "fbx"):
+        with stage("preview", timings, job=name) as info:
+            write_preview(preview_image, args.get("preview_views") or "front")
+            info["size"] = os.path.getsize(preview_image)
+    else:
+        preview_image = None
+    return {"status": "ok", "export_file": export_file, "preview_image": preview_image, "timings": timings}
+
+
+def handle_render_preview(args):
+    time.sleep(DELAY)
+    write_preview(args["image"], args.get("preview_views") or "front")
+    return {"preview_image": args["image"]}
+
+
+GLB_SIZE_FACTORS = {"full": 1.0, "preview": 0.25, "thumbnail": 0.05}
+
+
+def handle_convert_glb(args):
+    time.sleep(DELAY)
+    fbx_bytes = os.path.getsize(args["fbx"]) if os.path.exists(args["fbx"]) else 1024
+    profile = args.get("profile", "full")
+    write_placeholder(args["glb"], int(fbx_bytes * GLB_SIZE_FACTORS[profile]))
+    return {"glb": args["glb"], "profile": profile, "fbx_bytes": fbx_bytes, "glb_bytes": os.path.getsize(args["glb"])}
+
+
+def generate_synthetic_rig(script_args):
+    # Stand-in FBXs sized roughly like synthetic_rigs.py output, so file I/O still scales
+    out_dir = script_args[0]
+    options = dict(zip(script_args[1::2], script_args[2::2]))
+    bones = int(options.get("--bones", 65))
+    verts = int(options.get("--verts", 20000))
+    texture = int(options.get("--texture", 1024))
+    frames = int(options.get("--frames", 1))
+    time.sleep(DELAY)
+    bone_names = ["Hips"] + [f"Bone_{i:03d}" for i in range(1, bones)]
+    write_fbx(os.path.join(out_dir, "avatar.fbx"), bone_names, verts * 32 + texture * texture + bones * 256)
+    write_fbx(os.path.join(out_dir, "pose.fbx"), bone_names, bones * 256 * frames)
+
+
+HANDLERS = {
+    "pose_transfer": handle_pose_transfer,
+    "render_preview": handle_render_preview,
+    "convert_glb": handle_convert_glb,
+    "ping": lambda args: {"pid": os.getpid()},
+}
+
+
+def reply(message):
+    sys.stdout.write(PROTOCOL_PREFIX + json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def serve():
+    reply({"id": None, "ready": True, "pid": os.getpid()})
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        if request.get("type") == "shutdown":
+            break
+        start = time.perf_counter()
+        try:
+            handler = HANDLERS.get(request.get("type"))
+            if handler is None:
+                raise ValueError(f"Unknown job type: {request.get('type')}")
+            result = handler(request.get("args") or {})
+            reply({"id": request.get("id"), "ok": True, "result": result, "elapsed": time.perf_counter() - start})
+        except Exception as e:
+            reply({"id": request.get("id"), "ok": False, "error": str(e), "elapsed": time.perf_counter() - start})
+
+
+# --- One-shot `--python <script> -- args` runs ---
+def option(script_args, flag):
+    return script_args[script_args.index(flag) + 1] if flag in script_args else None
+
+
+def run_script(script, script_args):
+    positional = [arg for arg in script_args if not arg.startswith("--")]  # Options follow the positionals
+    name = os.path.basename(script)
+    try:
+        if name == "pose_transfer_runner.py" and "--prepare-avatar" in script_args:
+            time.sleep(DELAY)  # The stub has no avatar cache to fill
+        elif name == "pose_transfer_runner.py":
+            pose_fbx, avatar_fbx, export_path, _blender, output_name = positional[:5]
+            preview = False if "--no-preview" in script_args else True if "--preview" in script_args else None
+            output_format = script_args[script_args.index("--output-format") + 1] if "--output-format" in script_args else "fbx"
+            handle_pose_transfer({"pose_fbx": pose_fbx, "avatar_fbx": avatar_fbx, "export_path": export_path,
+                                  "output_name": output_name, "preview": preview, "output_format": output_format,
+                                  "preview_views": option(script_args, "--preview-views")})
+        elif name == "preview_render.py":
+            handle_render_preview({"fbx": positional[0], "image": positional[1],
+                                   "preview_views": option(script_args, "--preview-views")})
+        elif name == "synthetic_rigs.py":
+            generate_synthetic_rig(script_args)
+        elif name == "glb_export.py":
+            profile = script_args[script_args.index("--profile") + 1] if "--profile" in script_args else "full"
+            handle_convert_glb({"fbx": positional[0], "glb": positional[1], "profile": profile})
+        else:
+            print(f"stub_blender: unsupported script {script}", file=sys.stderr)
+            return 2
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ stub_blender ran {name}")
+    return 0
+
+
+def main():
+    argv = sys.argv[1:]
+    script = argv[argv.index("--python") + 1] if "--python" in argv else None
+    script_args = argv[argv.index("--") + 1:] if "--" in argv else []
+
+    if script and os.path.basename(script) == "blender_worker.py":
+        serve()
+        return
+    try:
+        code = run_script(script or "", script_args)
+    except Exception:
+        # Blender reports a script's uncaught exception as success unless --python-exit-code is set
+        traceback.print_exc()
+        code = int(option(argv, "--python-exit-code") or 0)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
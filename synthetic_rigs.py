@@ -0,0 +1,170 @@
+import bpy
+import os
+import sys
+import math
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pose_transfer_runner import key_pose_fast
+
+# Generates a benchmark avatar (armature + skinned mesh + texture) and a matching pose FBX.
+# Bone count, vertex count and texture size scale independently so each cost can be isolated.
+LIMBS = 5  # Spine/head, two arms, two legs hanging off the hips
+HEIGHT = 1.8
+
+
+# --- Armature ---
+def build_armature(bone_count):
+    data = bpy.data.armatures.new("SynthRig")
+    armature = bpy.data.objects.new("SynthRig", data)
+    bpy.context.scene.collection.objects.link(armature)
+    bpy.context.view_layer.objects.active = armature
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    hips = data.edit_bones.new("Hips")
+    hips.head = (0, 0, HEIGHT * 0.5)
+    hips.tail = (0, 0, HEIGHT * 0.55)
+
+    # Remaining bones are spread over limb chains radiating from the hips
+    per_limb = max(1, (bone_count - 1) // LIMBS)
+    index = 0
+    for limb in range(LIMBS):
+        angle = 2 * math.pi * limb / LIMBS
+        direction = (math.sin(angle) * 0.5, math.cos(angle) * 0.1, 1.0 if limb == 0 else -0.8)
+        parent = hips
+        for _ in range(per_limb):
+            bone = data.edit_bones.new(f"Bone_{index:03d}")
+            bone.head = parent.tail
+            step = HEIGHT * 0.45 / per_limb
+            bone.tail = tuple(h + d * step for h, d in zip(bone.head, direction))
+            bone.parent = parent
+            bone.use_connect = True
+            parent = bone
+            index += 1
+
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return armature
+
+
+# --- Skinned mesh ---
+def build_mesh(armature, vertex_count, texture_size, out_dir):
+    # A capped-off cylinder of rings x segments vertices around the rig
+    segments = max(8, int(math.sqrt(vertex_count)))
+    rings = max(2, vertex_count // segments)
+    ring, segment = np.divmod(np.arange(rings * segments), segments)
+    angle = 2 * np.pi * segment / segments
+    co = np.stack([0.25 * np.cos(angle), 0.25 * np.sin(angle), HEIGHT * ring / (rings - 1)], axis=1)
+
+    r, s = np.divmod(np.arange((rings - 1) * segments), segments)
+    quads = np.stack([r * segments + s, r * segments + (s + 1) % segments,
+                      (r + 1) * segments + (s + 1) % segments, (r + 1) * segments + s], axis=1)
+
+    mesh = bpy.data.meshes.new("SynthBody")
+    mesh.from_pydata(co.tolist(), [], quads.tolist())
+    uv_layer = mesh.uv_layers.new(name="UVMap")
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    vertex_uv = np.stack([segment / segments, ring / (rings - 1)], axis=1).astype(np.float32)
+    uv_layer.data.foreach_set("uv", vertex_uv[loop_vertices].ravel())
+
+    body = bpy.data.objects.new("SynthBody", mesh)
+    bpy.context.scene.collection.objects.link(body)
+    body.parent = armature
+    body.modifiers.new("Armature", 'ARMATURE').object = armature
+
+    # Rigid skinning: each vertex follows the bone band at its height
+    bones = [bone.name for bone in armature.data.bones]
+    band = np.minimum((ring * len(bones)) // rings, len(bones) - 1)
+    for i, name in enumerate(bones):
+        group = body.vertex_groups.new(name=name)
+        group.add(np.flatnonzero(band == i).tolist(), 1.0, 'REPLACE')
+
+    body.data.materials.append(build_material(texture_size, out_dir))
+    return body
+
+
+def build_material(texture_size, out_dir):
+    image = bpy.data.images.new("SynthTexture", texture_size, texture_size)
+    rng = np.random.default_rng(texture_size)
+    pixels = rng.random((texture_size * texture_size, 4), dtype=np.float32)
+    pixels[:, 3] = 1.0
+    image.pixels.foreach_set(pixels.ravel())
+    image.filepath_raw = os.path.join(out_dir, "synth_texture.png")
+    image.file_format = 'PNG'
+    image.save()
+
+    material = bpy.data.materials.new("SynthMaterial")
+    material.use_nodes = True
+    texture = material.node_tree.nodes.new("ShaderNodeTexImage")
+    texture.image = image
+    bsdf = material.node_tree.nodes["Principled BSDF"]
+    material.node_tree.links.new(texture.outputs["Color"], bsdf.inputs["Base Color"])
+    return material
+
+
+# --- Pose ---
+def key_random_pose(armature, frames, seed):
+    # Smoothly varying rotations so clips look like motion rather than noise
+    bones = armature.pose.bones
+    rng = np.random.default_rng(seed)
+    axes = rng.normal(size=(len(bones), 3))
+    axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+    phase = rng.random(len(bones)) * 2 * np.pi
+    t = np.arange(frames)[:, np.newaxis]
+    half_angle = 0.3 * np.sin(phase + t * 0.1) / 2
+
+    quaternions = np.empty((frames, len(bones), 4), dtype=np.float32)
+    quaternions[..., 0] = np.cos(half_angle)
+    quaternions[..., 1:] = np.sin(half_angle)[..., np.newaxis] * axes
+    samples = {
+        "rotation_quaternion": quaternions,
+        "location": np.zeros((frames, len(bones), 3), dtype=np.float32),
+        "scale": np.ones((frames, len(bones), 3), dtype=np.float32),
+    }
+    key_pose_fast(armature, np.arange(1, frames + 1), samples)
+    bpy.context.scene.frame_start = 1
+    bpy.context.scene.frame_end = frames
+
+
+def export_fbx(objects, path, animated):
+    bpy.ops.object.select_all(action='DESELECT')
+    for obj in objects:
+        obj.select_set(True)
+    bpy.context.view_layer.objects.active = objects[0]
+    bpy.ops.export_scene.fbx(
+        filepath=path,
+        use_selection=True,
+        path_mode='COPY',
+        embed_textures=True,
+        add_leaf_bones=False,
+        bake_anim=animated,
+    )
+
+
+def generate(out_dir, bones, verts, texture, frames, seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    armature = build_armature(bones)
+    body = build_mesh(armature, verts, texture, out_dir)
+    export_fbx([armature, body], os.path.join(out_dir, "avatar.fbx"), animated=False)
+
+    # The pose rig is the same skeleton without the mesh
+    bpy.data.objects.remove(body, do_unlink=True)
+    key_random_pose(armature, frames, seed)
+    export_fbx([armature], os.path.join(out_dir, "pose.fbx"), animated=True)
+    print(f"✅ Synthetic rig: {len(armature.data.bones)} bones, {verts} verts, {texture}px texture, {frames} frames -> {out_dir}")
+
+
+if __name__ == "__main__":
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    parser = argparse.ArgumentParser(prog="synthetic_rigs.py")
+    parser.add_argument("out_dir")
+    parser.add_argument("--bones", type=int, default=65)
+    parser.add_argument("--verts", type=int, default=20000)
+    parser.add_argument("--texture", type=int, default=1024)
+    parser.add_argument("--frames", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.out_dir, args.bones, args.verts, args.texture, args.frames, args.seed)
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# The modules are flat files in the repository root, as when run as scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_blender  # noqa: E402
+
+
+@pytest.fixture
+def rig_files(tmp_path):
+    # A pose and an avatar FBX with the stub's Mixamo-style skeleton
+    pose = str(tmp_path / "pose.fbx")
+    avatar = str(tmp_path / "avatar.fbx")
+    stub_blender.write_fbx(pose, stub_blender.STUB_BONES, rotations={"Spine": (10, 0, 0)})
+    stub_blender.write_fbx(avatar, stub_blender.STUB_BONES, size=4096)
+    return pose, avatar
+
+
+@pytest.fixture
+def transfer_args(rig_files, tmp_path):
+    # Job args for one stub pose transfer; call with an output name
+    pose, avatar = rig_files
+
+    def make(name, **extra):
+        return dict({"pose_fbx": pose, "avatar_fbx": avatar, "export_path": str(tmp_path / "out"),
+                     "output_name": name, "preview": False}, **extra)
+    return make
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from animation_frames import make_continuous, parse_frame_range, reduce_keys, sample_frames
+
+ACTION = (1.0, 120.0)
+
+
+@pytest.mark.parametrize("spec, expected", [
+    (None, (1, 120)),
+    ("all", (1, 120)),
+    ("10:40", (10, 40)),
+    ("10:", (10, 120)),
+    (":40", (1, 40)),
+    ("10", (10, 10)),
+    (" 5 : 6 ", (5, 6)),
+])
+def test_parse_frame_range(spec, expected):
+    assert parse_frame_range(spec, ACTION) == expected
+
+
+@pytest.mark.parametrize("spec", ["40:10", "a:b", "10:x", "1.5:3"])
+def test_parse_frame_range_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_frame_range(spec, ACTION)
+
+
+def test_sample_frames_keeps_ends():
+    frames = sample_frames(1, 100, max_frames=10)
+    assert len(frames) == 10
+    assert (frames[0], frames[-1]) == (1, 100)
+    assert np.array_equal(sample_frames(1, 10, step=3), [1, 4, 7, 10])
+
+
+def test_make_continuous_undoes_sign_flips():
+    angles = np.radians(np.arange(0, 100, 10))
+    smooth = np.stack([np.cos(angles / 2), np.sin(angles / 2), np.zeros_like(angles), np.zeros_like(angles)], axis=-1)
+    flipped = smooth.copy()
+    flipped[3:6] *= -1
+    flipped[8] *= -1
+    result = make_continuous(flipped[:, np.newaxis])[:, 0]
+    assert np.allclose(result, smooth)
+    assert np.all(np.einsum("fi,fi->f", result[1:], result[:-1]) > 0)
+
+
+def test_make_continuous_keeps_short_clips():
+    single = np.array([[[0.0, 0.0, 0.0, -1.0]]])
+    assert np.array_equal(make_continuous(single), single)
+
+
+def test_reduce_keys_keeps_ends_of_flat_curve():
+    times = np.arange(10, dtype=float)
+    keep = reduce_keys(times, np.full(10, 2.5) + np.linspace(0, 1e-4, 10), tolerance=1e-3)
+    assert list(np.flatnonzero(keep)) == [0, 9]
+
+
+def test_reduce_keys_drops_only_keys_within_tolerance():
+    times = np.arange(9, dtype=float)
+    values = np.array([0.0, 1.0, 2.0, 3.0, 4.0, 3.0, 2.0, 1.0, 0.0])  # Two straight lines
+    keep = reduce_keys(times, values, tolerance=0.01)
+    assert list(np.flatnonzero(keep)) == [0, 4, 8]
+
+    noisy = values + np.array([0, 0.05, -0.05, 0, 0, 0.3, 0, 0, 0])
+    keep = reduce_keys(times, noisy, tolerance=0.1)
+    assert keep[0] and keep[-1] and keep[4] and keep[5]
+    rebuilt = np.interp(times, times[keep], noisy[keep])
+    assert np.abs(rebuilt - noisy).max() <= 0.1
+
+
+def test_reduce_keys_without_tolerance_keeps_everything():
+    times = np.arange(5, dtype=float)
+    assert reduce_keys(times, times ** 2, tolerance=0).all()
+    assert reduce_keys(times[:2], times[:2], tolerance=1.0).all()
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+import pytest
+
+from blender_pool import BlenderPool, JobError, WorkerError, worker_command
+from progress_events import EVENT_PREFIX, ProgressTracker
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        pool = BlenderPool(command=worker_command(stub=True), **kwargs)
+        pools.append(pool)
+        return pool
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_dispatches_jobs_across_workers(make_pool, transfer_args):
+    pool = make_pool(size=2)
+    futures = [pool.submit("pose_transfer", transfer_args(f"job{i}")) for i in range(4)]
+    results = [future.result(timeout=30) for future in futures]
+
+    assert [r["status"] for r in results] == ["ok"] * 4
+    assert all(os.path.exists(r["export_file"]) for r in results)
+    assert pool.stats["jobs"] == 4
+    assert pool.stats["failed"] == 0
+    assert pool.stats["spawned"] <= 2
+
+
+def test_job_error_keeps_worker(make_pool, transfer_args):
+    pool = make_pool(size=1)
+    with pytest.raises(JobError):
+        pool.run("pose_transfer", transfer_args("bad", pose_fbx="/missing/pose.fbx"), timeout=30)
+    assert pool.run("pose_transfer", transfer_args("good"), timeout=30)["status"] == "ok"
+    assert pool.stats["spawned"] == 1
+    assert pool.stats["failed"] == 1
+
+
+def test_recycles_workers_after_max_jobs(make_pool, transfer_args):
+    pool = make_pool(size=1, max_jobs_per_worker=2)
+    for i in range(5):
+        pool.run("pose_transfer", transfer_args(f"job{i}"), timeout=30)
+    assert pool.stats["recycled"] == 2
+    assert pool.stats["spawned"] == 3
+
+
+def test_cancel_queued_job(monkeypatch, make_pool, transfer_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "1.0")
+    pool = make_pool(size=1)
+    started = threading.Event()
+    running = pool.submit("pose_transfer", transfer_args("running"), on_progress=lambda event: started.set())
+    queued = pool.submit("pose_transfer", transfer_args("queued"))
+    assert started.wait(30)
+
+    assert pool.cancel(queued)
+    assert queued.cancelled()
+    assert running.result(timeout=30)["status"] == "ok"
+
+
+def test_cancel_running_job_replaces_worker(monkeypatch, make_pool, transfer_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "5.0")
+    pool = make_pool(size=1)
+    started = threading.Event()
+    future = pool.submit("pose_transfer", transfer_args("slow"), on_progress=lambda event: started.set())
+    assert started.wait(30)
+
+    assert pool.cancel(future)
+    with pytest.raises(WorkerError):
+        future.result(timeout=30)
+    assert pool.stats["cancelled"] == 1
+    assert pool.stats["restarted"] == 1
+
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "0.01")
+    assert pool.run("pose_transfer", transfer_args("next"), timeout=30)["status"] == "ok"
+    assert pool.stats["spawned"] == 2
+
+
+def test_cancel_while_worker_starts(monkeypatch, make_pool, transfer_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "10")
+    pool = make_pool(size=1)
+    future = pool.submit("pose_transfer", transfer_args("slow"))
+    while not future.running() and not future.done():
+        time.sleep(0.001)
+
+    assert pool.cancel(future)
+    with pytest.raises((JobError, WorkerError)):
+        future.result(timeout=5)
+    assert pool.stats["cancelled"] == 1
+
+
+def test_progress_events_reach_callback_not_console(capsys, make_pool, transfer_args):
+    pool = make_pool(size=1)
+    tracker = ProgressTracker()
+    pool.run("pose_transfer", transfer_args("tracked"), on_progress=tracker.update, timeout=30)
+    pool.run("pose_transfer", transfer_args("untracked"), timeout=30)
+
+    assert {"import_avatar", "import_pose", "export"} <= set(tracker.timings)
+    assert EVENT_PREFIX not in capsys.readouterr().out
+
+
+def test_submit_after_shutdown_fails(transfer_args):
+    pool = BlenderPool(command=worker_command(stub=True), size=1)
+    pool.shutdown()
+    with pytest.raises(JobError):
+        pool.submit("pose_transfer", transfer_args("late")).result(timeout=5)
@@ -0,0 +1,42 @@
+import pytest
+
+from bone_mapping import build_mapping, canonical_name, get_mapping
+
+MIXAMO = ["mixamorig:Hips", "mixamorig:Spine", "mixamorig:LeftUpLeg", "mixamorig:RightUpLeg", "mixamorig:Extra"]
+UNREAL = ["pelvis", "spine_01", "thigh_l", "thigh_r", "ik_foot_root"]
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("mixamorig:LeftUpLeg", "l:upleg"),
+    ("thigh_l", "l:upleg"),
+    ("DEF-thigh.L", "l:upleg"),
+    ("upperarm_r", "r:arm"),
+    ("pelvis", ":hips"),
+    ("Armature|Hips", ":hips"),
+    ("spine_01", ":spine"),
+    ("mixamorig1:RightHandIndex2", "r:handindex2"),
+    ("index_02_l", "l:handindex2"),
+])
+def test_canonical_name(name, expected):
+    assert canonical_name(name) == expected
+
+
+def test_build_mapping_across_naming_schemes():
+    mapping = build_mapping(MIXAMO, UNREAL)
+    assert mapping.pairs == [("pelvis", "mixamorig:Hips"), ("spine_01", "mixamorig:Spine"),
+                             ("thigh_l", "mixamorig:LeftUpLeg"), ("thigh_r", "mixamorig:RightUpLeg")]
+    assert mapping.root == ("pelvis", "mixamorig:Hips")
+    assert mapping.unmapped_source == ["mixamorig:Extra"]
+    assert mapping.unmapped_target == ["ik_foot_root"]
+
+
+def test_user_map_wins_over_names():
+    mapping = build_mapping(["A", "B"], ["X", "B"], {"A": "X"})
+    assert mapping.pairs == [("X", "A"), ("B", "B")]
+
+
+def test_get_mapping_reads_back_from_disk(tmp_path):
+    first = get_mapping(MIXAMO, UNREAL, cache_dir=str(tmp_path))
+    cached = list(tmp_path.iterdir())
+    assert len(cached) == 1 and cached[0].name == f"{first.key}.json"
+    assert get_mapping(MIXAMO, UNREAL, cache_dir=str(tmp_path)).pairs == first.pairs
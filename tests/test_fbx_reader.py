@@ -0,0 +1,114 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from fbx_reader import BINARY_MAGIC, FBXError, FBXFile, check_file, load_skeleton, preflight
+from stub_blender import STUB_BONES, fbx_property, write_fbx
+
+
+def array_property(code, values, compress=False):
+    raw = np.asarray(values, dtype={"d": "<f8", "i": "<i4"}[code]).tobytes()
+    data = zlib.compress(raw) if compress else raw
+    return code.encode() + struct.pack("<III", len(values), int(compress), len(data)) + data
+
+
+def wide_node(name, props=b"", prop_count=0, children=(), offset=0):
+    # 7.5 record: 64-bit end offset, property count and property bytes; null records are 25 bytes
+    head_size = 25 + len(name)
+    body = b""
+    if children:
+        for child in children:
+            body += wide_node(*child, offset=offset + head_size + len(props) + len(body))
+        body += b"\0" * 25
+    end = offset + head_size + len(props) + len(body)
+    return struct.pack("<QQQB", end, prop_count, len(props), len(name)) + name.encode() + props + body
+
+
+def write_wide_fbx(path):
+    # Two bones, a plain and a zlib-compressed array, and a Video blob the skeleton reader skips
+    def model(uid, name):
+        return ("Model", fbx_property(uid) + fbx_property(f"{name}\x00\x01Model") + fbx_property("LimbNode"), 3)
+
+    nodes = [
+        ("FBXHeaderExtension", b"", 0, [("FBXVersion", b"I" + struct.pack("<i", 7500), 1)]),
+        ("Objects", b"", 0, [model(10, "Hips"), model(11, "Spine"),
+                             ("Geometry", array_property("d", [1.0, 2.0, 3.0]) + array_property("i", list(range(100)), True), 2),
+                             ("Video", fbx_property(b"\0" * 256), 1)]),
+        ("Connections", b"", 0, [("C", fbx_property("OO") + fbx_property(11) + fbx_property(10), 3)]),
+    ]
+    data = BINARY_MAGIC + struct.pack("<I", 7500)
+    for node in nodes:
+        data += wide_node(*node, offset=len(data))
+    data += b"\0" * 25
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_reads_stub_7400_file(tmp_path):
+    path = str(tmp_path / "rig.fbx")
+    write_fbx(path, STUB_BONES, size=8192, rotations={"Spine": (10, 20, 30)})
+    with FBXFile(path) as fbx:
+        assert fbx.version == 7400
+        assert [node.name for node in fbx.roots] == ["FBXHeaderExtension", "Creator", "GlobalSettings",
+                                                       "Objects", "Connections", "Video"]
+        blob = fbx.find("Video").child("Content").value(0)
+        assert isinstance(blob, bytes) and not blob.strip(b"\0")
+
+    skeleton = load_skeleton(path)
+    assert skeleton["bone_names"] == STUB_BONES
+    assert skeleton["armatures"] == ["Armature"]
+    assert list(skeleton["parents"][:3]) == [-1, 0, 1]
+    assert list(skeleton["rotations"][STUB_BONES.index("Spine")]) == [10, 20, 30]
+
+
+def test_skip_leaves_out_nodes(tmp_path):
+    path = str(tmp_path / "rig.fbx")
+    write_fbx(path, STUB_BONES, size=8192)
+    with FBXFile(path, skip={"Video"}) as fbx:
+        assert fbx.find("Video") is None
+        assert fbx.find("Connections") is not None
+
+
+def test_reads_7500_wide_records(tmp_path):
+    path = str(tmp_path / "wide.fbx")
+    write_wide_fbx(path)
+    with FBXFile(path) as fbx:
+        assert fbx._wide
+        assert fbx.find("FBXHeaderExtension").child("FBXVersion").value(0) == 7500
+        geometry = fbx.find("Objects").child("Geometry")
+        assert list(geometry.value(0)) == [1.0, 2.0, 3.0]
+        assert list(geometry.value(1)) == list(range(100))
+    skeleton = load_skeleton(path)
+    assert skeleton["version"] == 7500
+    assert skeleton["bone_names"] == ["Hips", "Spine"]
+    assert list(skeleton["parents"]) == [-1, 0]
+
+
+def test_rejects_non_binary_files(tmp_path):
+    ascii_fbx = tmp_path / "ascii.fbx"
+    ascii_fbx.write_text("; FBX 7.4.0 project file\n")
+    with pytest.raises(FBXError, match="ASCII"):
+        FBXFile(str(ascii_fbx))
+    other = tmp_path / "other.fbx"
+    other.write_bytes(b"PK\x03\x04" + b"\0" * 64)
+    with pytest.raises(FBXError, match="Not a binary FBX"):
+        FBXFile(str(other))
+
+
+def test_truncated_file_is_corrupt(tmp_path):
+    path = tmp_path / "rig.fbx"
+    write_fbx(str(path), STUB_BONES)
+    path.write_bytes(path.read_bytes()[:200])
+    with pytest.raises(FBXError, match="Corrupt"):
+        FBXFile(str(path))
+
+
+def test_preflight(tmp_path, rig_files):
+    pose, avatar = rig_files
+    assert preflight(pose, avatar) == []
+    other = str(tmp_path / "other.fbx")
+    write_fbx(other, ["Bone_001", "Bone_002"])
+    assert preflight(pose, other) == ["Pose and avatar skeletons have no bones in common"]
+    assert check_file(str(tmp_path / "missing.fbx"), "Pose")[1][0].startswith("Pose FBX not found")
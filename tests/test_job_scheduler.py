@@ -0,0 +1,124 @@
+import sys
+import threading
+
+import pytest
+
+from job_scheduler import Job, JobScheduler, build_command, stub_command
+
+FLAKY_BLENDER = """\
+import os
+import subprocess
+import sys
+
+# Exits with a transient code the first time, then behaves like the stub
+marker = sys.argv[1]
+if not os.path.exists(marker):
+    open(marker, "w").close()
+    sys.exit(3)
+sys.exit(subprocess.call([sys.executable] + sys.argv[2:]))
+"""
+
+
+def make_scheduler(**kwargs):
+    kwargs.setdefault("blender_command", stub_command())
+    return JobScheduler("blender", max_workers=kwargs.pop("max_workers", 1), backoff=0.01, preflight=False, **kwargs)
+
+
+def transfer_job(transfer_args, name, **extra):
+    return Job("pose_transfer", transfer_args(name, **extra))
+
+
+def test_build_command_sets_python_exit_code():
+    cmd = build_command("render_preview", {"fbx": "in.fbx", "image": "out.png"}, "blender")
+    assert cmd[:3] == ["blender", "--python-exit-code", "1"]
+    assert cmd.index("--python-exit-code") < cmd.index("--python")
+
+
+def test_runs_jobs(transfer_args):
+    scheduler = make_scheduler(max_workers=2)
+    jobs = [scheduler.submit(transfer_job(transfer_args, f"job{i}")) for i in range(3)]
+    scheduler.shutdown()
+    assert [job.state for job in jobs] == ["done"] * 3
+    assert scheduler.report()["succeeded"] == 3
+
+
+def test_retries_transient_exit(tmp_path, transfer_args):
+    wrapper = tmp_path / "flaky_blender.py"
+    wrapper.write_text(FLAKY_BLENDER)
+    command = [sys.executable, str(wrapper), str(tmp_path / "failed_once")] + stub_command()[1:]
+    scheduler = make_scheduler(blender_command=command, retries=2)
+    job = scheduler.submit(transfer_job(transfer_args, "flaky"))
+    scheduler.shutdown()
+    assert job.state == "done"
+    assert job.attempts == 2
+
+
+def test_permanent_exit_is_not_retried(transfer_args):
+    scheduler = make_scheduler(retries=2)
+    job = scheduler.submit(transfer_job(transfer_args, "missing", pose_fbx="/missing/pose.fbx"))
+    scheduler.shutdown()
+    assert job.state == "failed"
+    assert job.attempts == 1
+    assert "code 1" in job.error
+
+
+def test_timeout_is_retried_then_fails(monkeypatch, transfer_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "10")
+    scheduler = make_scheduler(retries=1, timeout=0.5)
+    job = scheduler.submit(transfer_job(transfer_args, "slow"))
+    scheduler.shutdown()
+    assert job.state == "failed"
+    assert job.attempts == 2
+    assert "timed out" in job.error
+
+
+def test_preflight_fails_without_running(rig_files, transfer_args):
+    scheduler = JobScheduler("blender", max_workers=1, blender_command=stub_command())
+    job = scheduler.submit(transfer_job(transfer_args, "missing", pose_fbx="/missing/pose.fbx"))
+    scheduler.shutdown()
+    assert job.state == "failed"
+    assert job.attempts == 0
+
+
+def test_priority_order(monkeypatch, transfer_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "0.5")
+    order = []
+    scheduler = make_scheduler()
+    scheduler.submit(transfer_job(transfer_args, "first"))
+    for name, priority in (("low", 5), ("high", 1)):
+        job = transfer_job(transfer_args, name)
+        job.priority = priority
+        job.on_done = lambda job: order.append(job.name)
+        scheduler.submit(job)
+    scheduler.shutdown()
+    assert order == ["high", "low"]
+
+
+def test_cancel_queued_and_running(monkeypatch, transfer_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "10")
+    scheduler = make_scheduler()
+    running = scheduler.submit(transfer_job(transfer_args, "running"))
+    queued = scheduler.submit(transfer_job(transfer_args, "queued"))
+
+    assert scheduler.cancel(queued)
+    assert queued.state == "cancelled"
+    assert scheduler.cancel(running)
+    scheduler.shutdown()
+    assert running.state == "cancelled"
+    assert not scheduler.cancel(running)
+
+
+def test_shutdown_cancel_pending(monkeypatch, transfer_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "0.5")
+    scheduler = make_scheduler()
+    started = threading.Event()
+    jobs = [transfer_job(transfer_args, f"job{i}") for i in range(3)]
+    jobs[0].on_progress = lambda job, event: started.set()
+    for job in jobs:
+        scheduler.submit(job)
+    assert started.wait(30)
+    scheduler.shutdown(cancel_pending=True)
+    assert jobs[0].state == "done"
+    assert [job.state for job in jobs[1:]] == ["cancelled"] * 2
+    with pytest.raises(RuntimeError):
+        scheduler.submit(transfer_job(transfer_args, "late"))
@@ -0,0 +1,100 @@
+import os
+import time
+
+import pytest
+
+from blender_pool import BlenderPool, worker_command
+from job_scheduler import JobScheduler
+from job_service import JobService, RequestError
+from result_cache import ConversionCache, ResultCache
+
+
+@pytest.fixture
+def service(tmp_path):
+    pool = BlenderPool(command=worker_command(stub=True), size=1)
+    scheduler = JobScheduler(max_workers=1, pool=pool, preflight=False)
+    service = JobService(scheduler, ResultCache(str(tmp_path / "cache")), ConversionCache(str(tmp_path / "cache")))
+    yield service
+    scheduler.shutdown(cancel_pending=True)
+    pool.shutdown()
+
+
+@pytest.fixture
+def request_args(rig_files, tmp_path):
+    pose, avatar = rig_files
+
+    def make(name, **extra):
+        return dict({"pose_fbx": pose, "avatar_fbx": avatar, "export_path": str(tmp_path / name),
+                     "output_name": name}, **extra)
+    return make
+
+
+def finish(service, ticket):
+    return service.wait(ticket["id"], timeout=30)
+
+
+def test_identical_requests_share_one_run(monkeypatch, service, request_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "0.5")
+    first = service.submit("pose_transfer", request_args("first"))
+    second = service.submit("pose_transfer", request_args("second"))
+    assert (first["coalesced"], second["coalesced"]) == (False, True)
+
+    for ticket, name in ((first, "first"), (second, "second")):
+        status = finish(service, ticket)
+        assert status["state"] == "done"
+        assert status["files"]["fbx"] == os.path.join(request_args(name)["export_path"], f"{name}.fbx")
+        assert os.path.exists(status["files"]["fbx"])
+    assert len(service.scheduler.jobs) == 1
+    assert service.health()["coalesced"] == 1
+
+
+def test_cache_hits_are_delivered_without_blender(service, request_args):
+    assert finish(service, service.submit("pose_transfer", request_args("first")))["state"] == "done"
+    repeat = service.submit("pose_transfer", request_args("again"))
+    assert repeat["cached"] and repeat["state"] == "done"
+    assert os.path.exists(repeat["files"]["fbx"])
+    assert repeat["files"]["png"].endswith("again.png")
+    assert len(service.scheduler.jobs) == 1
+
+
+def test_cancel_leaves_shared_run_for_other_callers(monkeypatch, service, request_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "0.5")
+    first = service.submit("pose_transfer", request_args("first"))
+    second = service.submit("pose_transfer", request_args("second"))
+    assert service.cancel(first["id"])
+    assert service.status(first["id"])["state"] == "cancelled"
+    assert finish(service, second)["state"] == "done"
+    assert service.status(first["id"])["state"] == "cancelled"
+    assert not service.cancel(second["id"])
+
+
+def test_cancelling_every_caller_stops_the_run(monkeypatch, service, request_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "10")
+    tickets = [service.submit("pose_transfer", request_args(name)) for name in ("first", "second")]
+    job = service.runs[tickets[0]["key"]].job
+    for ticket in tickets:
+        assert service.cancel(ticket["id"])
+    deadline = time.monotonic() + 30
+    while job.state != "cancelled" and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert job.state == "cancelled"
+    assert tickets[0]["key"] not in service.runs
+
+
+def test_long_poll_times_out(monkeypatch, service, request_args):
+    monkeypatch.setenv("STUB_BLENDER_DELAY", "10")
+    ticket = service.submit("pose_transfer", request_args("slow"))
+    start = time.monotonic()
+    status = service.wait(ticket["id"], timeout=0.3)
+    assert 0.3 <= time.monotonic() - start < 5
+    assert status["state"] in ("queued", "running")
+    service.cancel(ticket["id"])
+
+
+def test_rejects_bad_requests(service, request_args):
+    with pytest.raises(RequestError):
+        service.submit("pose_transfer", request_args("bad", pose_fbx="/missing/pose.fbx"))
+    with pytest.raises(RequestError):
+        service.submit("pose_transfer", request_args("bad", output_format="obj"))
+    with pytest.raises(RequestError):
+        service.submit("render", {})
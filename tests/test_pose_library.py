@@ -0,0 +1,49 @@
+import numpy as np
+
+from pose_library import PoseLibrary
+
+BONES = ["Hips", "Spine", "Head"]
+
+
+def record(name, rest=None, bones=BONES):
+    return {"name": name, "bone_names": bones, "quaternions": np.tile([1.0, 0, 0, 0], (len(bones), 1)),
+            "locations": np.zeros((len(bones), 3)), "rest": rest, "source": f"{name}.fbx"}
+
+
+def rest_for(scale, bones=BONES):
+    return np.tile(np.eye(4, dtype=np.float32), (len(bones), 1, 1)) * scale
+
+
+def test_poses_share_their_rig_rest_matrices(tmp_path):
+    library = PoseLibrary()
+    library.add_poses([record(f"walk{i}", rest_for(1.0)) for i in range(20)]
+                      + [record("other", rest_for(2.0, BONES[:2]), BONES[:2]), record("unknown")])
+    assert library.rigs.shape == (2, 3, 4, 4)
+    assert list(library.rig_index[-3:]) == [0, 1, -1]
+
+    path = str(tmp_path / "poses.npz")
+    library.save(path)
+    loaded = PoseLibrary.load(path)
+    assert np.array_equal(loaded.pose("walk3")["rest"], rest_for(1.0))
+    assert np.array_equal(loaded.pose("other")["rest"], rest_for(2.0, BONES[:2]))
+    assert "rest" not in loaded.pose("unknown")
+
+
+def test_replacing_poses_drops_unused_rigs():
+    library = PoseLibrary()
+    library.add_poses([record("a", rest_for(1.0)), record("b", rest_for(2.0))])
+    library.add_poses([record("b", rest_for(1.0))])
+    assert library.rigs.shape[0] == 1
+    assert list(library.rig_index) == [0, 0]
+
+
+def test_loads_per_pose_rest_tables(tmp_path):
+    path = str(tmp_path / "old.npz")
+    rest = np.stack([rest_for(1.0), rest_for(1.0), np.full((3, 4, 4), np.nan, np.float32)])
+    np.savez_compressed(path, bone_names=np.array(BONES), pose_names=np.array(["a", "b", "c"]),
+                        quaternions=np.tile([1.0, 0, 0, 0], (3, 3, 1)).astype(np.float32),
+                        locations=np.zeros((3, 3, 3), np.float32), mask=np.ones((3, 3), bool),
+                        rest=rest, sources=np.array(["", "", ""]))
+    library = PoseLibrary.load(path)
+    assert library.rigs.shape[0] == 1
+    assert list(library.rig_index) == [0, 0, -1]
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+from pose_similarity import PoseIndex, copy_outputs, dedupe_jobs, fbx_index
+from stub_blender import STUB_BONES, write_fbx
+
+BONES = ["mixamorig:Hips", "mixamorig:Spine", "mixamorig:LeftArm", "mixamorig:RightArm", "mixamorig:Head"]
+
+
+def random_quaternions(rng, count):
+    q = rng.normal(size=(count, len(BONES), 4))
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def nudge(q, degrees, axis=1):
+    # Rotates every bone by `degrees` more around one local axis
+    half = np.radians(degrees) / 2
+    turn = np.zeros(4)
+    turn[0], turn[axis] = np.cos(half), np.sin(half)
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    tw, tx, ty, tz = turn
+    return np.stack([w * tw - x * tx - y * ty - z * tz, w * tx + x * tw + y * tz - z * ty,
+                     w * ty - x * tz + y * tw + z * tx, w * tz + x * ty - y * tx + z * tw], axis=-1)
+
+
+def make_index(quaternions, dims=4):
+    names = [f"pose{i}" for i in range(len(quaternions))]
+    return PoseIndex(names, BONES, quaternions, np.ones(quaternions.shape[:2], bool), dims=dims)
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_nearest_matches_brute_force(k):
+    rng = np.random.default_rng(1)
+    index = make_index(random_quaternions(rng, 200))
+    query = index.features[17] + rng.normal(scale=0.05, size=index.features.shape[1])
+    expected = np.argsort(np.linalg.norm(index.features - query, axis=1), kind="stable")[:k]
+    assert [hit["name"] for hit in index.nearest(query, k)] == [index.names[i] for i in expected]
+
+
+def test_similar_excludes_the_pose_itself():
+    rng = np.random.default_rng(2)
+    poses = random_quaternions(rng, 50)
+    poses[30] = nudge(poses[3], 1.0)
+    index = make_index(poses)
+    hits = index.similar("pose3", k=3)
+    assert "pose3" not in [hit["name"] for hit in hits]
+    assert hits[0]["name"] == "pose30"
+    assert hits[0]["max_angle"] == pytest.approx(1.0, abs=1e-4)
+
+
+def test_duplicates_keep_the_first_pose():
+    rng = np.random.default_rng(3)
+    poses = random_quaternions(rng, 40)
+    poses[10] = nudge(poses[2], 1.5)
+    poses[11] = -poses[2]  # Same rotations, opposite sign
+    poses[12] = nudge(poses[2], 3.0)  # Outside the 2 degree tolerance
+    index = make_index(poses)
+    assert index.duplicates(2.0) == {"pose10": "pose2", "pose11": "pose2"}
+    assert index.groups(2.0) == {"pose2": ["pose10", "pose11"]}
+    assert "pose12" in index.duplicates(5.0)
+
+
+def test_dedupe_jobs_and_copy_outputs(tmp_path):
+    poses = {}
+    for name, spine in (("a", 10.0), ("a_again", 10.5), ("b", 45.0)):
+        poses[name] = str(tmp_path / f"{name}.fbx")
+        write_fbx(poses[name], STUB_BONES, rotations={"Spine": (spine, 0, 0)})
+    index = fbx_index(list(poses.values()))
+    export_path = str(tmp_path / "out")
+    jobs = [{"pose_fbx": poses[name], "avatar_fbx": "avatar.fbx", "export_path": export_path, "output_name": name}
+            for name in ("a", "a_again", "b")]
+    jobs.append(dict(jobs[1], avatar_fbx="other.fbx", output_name="other_avatar"))
+
+    unique, repeats = dedupe_jobs(jobs, index)
+    assert [job["output_name"] for job in unique] == ["a", "b", "other_avatar"]
+    assert [(job["output_name"], leader["output_name"]) for job, leader in repeats] == [("a_again", "a")]
+
+    os.makedirs(os.path.join(export_path, "a_views"))
+    for name in ("a.fbx", "a.png", "a_views/000.png"):
+        with open(os.path.join(export_path, name), "wb") as f:
+            f.write(name.encode())
+    assert copy_outputs(*repeats[0]) == 2
+    with open(os.path.join(export_path, "a_again.fbx"), "rb") as f:
+        assert f.read() == b"a.fbx"
+    assert os.listdir(os.path.join(export_path, "a_again_views")) == ["000.png"]
@@ -0,0 +1,96 @@
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+import preview_server
+from preview_server import PreviewServer
+
+GLB = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def model_url(tmp_path):
+    glb = tmp_path / "model.glb"
+    glb.write_bytes(GLB)
+    with PreviewServer() as server:
+        view_url = server.publish(str(glb))
+        yield view_url.replace("/view/", "/model/") + ".glb"
+
+
+def fetch(url, method="GET", **headers):
+    request = urllib.request.Request(url, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_viewer_page_links_model(model_url):
+    status, headers, body = fetch(model_url.replace("/model/", "/view/")[:-len(".glb")])
+    assert status == 200
+    assert model_url.split("/", 3)[3].encode() in body
+
+
+def test_full_download(model_url):
+    status, headers, body = fetch(model_url)
+    assert status == 200
+    assert body == GLB
+    assert headers["Accept-Ranges"] == "bytes"
+    assert headers["Content-Length"] == str(len(GLB))
+
+
+@pytest.mark.parametrize("spec, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=10000-", 10000, len(GLB) - 1),
+    ("bytes=-500", len(GLB) - 500, len(GLB) - 1),
+    ("bytes=10000-99999", 10000, len(GLB) - 1),
+])
+def test_range_requests(model_url, spec, start, end):
+    status, headers, body = fetch(model_url, Range=spec)
+    assert status == 206
+    assert headers["Content-Range"] == f"bytes {start}-{end}/{len(GLB)}"
+    assert body == GLB[start:end + 1]
+
+
+@pytest.mark.parametrize("spec", ["bytes=20000-", "bytes=50-10"])
+def test_unsatisfiable_range(model_url, spec):
+    status, headers, _ = fetch(model_url, Range=spec)
+    assert status == 416
+    assert headers["Content-Range"] == f"bytes */{len(GLB)}"
+
+
+def test_head_sends_no_body(model_url):
+    status, headers, body = fetch(model_url, method="HEAD")
+    assert status == 200
+    assert headers["Content-Length"] == str(len(GLB))
+    assert body == b""
+
+
+def test_unknown_paths_are_404(model_url):
+    base = model_url.split("/model/")[0]
+    assert fetch(base + "/model/unknown.glb")[0] == 404
+    assert fetch(base + "/vendor/three/../../preview_server.py")[0] == 404
+    assert fetch(base + "/vendor/three/not-three.js")[0] == 404
+
+
+def test_vendored_files_are_served_and_missing_ones_redirect(monkeypatch, tmp_path, model_url):
+    monkeypatch.setattr(preview_server, "VENDOR_DIR", str(tmp_path / "three"))
+    vendored = tmp_path / "three" / "build" / "three.module.js"
+    vendored.parent.mkdir(parents=True)
+    vendored.write_text("export const REVISION = '158';")
+    host = urllib.parse.urlsplit(model_url).netloc
+
+    connection = http.client.HTTPConnection(host, timeout=10)
+    connection.request("GET", "/vendor/three/build/three.module.js")
+    response = connection.getresponse()
+    assert (response.status, response.read()) == (200, vendored.read_bytes())
+    connection.request("GET", "/vendor/three/examples/jsm/loaders/GLTFLoader.js")
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 302
+    assert response.getheader("Location") == preview_server.THREE_CDN + "examples/jsm/loaders/GLTFLoader.js"
+    connection.close()
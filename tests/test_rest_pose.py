@@ -0,0 +1,94 @@
+import numpy as np
+
+from fbx_reader import quaternion_multiply
+from rest_pose import hip_scale, matrix_to_quaternion, retarget_location, retarget_rotations
+
+
+def axis_angle(axis, degrees):
+    axis = np.asarray(axis, dtype=np.float64) / np.linalg.norm(axis)
+    half = np.radians(degrees) / 2
+    return np.concatenate([[np.cos(half)], axis * np.sin(half)])
+
+
+def rotation_matrix(q):
+    w, x, y, z = q
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+def rest(q, height=1.0):
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation_matrix(q)
+    matrix[2, 3] = height
+    return matrix
+
+
+def same_rotation(a, b):
+    return np.allclose(np.abs(np.sum(a * b, axis=-1)), 1.0, atol=1e-5)
+
+
+def test_matrix_to_quaternion_round_trips():
+    for q in (axis_angle([1, 0, 0], 30), axis_angle([0, 1, 1], 179.9), axis_angle([1, 1, 0], 180),
+              axis_angle([0, 0, 1], 180), np.array([1.0, 0, 0, 0])):
+        assert same_rotation(matrix_to_quaternion(rotation_matrix(q)), q)
+
+
+def posed_directions(quaternions, rest_matrices, parents):
+    # World direction (rest Y axis) of each bone after applying its local rotation, parent first
+    world = {}
+    for b, p in enumerate(parents):
+        base = matrix_to_quaternion(rest_matrices[b, :3, :3])
+        if p >= 0:
+            parent_rest = matrix_to_quaternion(rest_matrices[p, :3, :3])
+            base = quaternion_multiply(world[p], quaternion_multiply(parent_rest * [1, -1, -1, -1], base))
+        world[b] = quaternion_multiply(base, quaternions[b])
+    return np.array([rotation_matrix(world[b])[:, 1] for b in range(len(parents))])
+
+
+# Hips pointing up, with a left arm straight out (T-pose) or 45 degrees down (A-pose)
+PARENTS = [-1, 0]
+T_POSE = np.stack([rest(axis_angle([1, 0, 0], 0)), rest(axis_angle([0, 0, 1], -90))])
+A_POSE = np.stack([rest(axis_angle([1, 0, 0], 0), 0.8),
+                   rest(quaternion_multiply(axis_angle([0, 0, 1], -135), axis_angle([0, 1, 0], 30)), 0.8)])
+
+
+def test_same_rest_pose_is_unchanged():
+    q = np.stack([axis_angle([1, 0, 0], 45), axis_angle([0, 1, 1], 20)])
+    assert same_rotation(retarget_rotations(q, T_POSE, T_POSE, PARENTS), q)
+
+
+def test_bone_axes_differing_by_roll_only_conjugate():
+    # Same bone directions, different roll: the rotation is re-expressed in the target's axes
+    source_axes, target_axes = axis_angle([0, 0, 1], 90), quaternion_multiply(axis_angle([0, 0, 1], 90), axis_angle([0, 1, 0], 60))
+    q = axis_angle([1, 0, 1], 30)
+    result = retarget_rotations(q[np.newaxis], rest(source_axes)[np.newaxis], rest(target_axes)[np.newaxis], [-1])[0]
+    change = quaternion_multiply(target_axes * [1, -1, -1, -1], source_axes)
+    assert same_rotation(result, quaternion_multiply(quaternion_multiply(change, q), change * [1, -1, -1, -1]))
+
+
+def test_t_pose_source_on_a_pose_avatar():
+    rest_pose = np.tile([1.0, 0, 0, 0], (2, 1))
+    result = retarget_rotations(rest_pose, T_POSE, A_POSE, PARENTS)
+    assert not same_rotation(result[1], rest_pose[1])
+    assert np.allclose(posed_directions(result, A_POSE, PARENTS), posed_directions(rest_pose, T_POSE, PARENTS), atol=1e-5)
+
+
+def test_animated_t_pose_source_on_a_pose_avatar():
+    rng = np.random.default_rng(4)
+    frames = rng.normal(size=(6, 2, 4))
+    frames /= np.linalg.norm(frames, axis=-1, keepdims=True)
+    result = retarget_rotations(frames, T_POSE, A_POSE, PARENTS)
+    assert result.shape == frames.shape
+    for source, target in zip(frames, result):
+        assert np.allclose(posed_directions(target, A_POSE, PARENTS), posed_directions(source, T_POSE, PARENTS), atol=1e-5)
+
+
+def test_hip_scale_and_location():
+    tall, short = rest(axis_angle([0, 0, 1], 0), 1.0), rest(axis_angle([0, 0, 1], 90), 0.5)
+    assert hip_scale(tall, short) == 0.5
+    assert hip_scale(tall, rest(axis_angle([0, 0, 1], 0), 0.0)) == 1.0
+    moved = retarget_location(np.array([1.0, 0.0, 0.0]), tall, short, 0.5)
+    assert np.allclose(short[:3, :3] @ moved, [0.5, 0.0, 0.0], atol=1e-6)
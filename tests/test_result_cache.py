@@ -0,0 +1,96 @@
+import os
+import stat
+
+from result_cache import ContentCache, ResultCache, transfer_key
+from stub_blender import write_preview
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_put_and_restore(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"))
+    src = write(str(tmp_path / "src" / "a.bin"), b"payload")
+    cache.put("ab" * 32, {"a.bin": src})
+
+    dst = str(tmp_path / "out" / "a.bin")
+    assert cache.restore("ab" * 32, {"a.bin": dst})
+    assert read(dst) == b"payload"
+    assert not cache.restore("cd" * 32, {"a.bin": dst})
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cached_files_are_read_only(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"))
+    stored = cache.put("ab" * 32, {"a.bin": write(str(tmp_path / "a.bin"), b"payload")})
+    assert not os.stat(stored["a.bin"]).st_mode & stat.S_IWUSR
+
+
+def test_restore_is_not_a_hardlink(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"))
+    stored = cache.put("ab" * 32, {"a.bin": write(str(tmp_path / "a.bin"), b"payload")})
+    dst = str(tmp_path / "out" / "a.bin")
+    cache.restore("ab" * 32, {"a.bin": dst})
+
+    assert os.stat(dst).st_ino != os.stat(stored["a.bin"]).st_ino
+    assert os.stat(dst).st_nlink == 1
+    assert os.stat(dst).st_mode & stat.S_IWUSR
+    # An exporter writing over the restored file in place must not reach the cache
+    with open(dst, "r+b") as f:
+        f.write(b"CHANGED")
+    assert read(stored["a.bin"]) == b"payload"
+
+
+def test_restore_replaces_existing_file(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"))
+    cache.put("ab" * 32, {"a.bin": write(str(tmp_path / "a.bin"), b"payload")})
+    dst = write(str(tmp_path / "out" / "a.bin"), b"an older, longer result")
+    cache.restore("ab" * 32, {"a.bin": dst})
+    assert read(dst) == b"payload"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"), max_bytes=250)
+    keys = [c * 64 for c in "abc"]
+    cache.put(keys[0], {"f": write(str(tmp_path / "a"), b"a" * 100)})
+    cache.put(keys[1], {"f": write(str(tmp_path / "b"), b"b" * 100)})
+    cache.get(keys[0])
+    cache.put(keys[2], {"f": write(str(tmp_path / "c"), b"c" * 100)})
+
+    assert sorted(entry["key"] for entry in cache.entries()) == [keys[0], keys[2]]
+    cache.purge()
+    assert cache.entries() == []
+
+
+def test_result_cache_round_trips_views(tmp_path, rig_files):
+    pose, avatar = rig_files
+    export_path = str(tmp_path / "out")
+    write(os.path.join(export_path, "hero.fbx"), b"fbx")
+    write_preview(os.path.join(export_path, "hero.png"), "quad")
+
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = transfer_key(pose, avatar, {"preview_views": "quad"})
+    cache.store(key, export_path, "hero")
+
+    restored = str(tmp_path / "restored")
+    assert cache.lookup(key, restored, "again")
+    assert read(os.path.join(restored, "again.fbx")) == b"fbx"
+    assert os.path.exists(os.path.join(restored, "again.png"))
+    assert sorted(os.listdir(os.path.join(restored, "again_views"))) == sorted(
+        os.listdir(os.path.join(export_path, "hero_views")))
+
+
+def test_transfer_key_tracks_inputs(rig_files):
+    pose, avatar = rig_files
+    assert transfer_key(pose, avatar) == transfer_key(pose, avatar)
+    assert transfer_key(pose, avatar) != transfer_key(avatar, pose)
+    assert transfer_key(pose, avatar) != transfer_key(pose, avatar, {"frames": "all"})
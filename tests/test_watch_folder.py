@@ -0,0 +1,97 @@
+import os
+import time
+
+import pytest
+
+from job_scheduler import JobScheduler, stub_command
+from result_cache import read_json
+from stub_blender import STUB_BONES, write_fbx
+from watch_folder import FolderWatcher
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler("blender", max_workers=1, blender_command=stub_command())
+    yield scheduler
+    scheduler.shutdown(cancel_pending=True)
+
+
+@pytest.fixture
+def folders(tmp_path, rig_files):
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    return str(drop), str(tmp_path / "out"), rig_files[1]
+
+
+def make_watcher(scheduler, folders, avatars=None, **kwargs):
+    drop, export_path, avatar = folders
+    os.makedirs(export_path, exist_ok=True)
+    kwargs.setdefault("settle", 0.0)
+    return FolderWatcher([drop], avatars or [avatar], export_path, scheduler, params={"preview": False}, **kwargs)
+
+
+def drop_pose(folders, name="wave.fbx", spine=10.0):
+    path = os.path.join(folders[0], name)
+    write_fbx(path, STUB_BONES, rotations={"Spine": (spine, 0, 0)})
+    return path
+
+
+def test_waits_for_files_to_settle(scheduler, folders):
+    watcher = make_watcher(scheduler, folders, settle=0.3)
+    path = drop_pose(folders)
+    assert watcher.scan() == []
+    assert watcher.scan() == []
+    time.sleep(0.35)
+    drop_pose(folders, spine=20.0)  # Still being written: the wait starts over
+    assert watcher.scan() == []
+    time.sleep(0.35)
+    assert [ready for ready, _stat in watcher.scan()] == [path]
+
+
+def test_forgets_files_removed_before_settling(scheduler, folders):
+    watcher = make_watcher(scheduler, folders, settle=10.0)
+    path = drop_pose(folders)
+    watcher.scan()
+    os.remove(path)
+    watcher.scan()
+    assert not watcher.busy()
+
+
+def test_transfers_each_avatar_and_skips_after_restart(scheduler, folders, tmp_path):
+    second = str(tmp_path / "second.fbx")
+    write_fbx(second, STUB_BONES)
+    path = drop_pose(folders)
+    make_watcher(scheduler, folders, avatars=[folders[2], second]).run(interval=0.05, once=True)
+
+    entry = read_json(os.path.join(folders[1], ".watch_journal.json"))[path]
+    assert entry["status"] == "done"
+    assert sorted(entry["outputs"]) == ["avatar__wave", "second__wave"]
+    assert all(os.path.exists(os.path.join(folders[1], f"{name}.fbx")) for name in entry["outputs"])
+
+    restarted = make_watcher(scheduler, folders, avatars=[folders[2], second])
+    assert restarted.scan() == [] and restarted.scan() == []
+    assert len(scheduler.jobs) == 2
+
+
+def test_touched_but_unchanged_file_is_not_redone(scheduler, folders):
+    path = drop_pose(folders)
+    watcher = make_watcher(scheduler, folders)
+    watcher.run(interval=0.05, once=True)
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    watcher.run(interval=0.05, once=True)
+    assert len(scheduler.jobs) == 1
+    assert watcher.is_done(path, (os.stat(path).st_size, os.stat(path).st_mtime_ns))
+
+
+def test_failed_poses_are_skipped_unless_retrying(scheduler, folders, tmp_path):
+    broken = tmp_path / "broken.fbx"
+    broken.write_bytes(b"not an fbx")
+    path = drop_pose(folders)
+    make_watcher(scheduler, folders, avatars=[str(broken)]).run(interval=0.05, once=True)
+    assert read_json(os.path.join(folders[1], ".watch_journal.json"))[path]["status"] == "failed"
+
+    skipping = make_watcher(scheduler, folders, avatars=[str(broken)])
+    assert skipping.scan() == [] and skipping.scan() == []
+    retrying = make_watcher(scheduler, folders, avatars=[str(broken)], retry_failed=True)
+    assert retrying.scan() == []
+    assert [ready for ready, _stat in retrying.scan()] == [path]
@@ -0,0 +1,236 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+from blender_pool import BlenderPool, worker_command
+from batch_manifest import OUTPUT_FORMATS
+from job_scheduler import Job, JobScheduler
+from output_index import OutputIndex
+from preview_views import PREVIEW_PRESETS, view_angles
+from result_cache import ResultCache, DEFAULT_CACHE_DIR, file_digest, read_json, transfer_key, write_json_atomic
+
+# Polls drop folders for new or changed pose FBXs and queues one transfer per configured avatar.
+# The journal maps each pose file to its content hash and outcome, so a restart skips finished work.
+JOURNAL_NAME = ".watch_journal.json"
+
+
+class FolderWatcher:
+    def __init__(self, folders, avatars, export_path, scheduler, journal_path=None, settle=3.0,
+                 recursive=False, params=None, result_cache=None, retry_failed=False):
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        self.avatars = [os.path.abspath(avatar) for avatar in avatars]
+        self.export_path = export_path
+        self.scheduler = scheduler
+        self.journal_path = journal_path or os.path.join(export_path, JOURNAL_NAME)
+        self.settle = settle
+        self.recursive = recursive
+        self.params = params or {"preview": True}
+        self.ext = OUTPUT_FORMATS[self.params.get("output_format", "fbx")]
+        self.result_cache = result_cache
+        self.retry_failed = retry_failed
+        self.output_index = OutputIndex(export_path)
+
+        self.journal = read_json(self.journal_path, {})
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> ((size, mtime_ns), first seen with that stat)
+        self._remaining = {}  # path -> transfers still running
+        self._failed = {}  # path -> errors from this round
+
+    # --- Journal ---
+    def save_journal(self):
+        with self._lock:
+            write_json_atomic(self.journal_path, self.journal)
+
+    def is_done(self, path, stat_key):
+        entry = self.journal.get(path)
+        if entry is None or entry.get("stat") != list(stat_key):
+            return False
+        return entry["status"] == "done" or (entry["status"] == "failed" and not self.retry_failed)
+
+    # --- Scanning ---
+    def iter_fbx(self):
+        for folder in self.folders:
+            stack = [folder]
+            while stack:
+                try:
+                    with os.scandir(stack.pop()) as it:
+                        for item in it:
+                            if item.is_dir() and self.recursive and not item.name.startswith("."):
+                                stack.append(item.path)
+                            elif item.name.lower().endswith(".fbx") and item.is_file():
+                                yield item.path, item.stat()
+                except OSError as e:
+                    print(f"⚠️ Cannot scan {folder}: {e}")
+
+    def scan(self):
+        # A file is ready once its size and mtime have held still for `settle` seconds
+        now = time.monotonic()
+        ready = []
+        seen = set()
+        for path, stat in self.iter_fbx():
+            seen.add(path)
+            stat_key = (stat.st_size, stat.st_mtime_ns)
+            if path in self._remaining or self.is_done(path, stat_key):
+                self._pending.pop(path, None)
+                continue
+            previous = self._pending.get(path)
+            if previous is None or previous[0] != stat_key:
+                self._pending[path] = (stat_key, now)
+            elif now - previous[1] >= self.settle:
+                del self._pending[path]
+                ready.append((path, stat_key))
+        for path in [p for p in self._pending if p not in seen]:
+            del self._pending[path]  # Deleted or renamed before it settled
+        return ready
+
+    # --- Queueing ---
+    def process(self, path, stat_key):
+        try:
+            digest = file_digest(path)
+        except OSError as e:
+            print(f"⚠️ {path}: {e}")
+            return
+        entry = self.journal.get(path)
+        if entry and entry.get("digest") == digest and entry["status"] == "done":
+            # Touched but unchanged (e.g. copied over itself): nothing to redo
+            with self._lock:
+                entry["stat"] = list(stat_key)
+            self.save_journal()
+            return
+
+        pose_stem = os.path.splitext(os.path.basename(path))[0]
+        with self._lock:
+            self.journal[path] = {"digest": digest, "stat": list(stat_key), "status": "queued",
+                                  "outputs": [], "updated": time.time()}
+            self._remaining[path] = len(self.avatars)
+            self._failed[path] = []
+        self.save_journal()
+        print(f"📥 {os.path.basename(path)}: queueing {len(self.avatars)} transfer(s)")
+
+        for avatar in self.avatars:
+            name = f"{os.path.splitext(os.path.basename(avatar))[0]}__{pose_stem}"
+            args = dict(self.params, pose_fbx=path, avatar_fbx=avatar, export_path=self.export_path, output_name=name)
+            key = transfer_key(path, avatar, self.params) if self.result_cache else None
+            if key and self.result_cache.lookup(key, self.export_path, name, self.ext):
+                self.transfer_finished(path, avatar, name, key, None)
+                continue
+            job = Job("pose_transfer", args, on_done=lambda job, path=path, key=key: self.on_job_done(path, job, key))
+            self.scheduler.submit(job)
+
+    def on_job_done(self, path, job, key):
+        name = job.args["output_name"]
+        if job.state == "done" and self.result_cache and key:
+            try:
+                self.result_cache.store(key, self.export_path, name, self.ext)
+            except OSError as e:
+                print(f"⚠️ Could not cache {name}: {e}")
+        self.transfer_finished(path, job.args["avatar_fbx"], name, key, job.error if job.state != "done" else None)
+
+    def transfer_finished(self, path, avatar, name, key, error):
+        if error is None and self.ext == ".fbx":
+            self.output_index.add(name, key=key, pose_fbx=path, avatar_fbx=avatar)
+        with self._lock:
+            entry = self.journal[path]
+            if error is None:
+                entry["outputs"].append(name)
+            else:
+                self._failed[path].append(f"{name}: {error}")
+            self._remaining[path] -= 1
+            finished = self._remaining[path] == 0
+            if finished:
+                del self._remaining[path]
+                errors = self._failed.pop(path)
+                entry["status"] = "failed" if errors else "done"
+                entry["errors"] = errors
+                entry["updated"] = time.time()
+        if finished:
+            self.save_journal()
+            status = "❌" if entry["status"] == "failed" else "✅"
+            print(f"{status} {os.path.basename(path)}: {len(entry['outputs'])}/{len(self.avatars)} transfers done")
+
+    def busy(self):
+        with self._lock:
+            return bool(self._remaining) or bool(self._pending)
+
+    def run(self, interval=2.0, once=False):
+        print(f"👀 Watching {', '.join(self.folders)} for {len(self.avatars)} avatar(s) -> {self.export_path}")
+        while True:
+            for path, stat_key in self.scan():
+                self.process(path, stat_key)
+            if once and not self.busy():
+                return
+            time.sleep(interval)
+
+
+# --- CLI ---
+def watch_params(args):
+    # Same shape as the UI's transfer params for FBX output, so both share result cache entries
+    params = {"preview": not args.no_preview and args.output_format == "fbx", "preview_preset": args.preview_preset}
+    if args.output_format != "fbx":
+        params["output_format"] = args.output_format
+    if args.preview_views != "front":
+        params["preview_views"] = args.preview_views
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch folders for pose FBXs and transfer them onto an avatar set")
+    parser.add_argument("folders", nargs="+", help="Folders to watch")
+    parser.add_argument("--avatars", nargs="+", required=True, help="Avatar FBXs every new pose is applied to")
+    parser.add_argument("--export-path", required=True, help="Output folder (also holds the journal)")
+    parser.add_argument("--blender", help="Blender executable")
+    parser.add_argument("--stub", action="store_true", help="Use the Blender stand-in instead of Blender")
+    parser.add_argument("--workers", type=int, default=1, help="Warm Blender workers")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between folder scans")
+    parser.add_argument("--settle", type=float, default=3.0, help="Seconds a file must stay unchanged before it is queued")
+    parser.add_argument("--recursive", action="store_true", help="Also watch subfolders")
+    parser.add_argument("--journal", help=f"Journal file (default: <export-path>/{JOURNAL_NAME})")
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue poses whose transfers failed before")
+    parser.add_argument("--output-format", choices=list(OUTPUT_FORMATS), default="fbx",
+                        help="fbx: posed avatar; armature-fbx/bvh/json/npz: skeleton only (no preview)")
+    parser.add_argument("--no-preview", action="store_true", help="Skip preview renders")
+    parser.add_argument("--preview-preset", choices=sorted(PREVIEW_PRESETS), default="standard",
+                        help="Preview quality preset")
+    parser.add_argument("--preview-views", default="front",
+                        help="front, front-side-back, quad, or N for an N-angle turntable contact sheet")
+    parser.add_argument("--no-cache", action="store_true", help="Don't reuse or store results in the result cache")
+    parser.add_argument("--once", action="store_true", help="Process what is there now, then exit")
+    args = parser.parse_args()
+
+    if not args.stub and not args.blender:
+        parser.error("--blender is required unless --stub is given")
+    try:
+        view_angles(args.preview_views)
+    except ValueError as e:
+        parser.error(str(e))
+    missing = [avatar for avatar in args.avatars if not os.path.exists(avatar)]
+    if missing:
+        parser.error(f"avatar not found: {', '.join(missing)}")
+    os.makedirs(args.export_path, exist_ok=True)
+
+    command = worker_command(stub=True) if args.stub else None
+    pool = BlenderPool(args.blender, size=args.workers, command=command)
+    scheduler = JobScheduler(args.blender, max_workers=args.workers, pool=pool)
+    watcher = FolderWatcher(
+        args.folders, args.avatars, args.export_path, scheduler,
+        journal_path=args.journal,
+        settle=args.settle,
+        recursive=args.recursive,
+        params=watch_params(args),
+        result_cache=None if args.no_cache else ResultCache(DEFAULT_CACHE_DIR),
+        retry_failed=args.retry_failed,
+    )
+    try:
+        watcher.run(args.interval, once=args.once)
+    except KeyboardInterrupt:
+        print("🛑 Stopping; unfinished poses stay queued in the journal")
+    finally:
+        scheduler.shutdown(wait=False)
+        pool.shutdown(wait=False)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()